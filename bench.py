@@ -0,0 +1,206 @@
+import argparse
+import collections
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+import src.core.parallel_search
+import src.core.shared_grid
+import src.core.sim_engine
+import src.core.worker_pool
+import src.util.common
+import src.util.matrix_helpers
+import src.util.sim_global
+import src.util.sim_logic_wrapper
+import src.view.scanline_filter
+
+def bench_engine(args):
+	"""
+	Runs the simulation headless and reports steps per second
+	"""
+	configuration = src.util.sim_global.SimConfig()
+	state_variable_reference = src.util.sim_global.SimState()
+	finders = src.core.pathfinding.Pathfinding()
+	generators = src.core.maze_gen.MazeGeneration()
+	core_logic = src.util.sim_logic_wrapper.SimCore(finders, generators)
+	configuration.ROWS, configuration.COLS = 30 * args.scale, 60 * args.scale
+	configuration.ALGO = args.algo
+	engine = src.core.sim_engine.SimEngine(configuration, state_variable_reference, core_logic)
+	engine.reset()
+	if args.maze >= 0:
+		maze, _, offset = core_logic.generate(args.maze, configuration.ROWS, configuration.COLS)
+		packed = src.util.matrix_helpers.MatrixHelpers.pack(maze, configuration.ROWS, configuration.COLS, *offset)
+		engine.load_map(src.util.matrix_helpers.MatrixHelpers.unpack(packed, configuration.ROWS, configuration.COLS))
+
+	# the snake is placed again whenever it gets stuck, so that every requested step is run
+	steps, restarts = 0, 0
+	events = collections.Counter()
+	engine.subscribe(lambda event, *data: events.update((event,)))
+	start = time.perf_counter()
+	while steps < args.steps:
+		engine.reset_snake()
+		engine.spawn_snake()
+		steps += engine.run(args.steps - steps)
+		restarts += 1
+	elapsed = time.perf_counter() - start
+	print(f"{steps} steps in {elapsed:.3f} s: {steps / elapsed:,.0f} steps/s "
+	      f"({events['caught']} targets caught, {restarts - 1} restarts, {configuration.ROWS}x{configuration.COLS} map)")
+
+def bench_planning(args):
+	"""
+	Plans paths between random cells of a maze on every worker of a process pool at once, sending the map either as a
+	pickled copy with every plan or as a shared grid, and reports plans per second
+	"""
+	configuration = src.util.sim_global.SimConfig()
+	core_logic = src.util.sim_logic_wrapper.SimCore(src.core.pathfinding.Pathfinding(), src.core.maze_gen.MazeGeneration())
+	rows, cols = 30 * args.scale, 60 * args.scale
+	maze, _, offset = core_logic.generate(max(args.maze, 0), rows, cols)
+	tiles = src.util.matrix_helpers.MatrixHelpers.unpack(src.util.matrix_helpers.MatrixHelpers.pack(maze, rows, cols, *offset), rows, cols)
+	free = [(i, j) for i in range(rows) for j in range(cols) if not tiles[i][j]]
+	pairs = [(random.choice(free), random.choice(free)) for _ in range(args.plans)]
+	pool = src.core.worker_pool.WorkerPool(args.workers)
+	grid = src.core.shared_grid.SharedGrid()
+	grid.publish(tiles)
+	for name, matrix in (('pickled', tiles), ('shared', grid)):
+		start = time.perf_counter()
+		futures = [pool.submit(src.core.sim_engine.SimEngine.find_path, core_logic, args.algo,
+		                       (a, b, matrix, configuration.WRAPAROUND, configuration.EIGHT_DIRECTIONAL, False), configuration.HEURISTIC)
+		           for a, b in pairs]
+		for future in futures:
+			future.result()
+		elapsed = time.perf_counter() - start
+		print(f"{name:>8}: {args.plans} plans in {elapsed:.3f} s: {args.plans / elapsed:,.1f} plans/s "
+		      f"({args.workers} workers, {rows}x{cols} map)")
+	pool.shutdown()
+	grid.close()
+
+class _ThreadSides(ThreadPoolExecutor):
+	"""
+	Runs both sides of a parallel search on threads of this process, sharing one core through the GIL
+	"""
+	def cancel(self, future):
+		return future.cancel()
+
+def bench_bidirectional(args):
+	"""
+	Plans bidirectional paths between far apart cells of a map, without wraparound (each target is the cell closest to
+	the corner furthest from its start), and reports the time taken by each way of searching: the frontiers taking
+	turns in one thread (the original search), the two sides of the parallel search sharing one core on two threads of
+	this process, and the same two sides running at once on two worker processes; the last two run the same search
+	loop, so their difference is the gain from the second core alone
+	"""
+	configuration = src.util.sim_global.SimConfig()
+	core_logic = src.util.sim_logic_wrapper.SimCore(src.core.pathfinding.Pathfinding(), src.core.maze_gen.MazeGeneration())
+	rows, cols = 30 * args.scale, 60 * args.scale
+	tiles = [[0] * cols for _ in range(rows)]
+	if args.maze >= 0:
+		maze, _, offset = core_logic.generate(args.maze, rows, cols)
+		tiles = src.util.matrix_helpers.MatrixHelpers.unpack(src.util.matrix_helpers.MatrixHelpers.pack(maze, rows, cols, *offset), rows, cols)
+	# pairs are taken from the largest region of the map, as targets walled off from their start would make every
+	# search exhaust the map instead
+	free, region = {(i, j) for i in range(rows) for j in range(cols) if not tiles[i][j]}, set()
+	while len(free) > len(region):
+		seed = free.pop()
+		reached, queue = {seed}, collections.deque([seed])
+		while queue:
+			x, y = queue.popleft()
+			for cell in src.util.common.Common.valid_moves(x, y, rows, cols, False, configuration.EIGHT_DIRECTIONAL):
+				if cell in free and not src.util.matrix_helpers.MatrixHelpers.check_diagonal_crossing(x, y, *cell, tiles):
+					free.discard(cell)
+					reached.add(cell)
+					queue.append(cell)
+		region = max(region, reached, key=len)
+	region = sorted(region)
+	pairs = []
+	for _ in range(args.plans):
+		a = random.choice(region)
+		far = (0 if a[0] >= rows // 2 else rows - 1, 0 if a[1] >= cols // 2 else cols - 1)
+		pairs.append((a, min(region, key=lambda cell: abs(cell[0] - far[0]) + abs(cell[1] - far[1]))))
+	pool = src.core.worker_pool.WorkerPool(2)
+	search = src.core.parallel_search.ParallelSearch(pool)
+	threads = _ThreadSides(max_workers=2)
+	one_core = src.core.parallel_search.ParallelSearch(threads)
+	plans = [(a, b, tiles, False, configuration.EIGHT_DIRECTIONAL, True) for a, b in pairs]
+	runs = (('turns', lambda plan: src.core.sim_engine.SimEngine.find_path(core_logic, args.algo, plan, configuration.HEURISTIC)),
+	        ('one core', lambda plan: one_core.find_path(args.algo, plan, configuration.HEURISTIC)),
+	        ('parallel', lambda plan: search.find_path(args.algo, plan, configuration.HEURISTIC)))
+	for name, find_path in runs:
+		start = time.perf_counter()
+		lengths = [len(find_path(plan)[0]) for plan in plans]
+		elapsed = time.perf_counter() - start
+		print(f"{name:>8}: {len(plans)} plans in {elapsed:.3f} s: {elapsed / len(plans) * 1000:,.1f} ms/plan "
+		      f"(mean length {sum(lengths) / len(lengths):.1f}, {rows}x{cols} map)")
+	search.close()
+	one_core.close()
+	threads.shutdown()
+	pool.shutdown()
+
+def bench_filter(args):
+	"""
+	Plays each CRT filter over a canvas with a moving item for a few seconds, and reports the CPU time used by this
+	process (the cost of compositing in the display server is not included)
+	"""
+	import tkinter as tk
+	configuration = src.util.sim_global.SimConfig()
+	root = tk.Tk()
+	canvas = tk.Canvas(root, width=1280, height=720, highlightthickness=0, background='black')
+	canvas.pack()
+	for _ in range(2000):
+		x, y = random.randrange(1280), random.randrange(720)
+		canvas.create_rectangle(x, y, x + 20, y + 12, fill='gray40', width=0)
+	mover = canvas.create_rectangle(0, 0, 20, 12, fill='orange', width=0)
+	root.update()
+	scanline_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'filter', 'scanline_h')
+	filters = {
+		'image frames': lambda: src.view.scanline_filter.ImageFrameFilter(canvas, scanline_dir),
+		'generated': lambda: src.view.scanline_filter.ScanlineFilter(canvas),
+		'static': lambda: src.view.scanline_filter.ScanlineFilter(canvas, animated=False),
+		'none': lambda: None,
+	}
+	for name, make in filters.items():
+		canvas.delete('filter')
+		scanlines = make()
+		if scanlines:
+			scanlines.show(1280, 720)
+		ticks = 0
+		start, cpu = time.perf_counter(), time.process_time()
+		next_filter_frame = start
+		while time.perf_counter() - start < args.seconds:
+			# the moving item stands in for the simulation, which keeps damaging part of the canvas
+			canvas.move(mover, 3, 0)
+			if canvas.coords(mover)[0] > 1280:
+				y = random.randrange(720)
+				canvas.coords(mover, 0, y, 20, y + 12)
+			if scanlines and time.perf_counter() >= next_filter_frame:
+				scanlines.advance()
+				next_filter_frame += configuration.FRAME_DELAY / 1000
+			root.update()
+			ticks += 1
+			time.sleep(0.016)
+		elapsed = time.perf_counter() - start
+		cpu = time.process_time() - cpu
+		print(f"{name:>12}: {cpu / elapsed:6.1%} CPU, {ticks / elapsed:5.1f} frames/s, "
+		      f"{scanlines.raises if scanlines else 0} raises")
+	root.destroy()
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description="Runs the simulation headless and reports steps per second, or measures the cost of the CRT filters")
+	parser.add_argument('--algo', type=int, default=4, help="pathfinding algorithm ID (see SimConfig.ALGO)")
+	parser.add_argument('--maze', type=int, default=2, help="maze generation algorithm ID (see SimConfig.MAZE_ALGO), or -1 for an empty map")
+	parser.add_argument('--scale', type=int, default=1, help="map size, in multiples of 30x60 cells")
+	parser.add_argument('--steps', type=int, default=10000, help="number of steps to run")
+	parser.add_argument('--filter', action='store_true', help="benchmark the CRT filters instead (needs a display)")
+	parser.add_argument('--seconds', type=float, default=5.0, help="time to play each filter for")
+	parser.add_argument('--planning', action='store_true', help="benchmark batch planning on a process pool instead")
+	parser.add_argument('--plans', type=int, default=200, help="number of paths to plan")
+	parser.add_argument('--workers', type=int, default=os.cpu_count(), help="number of worker processes")
+	parser.add_argument('--bidirectional', action='store_true', help="benchmark parallel bidirectional search instead (uses --plans)")
+	args = parser.parse_args()
+	if args.filter:
+		bench_filter(args)
+	elif args.planning:
+		bench_planning(args)
+	elif args.bidirectional:
+		bench_bidirectional(args)
+	else:
+		bench_engine(args)
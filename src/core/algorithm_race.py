@@ -0,0 +1,185 @@
+import itertools
+import threading
+import time
+import tracemalloc
+from concurrent.futures import Future, TimeoutError
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+# from snakesim.src.core.shared_grid import SharedGrid
+# from snakesim.src.core.sim_engine import SimEngine
+# from snakesim.src.core.worker_pool import WorkerPool
+from .shared_grid import SharedGrid
+from .sim_engine import SimEngine
+from .worker_pool import WorkerPool
+from ..util.common import AppException, CancelToken
+
+def run_entry(core, alg, args, heuristic, analysis=None, memory=True, limit: Optional[float] = None):
+	"""
+	Runs one entry of a race on a worker: times a plan, then plans again with allocations traced to measure its peak
+	memory use (tracing slows the plan down, so that run is not timed)
+
+	The traced run has a time budget of its own: it is skipped if the timed run used more than half the limit, and
+	given up (leaving the peak unmeasured) once it has run for the limit, so that it never makes an entry that
+	finished in time count as timed out.
+
+	:param limit: Seconds the timed run may take, or None for no limit
+	:return: Tuple of the time taken in seconds, the peak memory use in bytes (or None), the path and the visited cells
+	:raises TimeoutError: If the timed run took longer than the limit
+	"""
+	start = time.perf_counter()
+	path, visited = SimEngine.find_path(core, alg, args, heuristic, analysis)
+	elapsed = time.perf_counter() - start
+	if limit is not None and elapsed > limit:
+		raise TimeoutError
+	peak = None
+	if memory and (limit is None or elapsed <= limit / 2):
+		token = CancelToken()
+		timer = threading.Timer(limit, token.cancel) if limit is not None else None
+		if timer:
+			timer.start()
+		tracemalloc.start()
+		try:
+			SimEngine.find_path(core, alg, args, heuristic, analysis, token=token)
+			peak = tracemalloc.get_traced_memory()[1]
+		except AppException.Cancelled:
+			pass
+		finally:
+			tracemalloc.stop()
+			if timer:
+				timer.cancel()
+	return elapsed, peak, path, visited
+
+class RaceResult:
+	"""
+	Outcome of one algorithm in a race.
+	"""
+	def __init__(self, alg: int, name: str):
+		self.alg = alg
+		self.name = name
+		self.time: Optional[float] = None
+		self.peak: Optional[int] = None
+		self.path: List = []        # from the target back to the start
+		self.visited: List = []
+		self.error: Optional[str] = None
+
+	@property
+	def expansions(self) -> int:
+		return len(self.visited)
+
+	@property
+	def length(self) -> Optional[int]:
+		"""
+		Number of moves of the path, or None if no path was found
+		"""
+		return len(self.path) - 1 if self.path else None
+
+class AlgorithmRace:
+	"""
+	Runs every pathfinding algorithm on the same start, target and map at once, one entry per task of a worker pool,
+	and ranks them.
+
+	Every entry plans on the same snapshot of the map, taken when the race starts: the race publishes it to a shared
+	grid of its own (if the engine uses one), which is not published to again until the next race, so entries still
+	queued behind the planner's tasks do not pick up later edits of the map. The race is over once the slowest entry
+	has finished or run out of time. Entries that found a path are ranked by time taken, ahead of the ones that found
+	none, ran out of time or failed.
+	"""
+	def __init__(self, pool: WorkerPool, memory=True):
+		self.pool = pool
+		self.memory = memory
+		self.results: List[RaceResult] = []
+		self.grid = SharedGrid()
+		self._futures: Dict[int, Future] = {}
+
+	@property
+	def running(self) -> bool:
+		return bool(self._futures)
+
+	def start(self, engine: SimEngine, algorithms: Iterable[int], names: Sequence[str], timeout: Optional[float] = None):
+		"""
+		Starts a race from the head of the snake to the target
+
+		:param engine: Engine holding the map, snake and target
+		:param algorithms: IDs of the pathfinding algorithms to race
+		:param names: Names of the algorithms, by ID
+		:param timeout: Seconds each entry may take, or None for no limit
+		"""
+		self.cancel()
+		x, y = engine.state.HEAD
+		if engine.shared_grid is not None:
+			self.grid.publish(engine.state.TILES)
+			tiles = self.grid
+		else:
+			tiles = [bytes(row) for row in engine.state.TILES]
+		for alg in algorithms:
+			core, alg, args, heuristic, analysis, _ = engine.plan_args(x, y, alg)
+			args = args[:2] + (tiles,) + args[3:]
+			self.results.append(RaceResult(alg, names[alg]))
+			# the traced run of an entry is budgeted separately (see run_entry), within twice the time limit
+			deadline = timeout * 2 if timeout is not None and self.memory else timeout
+			self._futures[alg] = self.pool.submit_with_timeout(deadline, run_entry, core, alg, args, heuristic, analysis, self.memory,
+			                                                   timeout)
+
+	def poll(self) -> bool:
+		"""
+		Collects the entries that have finished
+
+		:return: True once every entry has finished
+		"""
+		for result in self.results:
+			future = self._futures.get(result.alg)
+			if future is None or not future.done():
+				continue
+			del self._futures[result.alg]
+			try:
+				result.time, result.peak, result.path, result.visited = future.result()
+				if not result.path:
+					result.error = "no path"
+			except TimeoutError:
+				result.error = "timed out"
+			except Exception as error:
+				result.error = type(error).__name__
+		return not self._futures
+
+	def cancel(self):
+		"""
+		Drops the current race, stopping the entries that are still running
+		"""
+		for future in self._futures.values():
+			self.pool.cancel(future)
+		self._futures.clear()
+		self.results = []
+
+	def close(self):
+		self.cancel()
+		self.grid.close()
+
+	def ranked(self) -> List[RaceResult]:
+		# entries that found a path, then the ones that found none, then the ones that ran out of time or failed
+		return sorted(self.results, key=lambda result: (result.length is None, result.time is None, result.time or 0.0, result.expansions))
+
+	def table(self) -> List[str]:
+		"""
+		Formats the ranked results
+
+		:return: Lines of the table, starting with its header
+		"""
+		lines = [f"{'#':>2}  {'algorithm':<23}{'time':>10}{'expanded':>10}{'length':>10}{'peak':>10}"]
+		for rank, result in enumerate(self.ranked(), 1):
+			time_taken = f"{result.time * 1000:.1f} ms" if result.time is not None else "-"
+			peak = f"{result.peak / 1024:.0f} KiB" if result.peak is not None else "-"
+			outcome = result.length if result.length is not None else result.error
+			lines.append(f"{rank:>2}  {result.name:<23}{time_taken:>10}{result.expansions:>10}{outcome:>10}{peak:>10}")
+		return lines
+
+	def trace(self, colors: Dict[int, str]) -> Iterator:
+		"""
+		Interleaves the visited cells of every entry, a cell of each in turn, then draws their paths, for playing back
+		the race side by side on the map
+
+		:param colors: Colour of each algorithm, by ID
+		:return: Iterator of (cell, colour) pairs
+		"""
+		ranked = [result for result in self.ranked() if result.time is not None]
+		visited = itertools.zip_longest(*(((cell, colors[result.alg]) for cell in result.visited) for result in ranked))
+		paths = (((cell, colors[result.alg]) for cell in reversed(result.path)) for result in ranked)
+		return itertools.chain(filter(None, itertools.chain.from_iterable(visited)), itertools.chain.from_iterable(paths))
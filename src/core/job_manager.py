@@ -0,0 +1,161 @@
+from collections import deque
+from concurrent.futures import Executor, Future
+from typing import Callable, Dict, Hashable, Iterable, List, Optional
+# from snakesim.src.util.common import CancelToken
+from ..util.common import CancelToken
+
+class Job:
+	"""
+	A call run by the job manager, with the cancellation token it is given and the callback to run once it has finished.
+	"""
+	def __init__(self, kind: str, key: Optional[Hashable], func: Callable, args, kwargs, callback: Optional[Callable]):
+		self.kind = kind
+		self.key = key
+		self.func = func
+		self.args = args
+		self.kwargs = kwargs
+		self.callback = callback
+		self.token = CancelToken()
+		self.future: Optional[Future] = None    # set once the job has started
+
+	@property
+	def cancelled(self) -> bool:
+		return self.token.cancelled
+
+	@property
+	def done(self) -> bool:
+		return self.future is not None and self.future.done()
+
+class JobManager:
+	"""
+	Runs long jobs started from the UI (map analysis, map edits, maze generation) on an executor, a limited number of
+	each kind at a time.
+
+	Jobs of a kind beyond its limit wait in a queue, in the order they were submitted. A job submitted while an
+	identical one (same kind and key) is queued or running is not run again, and the pending job is returned instead,
+	so that repeated button presses do not pile up work. A job may replace the pending jobs of some kinds, cancelling
+	them, e.g. when it rewrites the map they were started on. Jobs are given a cancellation token as their token
+	argument, and a cancelled job keeps its slot until it has stopped. The manager is driven by polling it from the
+	main thread, which starts queued jobs and hands back finished ones; the workers only run the jobs.
+	"""
+	def __init__(self, executor: Executor, limits: Optional[Dict[str, int]] = None, default_limit=1):
+		self.executor = executor
+		self.limits = dict(limits or {})
+		self.default_limit = default_limit
+		self.submitted = 0
+		self.deduplicated = 0
+		self._queued: Dict[str, deque] = {}     # kind -> jobs waiting for a slot
+		self._running: List[Job] = []
+
+	@property
+	def busy(self) -> bool:
+		return bool(self._running) or any(self._queued.values())
+
+	def pending(self, kinds: Optional[Iterable[str]] = None) -> List[Job]:
+		"""
+		Returns the running and queued jobs that have not been cancelled
+
+		:param kinds: Kinds of jobs to return, or None for all
+		"""
+		kinds = None if kinds is None else set(kinds)
+		jobs = self._running + [job for queued in self._queued.values() for job in queued]
+		return [job for job in jobs if not job.cancelled and not job.done and (kinds is None or job.kind in kinds)]
+
+	def find(self, kind: str, key: Hashable) -> Optional[Job]:
+		"""
+		Returns the pending job of a kind with the given key, if any
+		"""
+		return next((job for job in self.pending((kind,)) if job.key == key), None)
+
+	def submit(self, kind: str, func: Callable, *args, key: Optional[Hashable] = None, callback: Optional[Callable] = None,
+	           replaces: Iterable[str] = (), **kwargs) -> Job:
+		"""
+		Queues a job, starting it right away if its kind has a free slot
+
+		:param kind: Kind of the job, which limits how many jobs like it run at once
+		:param func: Function to run; it must not call Tk, and is given the cancellation token of the job as its token argument
+		:param args: Arguments of the function
+		:param key: Identifies the work of the job among its kind, or None to never deduplicate it
+		:param callback: Function to run on the main thread once the job has finished, kept for whoever polls
+		:param replaces: Kinds of jobs to cancel first
+		:param kwargs: Keyword arguments of the function
+		:return: The job, or the identical job already pending
+		"""
+		if key is not None:
+			job = self.find(kind, key)
+			if job is not None:
+				self.deduplicated += 1
+				return job
+		for job in self.pending(replaces):
+			self.cancel(job)
+		job = Job(kind, key, func, args, kwargs, callback)
+		self.submitted += 1
+		self._queued.setdefault(kind, deque()).append(job)
+		self._dispatch()
+		return job
+
+	def cancel(self, job: Job) -> bool:
+		"""
+		Cancels a job; a queued job is dropped, and a running one stops at its next check of its token
+
+		:return: False if the job had already finished or been cancelled
+		"""
+		if job.cancelled or job.done:
+			return False
+		job.token.cancel()
+		if job.future is None:
+			self._queued[job.kind].remove(job)
+		else:
+			job.future.cancel()
+		return True
+
+	def cancel_all(self) -> int:
+		"""
+		Cancels every pending job
+
+		:return: Number of jobs cancelled
+		"""
+		return sum(self.cancel(job) for job in self.pending())
+
+	def _dispatch(self):
+		for kind, queued in self._queued.items():
+			limit = self.limits.get(kind, self.default_limit)
+			running = sum(job.kind == kind for job in self._running)
+			while queued and running < limit:
+				job = queued.popleft()
+				job.future = self.executor.submit(job.func, *job.args, token=job.token, **job.kwargs)
+				self._running.append(job)
+				running += 1
+
+	def poll(self) -> List[Job]:
+		"""
+		Collects the jobs that have finished and starts queued jobs in their slots, on the main thread
+
+		:return: Finished jobs, in the order they were started, including cancelled ones
+		"""
+		finished = [job for job in self._running if job.future.done()]
+		if finished:
+			self._running = [job for job in self._running if job not in finished]
+			self._dispatch()
+		return finished
+
+	def status(self) -> str:
+		"""
+		Describes the pending jobs, with the progress of the running ones, for the message area
+
+		:return: The description, or an empty string if no jobs are pending
+		"""
+		running = [f"{job.kind} {job.token.fraction:.0%}" if job.token.total else job.kind
+		           for job in self._running if not job.cancelled and not job.done]
+		queued = sum(len(queued) for queued in self._queued.values())
+		parts = [f"Running {', '.join(running)}"] if running else []
+		if queued:
+			parts.append(f"{queued} queued")
+		return ", ".join(parts)
+
+	def close(self):
+		"""
+		Cancels every pending job; the executor is left to its owner
+		"""
+		self.cancel_all()
+		self._queued.clear()
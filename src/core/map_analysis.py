@@ -0,0 +1,323 @@
+import heapq
+import math
+from typing import List, Tuple
+# from snakesim.src.util.common import Common
+# from snakesim.src.util.matrix_helpers import MatrixHelpers
+from ..util.common import Common
+from ..util.matrix_helpers import MatrixHelpers
+
+class MapAnalysis:
+	"""
+	Precomputed structure of a map's walls, used to speed up searches on maze-like maps.
+
+	Dead ends are filled by repeatedly removing open cells with at most one open neighbour; every filled cell keeps
+	a pointer to the neighbour it was attached to, leading out of its dead-end branch. The remaining cells are
+	contracted into a sparse junction graph, where nodes are cells with other than two open neighbours and edges are
+	the single-width corridors between them (with their cells and length).
+
+	Cells are addressed by their flat, row-major index. The analysis is kept up to date incrementally with update().
+	"""
+	def __init__(self, matrix: List[List[int]], wraparound=False, all_directional=False):
+		self.rows, self.cols = len(matrix), len(matrix[0])
+		self.wraparound = wraparound
+		self.all_directional = all_directional
+		self.walls = [[1 if val else 0 for val in row] for row in matrix]
+		n = self.rows * self.cols
+		# possible moves from each cell regardless of walls, and the reverse mapping; on small maps, wrapping around
+		# can lead back to the cell itself or to the same neighbour twice, which would let a corridor pass through a
+		# cell twice, so those moves are dropped
+		self.moves = [tuple(dict.fromkeys(m for m in (i * self.cols + j for i, j in Common.valid_moves(k // self.cols, k % self.cols, self.rows,
+		                                                                                                self.cols, wraparound, all_directional))
+		                                  if m != k)) for k in range(n)]
+		self.reverse_moves = [[] for _ in range(n)]
+		for k, moves in enumerate(self.moves):
+			for m in moves:
+				self.reverse_moves[m].append(k)
+		self.forward = [()] * n     # moves from each cell that are not blocked by walls
+		self.adj = [()] * n         # open neighbours (moves that are allowed both ways)
+		self.dead = bytearray(n)
+		self.exit = [-1] * n
+		self.edges = {}             # edge id -> (node, node, corridor cells from the first node to the second, length)
+		self.edge_of = {}           # corridor cell -> edge id
+		self.edge_start = {}        # (node, first step) -> edge id
+		self.node_edges = {}        # node -> set of edge ids
+		self._next_edge = 0
+		cells = range(n)
+		for k in cells:
+			self.forward[k] = self._forward(k)
+		for k in cells:
+			self.adj[k] = self._adjacent(k)
+		self._peel(cells)
+		self._rebuild_graph(cells)
+
+	def _forward(self, k):
+		x, y = divmod(k, self.cols)
+		if self.walls[x][y]:
+			return ()
+		return tuple(m for m in self.moves[k] if not self.walls[m // self.cols][m % self.cols] and
+		             not MatrixHelpers.check_diagonal_crossing(x, y, m // self.cols, m % self.cols, self.walls))
+
+	def _adjacent(self, k):
+		return tuple(m for m in self.forward[k] if k in self.forward[m])
+
+	def _cost(self, a, b):
+		return 1 if a // self.cols == b // self.cols or a % self.cols == b % self.cols else math.sqrt(2)
+
+	def is_live(self, k):
+		"""
+		Returns True if the cell is open and not part of a dead end
+		"""
+		return not self.walls[k // self.cols][k % self.cols] and not self.dead[k]
+
+	def _live_neighbors(self, k):
+		return [m for m in self.adj[k] if not self.dead[m]]
+
+	def _is_node(self, k):
+		return self.is_live(k) and len(self._live_neighbors(k)) != 2
+
+	def _peel(self, seeds):
+		"""
+		Fills dead ends reachable from the given cells, by removing open cells with at most one open neighbour
+		until none are left
+		"""
+		flipped = []
+		stack = [k for k in seeds if not self.dead[k] and not self.walls[k // self.cols][k % self.cols]]
+		while stack:
+			k = stack.pop()
+			if self.dead[k]:
+				continue
+			live = self._live_neighbors(k)
+			if len(live) <= 1:
+				self.dead[k] = 1
+				self.exit[k] = live[0] if live else -1
+				flipped.append(k)
+				if live:
+					stack.append(live[0])
+		return flipped
+
+	def _unfill(self, seeds):
+		"""
+		Clears the dead-end status of every dead-end branch containing one of the given cells
+		"""
+		unfilled = []
+		stack = [k for k in seeds if self.dead[k]]
+		while stack:
+			k = stack.pop()
+			if not self.dead[k]:
+				continue
+			self.dead[k] = 0
+			self.exit[k] = -1
+			unfilled.append(k)
+			stack.extend(m for m in self.adj[k] if self.dead[m])
+		return unfilled
+
+	def _remove_edge(self, eid):
+		u, v, cells, _ = self.edges.pop(eid)
+		for c in cells:
+			if self.edge_of.get(c) == eid:
+				del self.edge_of[c]
+		first, last = (cells[0], cells[-1]) if cells else (v, u)
+		self.edge_start.pop((u, first), None)
+		self.edge_start.pop((v, last), None)
+		self.node_edges[u].discard(eid)
+		self.node_edges[v].discard(eid)
+		return u, v
+
+	def _trace(self, u, first):
+		"""
+		Follows the corridor starting at node u in the direction of the given neighbour until it reaches a node,
+		and adds it as an edge
+		"""
+		prev, cur, cells, length = u, first, [], self._cost(u, first)
+		while cur not in self.node_edges:
+			if self._is_node(cur):
+				self.node_edges[cur] = set()
+				break
+			cells.append(cur)
+			step = next(m for m in self._live_neighbors(cur) if m != prev)
+			length += self._cost(cur, step)
+			prev, cur = cur, step
+		eid = self._next_edge
+		self._next_edge += 1
+		self.edges[eid] = (u, cur, tuple(cells), length)
+		for c in cells:
+			self.edge_of[c] = eid
+		self.edge_start[(u, first)] = eid
+		self.edge_start[(cur, cells[-1] if cells else u)] = eid
+		self.node_edges[u].add(eid)
+		self.node_edges[cur].add(eid)
+
+	def _rebuild_graph(self, touched):
+		"""
+		Removes every node and edge of the junction graph touching the given cells, and traces them again
+		"""
+		frontier = set()
+		for t in touched:
+			if t in self.edge_of:
+				frontier.update(self._remove_edge(self.edge_of[t]))
+			if t in self.node_edges:
+				for eid in list(self.node_edges[t]):
+					frontier.update(self._remove_edge(eid))
+				del self.node_edges[t]
+		frontier.difference_update(touched)
+		frontier.update(t for t in touched if self._is_node(t))
+		for u in frontier:
+			if u not in self.node_edges:
+				if not self._is_node(u):
+					continue
+				self.node_edges[u] = set()
+		for u in frontier:
+			if u in self.node_edges:
+				for w in self._live_neighbors(u):
+					if (u, w) not in self.edge_start:
+						self._trace(u, w)
+		# corridors closed into a loop have no junction; promote one of their cells to a node
+		for t in touched:
+			if t not in self.edge_of and t not in self.node_edges and self.is_live(t):
+				self.node_edges[t] = set()
+				for w in self._live_neighbors(t):
+					if (t, w) not in self.edge_start:
+						self._trace(t, w)
+
+	def update(self, cells, value):
+		"""
+		Applies a wall edit to the analysis, updating only the parts of it affected by the edit
+
+		:param cells: List of (row, column) coordinates that were changed
+		:param value: 1 if walls were placed, 0 if they were removed
+		"""
+		changed = set()
+		for x, y in cells:
+			if bool(self.walls[x][y]) != bool(value):
+				self.walls[x][y] = 1 if value else 0
+				changed.add(x * self.cols + y)
+		if not changed:
+			return
+		# cells whose moves may be affected: the changed cell, cells moving into it, and cells whose diagonal
+		# moves cross it
+		recompute = set(changed)
+		for k in changed:
+			x, y = divmod(k, self.cols)
+			recompute.update(self.reverse_moves[k])
+			recompute.update(((x + dx) % self.rows) * self.cols + (y + dy) % self.cols for dx, dy in ((-1, 0), (1, 0), (0, -1), (0, 1)))
+		for k in recompute:
+			self.forward[k] = self._forward(k)
+		dirty = set(recompute)
+		for k in recompute:
+			dirty.update(self.moves[k])
+			dirty.update(self.reverse_moves[k])
+		for k in dirty:
+			self.adj[k] = self._adjacent(k)
+		for k in changed:
+			if value:
+				self.dead[k] = 0
+				self.exit[k] = -1
+		unfilled = self._unfill(dirty)
+		flipped = self._peel(list(dirty) + unfilled)
+		touched = dirty.union(unfilled, flipped)
+		for k in set(unfilled).union(flipped):
+			touched.update(self.adj[k])
+		self._rebuild_graph(touched)
+
+	def _chain(self, k):
+		"""
+		Returns the cells leading from the given cell out of its dead-end branch, ending at a live cell (or at the
+		root of the branch, if its whole region is filled)
+		"""
+		chain = [k]
+		while self.dead[chain[-1]] and self.exit[chain[-1]] != -1:
+			chain.append(self.exit[chain[-1]])
+		return chain
+
+	def _pieces(self, eid, stops):
+		"""
+		Splits an edge at the given extra stops (cells on its corridor); returns (node, node, inner cells, length)
+		pieces in order along the edge
+		"""
+		u, v, cells, length = self.edges[eid]
+		splits = sorted((cells.index(s), s) for s in stops)
+		if not splits:
+			return [(u, v, cells, length)]
+		pieces, prev, prev_index = [], u, -1
+		for index, stop in splits + [(len(cells), v)]:
+			inner = cells[prev_index + 1:index]
+			path = (prev,) + inner + (stop,)
+			pieces.append((prev, stop, inner, sum(self._cost(a, b) for a, b in zip(path, path[1:]))))
+			prev, prev_index = stop, index
+		return pieces
+
+	def shortest_path(self, start, target, matrix) -> Tuple[List[Tuple[int, int]], List[Tuple[int, int]]]:
+		"""
+		Returns the shortest path between two cells, searching only the junction graph and the corridors of the
+		edges it relaxes; cells that are occupied in the given matrix (but not walls in the analysis) are avoided
+
+		:param start: Start coordinate
+		:param target: Target coordinate
+		:param matrix: 2D matrix with the current state of the map
+		:return: Tuple of the path (from target to start), and the cells visited, in order
+		"""
+		cols = self.cols
+		s, t = start[0] * cols + start[1], target[0] * cols + target[1]
+
+		def blocked(k):
+			return k != s and k != t and bool(matrix[k // cols][k % cols])
+
+		def to_path(cells):
+			return [divmod(c, cols) for c in cells]
+
+		if self.walls[start[0]][start[1]] or self.walls[target[0]][target[1]]:
+			return [], []
+		chain_s, chain_t = self._chain(s), self._chain(t)
+		common = set(chain_s).intersection(chain_t)
+		if common:  # both in the same dead-end branch; the path through it is unique
+			meet = next(c for c in chain_s if c in common)
+			cells = chain_s[:chain_s.index(meet)] + chain_t[:chain_t.index(meet) + 1][::-1]
+			if any(blocked(c) for c in cells):
+				return [], to_path(cells)
+			return to_path(cells[::-1]), to_path(cells)
+		s_core, t_core = chain_s[-1], chain_t[-1]
+		if self.dead[s_core] or self.dead[t_core] or any(blocked(c) for c in chain_s + chain_t):
+			return [], to_path(chain_s + chain_t)
+		stops = {}
+		for c in (s_core, t_core):
+			if c in self.edge_of:
+				stops.setdefault(self.edge_of[c], set()).add(c)
+
+		def incident(node):
+			eids = [self.edge_of[node]] if node in self.edge_of else self.node_edges[node]
+			for eid in eids:
+				for a, b, inner, length in self._pieces(eid, stops.get(eid, ())):
+					if a == node:
+						yield b, inner, length
+					if b == node:
+						yield a, inner[::-1], length
+
+		visited = []
+		dist, came_from = {s_core: 0}, {s_core: None}
+		pq = [(0, s_core)]
+		while pq:
+			d, node = heapq.heappop(pq)
+			if d > dist[node]:
+				continue
+			visited.append(node)
+			if node == t_core:
+				break
+			for neighbor, inner, length in incident(node):
+				if d + length < dist.get(neighbor, float('inf')) and not blocked(neighbor) and not any(blocked(c) for c in inner):
+					dist[neighbor] = d + length
+					came_from[neighbor] = (node, inner)
+					visited.extend(inner)
+					heapq.heappush(pq, (d + length, neighbor))
+		if t_core not in came_from:
+			return [], to_path(visited)
+		core = []
+		node = t_core
+		while came_from[node] is not None:
+			prev, inner = came_from[node]
+			core.append(node)
+			core.extend(inner[::-1])
+			node = prev
+		core.append(s_core)
+		# path runs from target to start
+		cells = chain_t[:-1] + core + chain_s[:-1][::-1]
+		return to_path(cells), to_path(visited)
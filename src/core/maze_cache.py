@@ -0,0 +1,76 @@
+import ast
+import hashlib
+import os
+import struct
+import tempfile
+from typing import Optional
+
+class MazeCache:
+	"""
+	Content-addressed on-disk cache of generated maps. Each map is stored as a uint8 .npy file of shape (rows, cols),
+	named by a hash of the generation parameters, so it can also be loaded directly with numpy.load.
+	"""
+	DEFAULT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))), '.maze_cache')
+	# bump whenever a generation algorithm changes, so stale maps are not served from the cache
+	VERSION = 1
+	_MAGIC = b'\x93NUMPY\x01\x00'
+
+	def __init__(self, directory=None):
+		self.directory = directory or MazeCache.DEFAULT_DIR
+
+	@staticmethod
+	def key(algo, rows, cols, seed) -> str:
+		"""
+		Returns the content address of the map generated with the given parameters
+
+		:param algo: ID of maze generation algorithm
+		:param rows: Number of rows of the map
+		:param cols: Number of columns of the map
+		:param seed: Seed the map was generated from
+		:return: Hex digest identifying the map
+		"""
+		return hashlib.sha1(f"v{MazeCache.VERSION}:{algo}:{rows}:{cols}:{seed}".encode()).hexdigest()
+
+	def path(self, algo, rows, cols, seed):
+		key = MazeCache.key(algo, rows, cols, seed)
+		return os.path.join(self.directory, key[:2], f"{key}.npy")
+
+	def load(self, algo, rows, cols, seed) -> Optional[bytes]:
+		"""
+		Returns the cached map for the given parameters, or None if it has not been generated yet
+
+		:return: Map packed with MatrixHelpers.pack, or None
+		"""
+		try:
+			with open(self.path(algo, rows, cols, seed), 'rb') as file:
+				data = file.read()
+		except OSError:
+			return None
+		if not data.startswith(MazeCache._MAGIC):
+			return None
+		# a truncated or corrupt file is a miss, so that the map is generated again and the file overwritten
+		try:
+			header_len, = struct.unpack('<H', data[8:10])
+			header = ast.literal_eval(data[10:10 + header_len].decode('latin1'))
+		except (struct.error, ValueError, SyntaxError, UnicodeDecodeError):
+			return None
+		packed = data[10 + header_len:]
+		if not isinstance(header, dict) or header.get('shape') != (rows, cols) or len(packed) != rows * cols:
+			return None
+		return packed
+
+	def store(self, algo, rows, cols, seed, packed):
+		"""
+		Writes a packed map to the cache; the file is written to a temporary name first and then moved in place,
+		so concurrent readers never see a partial file
+
+		:param packed: Map packed with MatrixHelpers.pack
+		"""
+		path = self.path(algo, rows, cols, seed)
+		os.makedirs(os.path.dirname(path), exist_ok=True)
+		header = f"{{'descr': '|u1', 'fortran_order': False, 'shape': ({rows}, {cols}), }}"
+		header += ' ' * (-(len(MazeCache._MAGIC) + 2 + len(header) + 1) % 64) + '\n'   # .npy headers are 64-byte aligned
+		fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+		with os.fdopen(fd, 'wb') as file:
+			file.write(MazeCache._MAGIC + struct.pack('<H', len(header)) + header.encode('latin1') + bytes(packed))
+		os.replace(tmp_path, path)
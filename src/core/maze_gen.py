@@ -1,38 +1,117 @@
+import os
 import random
+from concurrent.futures import ProcessPoolExecutor
 from typing import List, Tuple
 # from snakesim.src.util.common import Common
 # from snakesim.src.util.matrix_helpers import MatrixHelpers
 from ..util.common import Common
 from ..util.matrix_helpers import MatrixHelpers
+from ..util.event_log import EventLog
+from .maze_cache import MazeCache
 
 class MazeGeneration:
-	def dungeon_rooms_maze_generation(self, height, width):
+	# generation methods, indexed by the maze algorithm id (SimConfig.MAZE_ALGO)
+	ALGORITHMS = (
+		'simple_maze_generation', 'diagonal_maze_generation', 'dungeon_rooms_maze_generation', 'dfs_maze_generation',
+		'recursive_division_maze_generation', 'cell_opening_maze_generation', 'iterative_prims_maze_generation'
+	)
+
+	def generate(self, algo, rows, cols, log=False, token=None):
+		"""
+		Generates a map/maze using the maze generation algorithm with the given id
+		
+		:param algo: ID of maze generation algorithm
+		:param rows: Number of rows of the map
+		:param cols: Number of columns of the map
+		:param log: Record the generation steps in an event log (for visualizing)
+		:param token: Cancellation token, given the generation's progress
+		:return: Tuple of the generated map, its event log (None if not logged), and the (row, column) offset
+				the map should be placed at
+		"""
+		maze, events = getattr(self, MazeGeneration.ALGORITHMS[algo])(rows, cols, log, token)
+		offset = (1, 1) if MazeGeneration.ALGORITHMS[algo] == 'dfs_maze_generation' else (0, 0)
+		return maze, events, offset
+
+	@staticmethod
+	def generate_packed(algo, rows, cols, seed) -> bytes:
+		"""
+		Generates a map from the given seed, without disturbing the global random state
+		
+		:param algo: ID of maze generation algorithm
+		:param rows: Number of rows of the map
+		:param cols: Number of columns of the map
+		:param seed: Seed for the random number generator
+		:return: Map of shape (rows, cols), packed with MatrixHelpers.pack
+		"""
+		state = random.getstate()
+		random.seed(seed)
+		try:
+			maze, _, offset = MazeGeneration().generate(algo, rows, cols)
+		finally:
+			random.setstate(state)
+		return MatrixHelpers.pack(maze, rows, cols, *offset)
+
+	def generate_batch(self, jobs, cache_dir=None, processes=None) -> List[bytes]:
+		"""
+		Generates a batch of maps across a process pool; maps already in the on-disk cache are loaded instead of
+		being generated again, and newly generated maps are added to it
+		
+		:param jobs: List of (algorithm id, rows, cols, seed) tuples
+		:param cache_dir: Cache directory (defaults to MazeCache.DEFAULT_DIR)
+		:param processes: Number of worker processes (defaults to the number of CPUs)
+		:return: List of maps packed with MatrixHelpers.pack, in the same order as the jobs
+		"""
+		cache = MazeCache(cache_dir)
+		jobs = [tuple(job) for job in jobs]
+		results = {job: cache.load(*job) for job in set(jobs)}
+		missing = [job for job, packed in results.items() if packed is None]
+		if missing:
+			processes = processes or os.cpu_count() or 1
+			chunksize = max(1, len(missing) // (4 * processes))
+			with ProcessPoolExecutor(processes) as executor:
+				for job, packed in zip(missing, executor.map(MazeGeneration.generate_packed, *zip(*missing), chunksize=chunksize)):
+					cache.store(*job, packed)
+					results[job] = packed
+		return [results[job] for job in jobs]
+
+	def dungeon_rooms_maze_generation(self, height, width, log=False, token=None):
 		"""
 		Returns a map/maze generated by a randomised dungeon-rooms algorithm
 		
 		:param height: breadth of 2D map
 		:param width: length of 2D map
+		:param log: Record the generation steps in an event log (for visualizing)
+		:param token: Cancellation token, given the generation's progress
+		:return: Tuple of the generated map, and its event log (None if not logged)
 		"""
 		maze = list(map(lambda x: [int(random.random() + 0.5) for _ in range(width)], range(height)))
-		maze_original_points = [(i, j) for i in range(height) for j in range(width) if maze[i][j] == 1]
-		maze_converted_points = []
+		events = None
+		if log:
+			events = EventLog(height, width)
+			events.set_all(maze)
 		scaling_factor = max(height // 30, width // 60)
 		num_of_points = range(random.randrange(20 + scaling_factor * 5, 40 + scaling_factor * 5))
 		points = [(random.randrange(0, height), random.randrange(0, width)) for _ in num_of_points]
-		for p in points:
+		for index, p in enumerate(points):
+			if token:
+				token.step(index, len(points))
 			hole_size = random.choice([1, 2, 3] + list(range(4, 4 + scaling_factor - 1)))
 			for i in range(p[0] - hole_size, p[0] + hole_size):
 				for j in range(p[1] - hole_size, p[1] + hole_size):
+					if events is not None and maze[i % height][j % width]:
+						events.clear(i % height, j % width)
 					maze[i % height][j % width] = 0
-					maze_converted_points.append((i % height, j % width))
-		return maze, maze_original_points, maze_converted_points
+		return maze, events
 	
-	def dfs_maze_generation(self, rows, cols):
+	def dfs_maze_generation(self, rows, cols, log=False, token=None):
 		"""
 		Applies depth first search (in-place) to 2D matrix to generate maze/map
 		
 		:param rows: Number of rows of 2D matrix representing maze
 		:param cols: Number of columns of 2D matrix representing maze
+		:param log: Record the generation steps in an event log (for visualizing)
+		:param token: Cancellation token, given the generation's progress
+		:return: Tuple of the generated map, and its event log (None if not logged)
 		"""
 		# Directions for moving (right, down, left, up)
 		directions = [(2, 0), (0, 2), (-2, 0), (0, -2)]  # (dx, dy)
@@ -40,14 +119,19 @@ class MazeGeneration:
 		odd_cols = cols - 1 if cols % 2 == 0 else cols
 		x, y = random.randrange(1, odd_cols, 2), random.randrange(1, odd_rows, 2)
 		maze = [[1] * odd_cols for _ in range(odd_rows)]
-		maze_original_points = [(i, j) for i in range(odd_rows) for j in range(odd_cols) if maze[i][j] == 1]
-		maze_converted_points = [(y, x)]
+		events = EventLog(odd_rows, odd_cols, filled=True) if log else None
 		stack = [(y, x)]
 		maze[y][x] = 0
+		if events is not None:
+			events.clear(y, x)
+		# every cell is pushed and popped once
+		moves, total = 0, (odd_rows // 2) * (odd_cols // 2) * 2
 		while stack:
+			if token:
+				token.step(moves, total)
+				moves += 1
 			y, x = stack[-1]
 			maze[y][x] = 0  # Mark the current cell as part of the maze (0)
-			maze_converted_points.append((y, x))
 			random.shuffle(directions)  # Randomize directions
 			found = False
 			for dx, dy in directions:
@@ -57,12 +141,14 @@ class MazeGeneration:
 					maze[y + dy // 2][x + dx // 2] = 0  # Remove the wall between
 					maze[ny][nx] = 0  # Mark the new cell as part of the maze
 					stack.append((ny, nx))  # Add new cell to the stack
-					maze_converted_points.extend([(y + dy // 2, x + dx // 2), (ny, nx)])
+					if events is not None:
+						events.clear(y + dy // 2, x + dx // 2)
+						events.clear(ny, nx)
 					found = True
 					break
 			if not found:
 				stack.pop()
-		return maze, maze_original_points, maze_converted_points
+		return maze, events
 		# Recursive version (works only for smaller matrices)
 		# maze[y][x] = 0  # Mark the current cell as part of the maze (0)
 		# # Directions for moving (right, down, left, up)
@@ -75,17 +161,21 @@ class MazeGeneration:
 		# 		maze[y + dy // 2][x + dx // 2] = 0  # Remove the wall between
 		# 		self.dfs_maze_generation(maze, nx, ny, rows, cols)
 		
-	def simple_maze_generation(self, height, width):
+	def simple_maze_generation(self, height, width, log=False, token=None):
 		"""
 		Returns map generated using randomization
 		
 		:param height: breadth of 2D map
 		:param width: length of 2D map
+		:param log: Record the generation steps in an event log (for visualizing)
+		:param token: Cancellation token, given the generation's progress
+		:return: Tuple of the generated map, and its event log (None if not logged)
 		"""
 		maze = [[0] * width for _ in range(height)]
-		maze_original_points = []
-		maze_converted_points = []
+		events = EventLog(height, width) if log else None
 		for i in range(0, len(maze), 2):
+			if token:
+				token.step(i, height)
 			for j in range(0, len(maze[0]), 2):
 				block = random.choice(MatrixHelpers.block_patterns())
 				for i2, x2 in enumerate(block):
@@ -95,29 +185,35 @@ class MazeGeneration:
 							x, y, = (i + i2) % height, (j + j2) % width
 							for ri, r2 in enumerate([r1[y:y + block] for r1 in maze[x:x + block]], start=x):
 								for rj, c2 in enumerate(r2, start=y):
+									if events is not None and not maze[ri][rj]:
+										events.set(ri, rj)
 									maze[ri][rj] = 1
-									maze_converted_points.append((ri, rj))
-		return maze, maze_original_points, maze_converted_points
+		return maze, events
 	
-	def diagonal_maze_generation(self, height, width):
+	def diagonal_maze_generation(self, height, width, log=False, token=None):
 		"""
 		Returns maze generated using a simple checkerboard-randomized pattern
 		
 		:param height: breadth of 2D map
 		:param width: length of 2D map
+		:param log: Record the generation steps in an event log (for visualizing)
+		:param token: Cancellation token, given the generation's progress
+		:return: Tuple of the generated map, and its event log (None if not logged)
 		"""
 		maze = [[0] * width for _ in range(height)]
-		maze_original_points = []
-		maze_converted_points = []
 		for i in range(len(maze)):
 			for j in range(len(maze[i])):
 				if i % 2 == 0:
 					maze[i][j] = 1
-					maze_original_points.append((i, j))
 				if i % 2 == 1 and j % 2 == 0:
 					maze[i][j] = 1
-					maze_original_points.append((i, j))
+		events = None
+		if log:
+			events = EventLog(height, width)
+			events.set_all(maze)
 		for i in range(1, len(maze), 2):
+			if token:
+				token.step(i, height)
 			for j in range(1, len(maze[i]), 2):
 				if maze[i][j] == 0:
 					try:
@@ -127,20 +223,23 @@ class MazeGeneration:
 						wall2 = random.choice(walls)
 						maze[wall[0]][wall[1]] = 0
 						maze[wall2[0]][wall2[1]] = 0
-						maze_converted_points.extend([(wall[0], wall[1]), (wall2[0], wall2[1])])
+						if events is not None:
+							events.clear(wall[0], wall[1])
+							events.clear(wall2[0], wall2[1])
 					except IndexError:
 						continue
-		return maze, maze_original_points, maze_converted_points
+		return maze, events
 	
 	# TBD later
-	def iterative_prims_maze_generation(self, height, width):
+	def iterative_prims_maze_generation(self, height, width, log=False, token=None):
 		maze = [[1] * width for _ in range(height)]
 		directions = [(1, 0), (0, 1), (-1, 0), (0, -1)]
 		x, y = random.randrange(0, height), random.randrange(0, width)
-		maze_original_points = [(i, j) for i in range(height) for j in range(width) if maze[i][j] == 1]
-		maze_converted_points = [(x, y)]
+		events = EventLog(height, width, filled=True) if log else None
 		frontier = [(x, y)]
 		while frontier:
+			if token:
+				token.check()
 			frontier_cell = random.choice(frontier)
 			frontier_neighbors = []
 			for dx, dy in directions:
@@ -149,6 +248,11 @@ class MazeGeneration:
 					frontier_neighbors.append((nx, ny))
 			frontier_neighbors.append(frontier_cell)
 			adjacent = random.choice(frontier_neighbors)
+			if events is not None:
+				if maze[adjacent[0]][adjacent[1]]:
+					events.clear(adjacent[0], adjacent[1])
+				if adjacent != frontier_cell and maze[frontier_cell[0]][frontier_cell[1]]:
+					events.clear(frontier_cell[0], frontier_cell[1])
 			maze[adjacent[0]][adjacent[1]] = 0
 			maze[frontier_cell[0]][frontier_cell[1]] = 0
 			frontier_neighbors.remove(adjacent)
@@ -158,32 +262,39 @@ class MazeGeneration:
 			frontier.extend(frontier_neighbors)
 			# for r in maze:
 			# 	print(' '.join(map(str, r)))
-		return maze, maze_original_points, maze_converted_points
+		return maze, events
 	
-	def cell_opening_maze_generation(self, height, width):
+	def cell_opening_maze_generation(self, height, width, log=False, token=None):
 		maze = [[0 if i % 2 == 0 and j % 2 == 0 else 1 for i in range(width)] for j in range(height)]
-		maze_original_points = [(i, j) for i in range(height) for j in range(width) if maze[i][j] == 1]
-		maze_converted_points = []
+		events = EventLog(height, width, filled=True) if log else None
 		cells = []
 		for i in range(width):
 			for j in range(height):
 				if maze[j][i] == 0:
 					cells.append((i, j))
+					if events is not None:
+						events.clear(j, i)
 		directions = [(1, 0), (0, 1), (-1, 0), (0, -1)]
 		for i, cell in enumerate(cells):
+			if token:
+				token.step(i, len(cells))
 			side = random.choice(directions)
 			gap = (cell[1]+side[0], cell[0]+side[1])
 			if 0 <= gap[0] < height and 0 <= gap[1] < width:
+				if events is not None and maze[gap[0]][gap[1]]:
+					events.clear(gap[0], gap[1])
 				maze[gap[0]][gap[1]] = 0
-				maze_converted_points.append((gap[0], gap[1]))
-		return maze, maze_original_points, maze_converted_points
+		return maze, events
 
-	def recursive_division_maze_generation(self, height, width):
+	def recursive_division_maze_generation(self, height, width, log=False, token=None):
 			"""
 			Returns map/maze generated using a recursive division algorithm
 			
 			:param height: breadth of 2D map
 			:param width: length of 2D map
+			:param log: Record the generation steps in an event log (for visualizing)
+			:param token: Cancellation token, given the generation's progress
+			:return: Tuple of the generated map, and its event log (None if not logged)
 			"""
 			def check_connectivity(x, y, h, w):
 				if maze[x][(y + 1) % w] == 1 and maze[x][(y - 1) % w] == 1 and \
@@ -196,6 +307,8 @@ class MazeGeneration:
 					return False
 			
 			def recursive_divide(matrix, startx, starty):
+				if token:
+					token.check()
 				if len(matrix) == 1:
 					return
 				if len(matrix[0]) == 1:
@@ -205,11 +318,13 @@ class MazeGeneration:
 					return
 				point = (random.randrange(startx + 1, startx + h - 1), random.randrange(starty + 1, starty + w - 1))
 				for j in range(startx, startx + h):
+					if events is not None and not maze[j][point[1]]:
+						events.set(j, point[1])
 					maze[j][point[1]] = 1
-					maze_converted_points.append((j, point[1]))
 				for i in range(starty, starty + w):
+					if events is not None and not maze[point[0]][i]:
+						events.set(point[0], i)
 					maze[point[0]][i] = 1
-					maze_converted_points.append((point[0], i))
 				wall_top_half = [(x, point[1]) for x in range(startx, point[0])]
 				wall_bottom_half = [(x, point[1]) for x in range(point[0], h)]
 				wall_left_half = [(point[0], y) for y in range(starty, point[1])]
@@ -224,8 +339,9 @@ class MazeGeneration:
 							else:
 								wall.remove(gap)
 							gap = random.choice(wall)
+						if events is not None and maze[gap[0]][gap[1]]:
+							events.clear(gap[0], gap[1])
 						maze[gap[0]][gap[1]] = 0
-						maze_converted_points.append((gap[0], gap[1]))
 				q1 = MatrixHelpers.get_selection(maze, startx, starty, point[0], point[1])
 				q2 = MatrixHelpers.get_selection(maze, startx, point[1] + 1, point[0], starty + w)
 				q3 = MatrixHelpers.get_selection(maze, point[0] + 1, starty, startx + h, point[1])
@@ -236,7 +352,6 @@ class MazeGeneration:
 				recursive_divide(q4, point[0] + 1, point[1] + 1)
 			
 			maze = [[0 for _ in range(width)] for _ in range(height)]
-			maze_original_points = []
-			maze_converted_points = []
+			events = EventLog(height, width) if log else None
 			recursive_divide(maze, 0, 0)
-			return maze, maze_original_points, maze_converted_points
+			return maze, events
@@ -0,0 +1,131 @@
+import queue
+import random
+import multiprocessing
+from typing import Optional
+# from snakesim.src.core.maze_gen import MazeGeneration
+from .maze_gen import MazeGeneration
+
+def _produce(commands, out, stop):
+	"""
+	Worker process loop; generates maps from consecutive seeds for the (algorithm, rows, cols) key it was last sent,
+	and blocks while the output queue is full, until stopped
+
+	:param commands: Queue of (key, first seed) items pointing the worker at a new key; a None key makes it idle
+	:param out: Queue to put (key, seed, packed map) items in
+	:param stop: Event signalling the worker to exit
+	"""
+	key, seed = None, 0
+	while not stop.is_set():
+		try:
+			# waits for a key while idle, and otherwise only checks for a new one between maps
+			key, seed = commands.get(timeout=0.1) if key is None else commands.get_nowait()
+			continue
+		except queue.Empty:
+			if key is None:
+				continue
+		item = (key, seed, MazeGeneration.generate_packed(*key, seed))
+		seed += 1
+		# a map for an old key is dropped as soon as the worker is pointed at a new one
+		while not stop.is_set() and commands.empty():
+			try:
+				out.put(item, timeout=0.1)
+				break
+			except queue.Full:
+				continue
+
+class MazePool:
+	"""
+	Keeps a small queue of ready-made maps for the selected maze generation algorithm and map size, generated
+	ahead of time by a background worker process. The queue is flushed whenever the algorithm or size changes.
+
+	The worker is started once, when the pool is created, and is then pointed at each new algorithm and size instead
+	of being replaced, so the pool can be created before Tk and no process is forked once the app holds the display
+	connection. If the worker dies, every request is a miss.
+	"""
+	STREAM = 2 ** 20    # seeds set aside for each key the worker is pointed at, far more than it generates for one
+
+	def __init__(self, size=3, seed=None):
+		self.size = size
+		self.key = None
+		self.hits = 0
+		self.misses = 0
+		self._next_seed = random.randrange(2 ** 32) if seed is None else seed
+		self._commands = multiprocessing.Queue()
+		self._queue = multiprocessing.Queue(size)
+		self._stop = multiprocessing.Event()
+		self._worker: Optional[multiprocessing.Process] = multiprocessing.Process(
+			target=_produce, args=(self._commands, self._queue, self._stop), daemon=True)
+		self._worker.start()
+
+	@property
+	def hit_rate(self):
+		"""
+		Fraction of requests that were served from the queue
+		"""
+		requests = self.hits + self.misses
+		return self.hits / requests if requests else 0.0
+
+	def configure(self, algo, rows, cols):
+		"""
+		Points the pool at the given algorithm and map size, flushing queued maps if either has changed
+
+		:param algo: ID of maze generation algorithm
+		:param rows: Number of rows of the map
+		:param cols: Number of columns of the map
+		"""
+		key = (algo, rows, cols)
+		if key == self.key or self._worker is None:
+			return
+		self.flush()
+		self.key = key
+		self._commands.put((key, self._next_seed))
+		# the next key starts a stream of its own, so that streams never repeat a map
+		self._next_seed += MazePool.STREAM
+
+	def take(self) -> Optional[bytes]:
+		"""
+		Returns the next ready map for the current key as a packed matrix (see MatrixHelpers.pack), or None if
+		no map is ready yet
+
+		:return: Packed map, or None on a miss
+		"""
+		if self.key is not None:
+			try:
+				while True:
+					key, _, packed = self._queue.get_nowait()
+					if key == self.key:
+						self.hits += 1
+						return packed
+			except queue.Empty:
+				pass
+		self.misses += 1
+		return None
+
+	def flush(self):
+		"""
+		Makes the worker idle and discards all queued maps
+		"""
+		if self.key is not None:
+			self._commands.put((None, 0))
+			try:
+				while True:
+					self._queue.get_nowait()
+			except queue.Empty:
+				pass
+		self.key = None
+
+	def close(self):
+		"""
+		Stops the worker; the pool cannot be used afterwards
+		"""
+		if self._worker is None:
+			return
+		self._stop.set()
+		self._worker.join(0.5)
+		if self._worker.is_alive():
+			self._worker.terminate()
+			self._worker.join()
+		self._commands.close()
+		self._queue.close()
+		self.key = None
+		self._worker = None
@@ -0,0 +1,283 @@
+import heapq
+import itertools
+import math
+import struct
+import threading
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import shared_memory
+from typing import List, Optional, Tuple
+# from snakesim.src.core.shared_grid import SharedGrid
+# from snakesim.src.core.worker_pool import WorkerPool
+# from snakesim.src.util.common import Common
+from .shared_grid import SharedGrid
+from .worker_pool import WorkerPool
+from ..util.common import Common
+
+_HEADER = struct.Struct('ddddQ')    # frontier key of each side, best meeting cost found by each side, cells
+_attached = {}      # segment name -> board attached to by this process
+
+class SearchBoard:
+	"""
+	Shared memory the two sides of a parallel bidirectional search meet through. Each side writes only its own half:
+	the distance and parent of every cell it has reached, a bitmap of those cells, the key of its frontier and the
+	cheapest meeting it has seen; and reads the other side's half. A board sent to a worker is pickled as the name of
+	its segment only.
+	"""
+	def __init__(self):
+		self.shm: Optional[shared_memory.SharedMemory] = None
+		self.cells = 0
+		self._owner = True
+		self._views = []
+
+	def __reduce__(self):
+		return SearchBoard.attach, (self.shm.name,)
+
+	@staticmethod
+	def attach(name: str) -> 'SearchBoard':
+		"""
+		Returns the board of a segment, attaching to it on first use; used when unpickling a board in a worker
+
+		:param name: Name of the shared memory segment
+		"""
+		board = _attached.get(name)
+		if board is None:
+			for old in _attached.values():
+				old.close()
+			_attached.clear()
+			board = _attached[name] = SearchBoard()
+			board._open(shared_memory.SharedMemory(name), owner=False)
+		return board
+
+	@staticmethod
+	def _size(cells) -> int:
+		return _HEADER.size + cells * 24 + 2 * ((cells + 7) // 8)
+
+	def _open(self, shm, owner):
+		self.shm, self._owner = shm, owner
+		cells = self.cells = _HEADER.unpack_from(shm.buf)[4]
+		buf, offset = shm.buf, _HEADER.size
+		self.keys = buf[:16].cast('d')
+		self.costs = buf[16:32].cast('d')
+		self.dist = [buf[offset:offset + 8 * cells].cast('d'), buf[offset + 8 * cells:offset + 16 * cells].cast('d')]
+		offset += 16 * cells
+		self.parent = [buf[offset:offset + 4 * cells].cast('i'), buf[offset + 4 * cells:offset + 8 * cells].cast('i')]
+		offset += 8 * cells
+		size = (cells + 7) // 8
+		self.bits = [buf[offset:offset + size], buf[offset + size:offset + 2 * size]]
+		self._views = [self.keys, self.costs, *self.dist, *self.parent, *self.bits]
+
+	def reset(self, cells, start, target):
+		"""
+		Clears the board for a search over the given number of cells, on the main process only
+
+		:param cells: Number of cells of the map
+		:param start: Index of the start cell, reached by the forward side
+		:param target: Index of the target cell, reached by the backward side
+		"""
+		if self.shm is None or self.cells != cells:
+			self.close()
+			shm = shared_memory.SharedMemory(create=True, size=SearchBoard._size(cells))
+			_HEADER.pack_into(shm.buf, 0, 0.0, 0.0, math.inf, math.inf, cells)
+			self._open(shm, owner=True)
+		self.keys[0] = self.keys[1] = 0.0
+		self.costs[0] = self.costs[1] = math.inf
+		for side, cell in enumerate((start, target)):
+			self.bits[side][:] = bytes(len(self.bits[side]))
+			self.dist[side][cell] = 0.0
+			self.parent[side][cell] = -1
+			self.bits[side][cell >> 3] |= 1 << (cell & 7)
+
+	def meeting(self) -> Tuple[float, int]:
+		"""
+		Finds the cell reached by both sides with the cheapest path through it, once both sides have stopped
+
+		:return: Tuple of the cost of the path and the index of the cell, or (inf, -1) if the sides have not met
+		"""
+		both = int.from_bytes(self.bits[0], 'little') & int.from_bytes(self.bits[1], 'little')
+		best, cell = math.inf, -1
+		while both:
+			low = both & -both
+			k = low.bit_length() - 1
+			both ^= low
+			cost = self.dist[0][k] + self.dist[1][k]
+			if cost < best:
+				best, cell = cost, k
+		return best, cell
+
+	def chain(self, side, cell) -> List[int]:
+		"""
+		Follows the parents of one side from a cell back to where that side started
+		"""
+		cells = []
+		while cell != -1:
+			cells.append(cell)
+			cell = self.parent[side][cell]
+		return cells
+
+	def close(self):
+		"""
+		Detaches from the segment, and removes it if this board created it
+		"""
+		if self.shm is None:
+			return
+		for view in self._views:
+			view.release()
+		self._views = []
+		self.shm.close()
+		if self._owner:
+			self.shm.unlink()
+		self.shm = None
+		self.cells = 0
+
+def search_side(board: SearchBoard, grid: SharedGrid, side, start, goal, wraparound, all_directional, weighted, heuristic=None):
+	"""
+	Runs one side of a parallel bidirectional search on a worker: a Dijkstra search (or A*, with a heuristic) from
+	start towards goal that publishes every cell it reaches to the board, and stops once the cheapest meeting found by
+	either side is proven shortest
+
+	:param board: Board shared with the other side
+	:param grid: Shared grid of the map
+	:param side: 0 for the forward side, 1 for the backward side, which follows the moves of the map in reverse
+	:param start: Coordinate this side searches from
+	:param goal: Coordinate the other side searches from
+	:param wraparound: Wrap symmetrically from end-to-end when at edges or corners in matrix
+	:param all_directional: Use neighbors from all 8-directions or standard 4-directions
+	:param weighted: Diagonal moves cost sqrt(2) instead of 1
+	:param heuristic: ID of the heuristic, or None for none
+	:return: Indexes of the cells this side reached, in order, as bytes of an int array
+	"""
+	matrix = grid.snapshot()[1]
+	rows, cols = len(matrix), len(matrix[0])
+	other = 1 - side
+	dist, parent, bits = board.dist[side], board.parent[side], board.bits[side]
+	other_dist, other_bits = board.dist[other], board.bits[other]
+	keys, costs = board.keys, board.costs
+	diagonal = math.sqrt(2) if weighted else 1
+	gscore = {start: 0.0}
+	closed = set()
+	pq = [(Common.heuristic(start, goal, heuristic) if heuristic is not None else 0.0, start)]
+	order = array('i')
+	best = math.inf
+	wrapped = {}    # cell -> cells on the edges that move to it by wrapping around, for the backward side
+	if side == 1 and wraparound:
+		# moves that wrap around diagonally are not symmetric, so the backward side looks up which cells move to a cell
+		edges = {(i, j) for i in (0, rows - 1) for j in range(cols)} | {(i, j) for i in range(rows) for j in (0, cols - 1)}
+		for i, j in edges:
+			plain = Common.valid_moves(i, j, rows, cols, False, all_directional)
+			for move in Common.valid_moves(i, j, rows, cols, True, all_directional):
+				if move not in plain:
+					wrapped.setdefault(move, []).append((i, j))
+	while pq:
+		key, current = heapq.heappop(pq)
+		if current in closed:
+			continue
+		closed.add(current)
+		keys[side] = key
+		if current == goal:
+			continue    # reached the other side's start, which is not searched past
+		# without a heuristic, no path through cells neither side has settled is cheaper than the sum of the keys of
+		# both frontiers; with one, no path is cheaper than the key of either frontier
+		bound = key + keys[other] if heuristic is None else max(key, keys[other])
+		if bound >= min(best, costs[other]):
+			break
+		g = gscore[current]
+		cx, cy = current
+		k0 = cx * cols + cy
+		if side == 0:
+			moves = Common.valid_moves(cx, cy, rows, cols, wraparound, all_directional)
+		else:
+			moves = Common.valid_moves(cx, cy, rows, cols, False, all_directional) + wrapped.get(current, [])
+		for x, y in moves:
+			# the start of the other side may be a wall (the head of the snake), but is entered so that a side that
+			# runs out of cells has always reached it if there is a path
+			if matrix[x][y] and (x, y) != goal:
+				continue
+			# same as MatrixHelpers.check_diagonal_crossing (which is symmetric), checked for diagonal moves only
+			if x != cx and y != cy and abs(x - cx) == 1 and abs(y - cy) == 1 and matrix[x][cy] and matrix[cx][y]:
+				continue
+			assumed = g + (1 if x == cx or y == cy else diagonal)
+			if assumed < gscore.get((x, y), math.inf):
+				gscore[(x, y)] = assumed
+				k = x * cols + y
+				dist[k] = assumed
+				parent[k] = k0
+				mask = 1 << (k & 7)
+				if not bits[k >> 3] & mask:
+					bits[k >> 3] |= mask
+					order.append(k)
+				if other_bits[k >> 3] & mask:
+					cost = assumed + other_dist[k]
+					if cost < best:
+						best = costs[side] = cost
+				heapq.heappush(pq, (assumed + (Common.heuristic((x, y), goal, heuristic) if heuristic is not None else 0), (x, y)))
+	# lets the other side stop too: either the meeting is proven shortest, or this side has run out of cells
+	keys[side] = math.inf
+	return order.tobytes()
+
+class ParallelSearch:
+	"""
+	Bidirectional breadth first, Dijkstra and A* searches with the two frontiers running at once in two worker
+	processes, instead of taking turns in one thread.
+
+	Both sides plan on the same snapshot of the map, published to a shared grid, and meet through a shared board:
+	each side marks the cells it reaches in a bitmap, and when it reaches a cell the other side has marked, records
+	the cost of the path through it. A side stops once no path through the cells still on either frontier can beat
+	the cheapest meeting (the sum of the keys of both frontiers without a heuristic, the larger key with one), or
+	when it runs out of cells; the path is then joined at the cheapest cell both sides reached.
+	"""
+	ALGORITHMS = (2, 3, 4)      # breadth first, Dijkstra and A*
+
+	def __init__(self, pool: WorkerPool):
+		self.pool = pool
+		self.grid = SharedGrid()
+		self.board = SearchBoard()
+		# runs searches for the planning service, since a search waits on two tasks of the pool
+		self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="parallel-search")
+		self._lock = threading.Lock()
+		self._futures = []      # sides of the running search
+
+	def find_path(self, alg, args, heuristic) -> Optional[Tuple[List, List]]:
+		"""
+		Runs a search, waiting for both sides
+
+		:param alg: ID of pathfinding algorithm (2-4)
+		:param args: Start, target, tile matrix (or shared grid), wraparound and eight-directional settings
+		:param heuristic: ID of the heuristic, used by A*
+		:return: Tuple of the path (from the target back to the start) and the visited vertices, as SimEngine.find_path
+		:raises TimeoutError: If a side ran out of time
+		"""
+		start, target, tiles, wraparound, all_directional = args[:5]
+		if isinstance(tiles, SharedGrid):
+			tiles = tiles.snapshot()[1]
+		rows, cols = len(tiles), len(tiles[0])
+		start, target = tuple(start), tuple(target)
+		with self._lock:
+			self.grid.publish(tiles)
+			self.board.reset(rows * cols, start[0] * cols + start[1], target[0] * cols + target[1])
+			weighted, heuristic = alg != 2, heuristic if alg == 4 else None
+			self._futures = futures = [self.pool.submit(search_side, self.board, self.grid, side, a, b, wraparound, all_directional,
+			                                            weighted, heuristic)
+			                           for side, (a, b) in enumerate(((start, target), (target, start)))]
+			try:
+				orders = [array('i', future.result()) for future in futures]
+			except BaseException:
+				for future in futures:
+					self.pool.cancel(future)
+				raise
+			_, meeting = self.board.meeting()
+			path = []
+			if meeting != -1:
+				forward, backward = self.board.chain(0, meeting), self.board.chain(1, meeting)
+				path = [divmod(k, cols) for k in itertools.chain(reversed(backward), forward[1:])]
+		# interleaves the cells reached by both sides, as if they had taken turns
+		visited = [divmod(k, cols) for k in itertools.chain.from_iterable(itertools.zip_longest(*orders)) if k is not None]
+		return path, visited
+
+	def close(self):
+		self.executor.shutdown(wait=False, cancel_futures=True)
+		for future in self._futures:
+			self.pool.cancel(future)
+		with self._lock:
+			self.grid.close()
+			self.board.close()
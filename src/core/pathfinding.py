@@ -7,6 +7,7 @@ from typing import List, Tuple
 # from snakesim.src.util.matrix_helpers import MatrixHelpers
 from ..util.common import Common
 from ..util.matrix_helpers import MatrixHelpers
+from .map_analysis import MapAnalysis
 
 class Pathfinding:
     def random_step(self, start, matrix, wraparound=False, all_directional=False) -> List[Tuple[int, int]]:
@@ -34,7 +35,7 @@ class Pathfinding:
         wt_lst = [move_wt_lookup[coord] for coord in move_lst]
         return random.choices(population=move_lst, weights=wt_lst, k=1)[0]
 
-    def depth_first_search(self, start, target, matrix, wraparound=False, all_directional=False, bidirectional=False):
+    def depth_first_search(self, start, target, matrix, wraparound=False, all_directional=False, bidirectional=False, token=None):
         """
         Returns list of coordinates representing the best path to target in a matrix of shape (rows, cols)
         using the Depth First Search algorithm
@@ -45,10 +46,13 @@ class Pathfinding:
         :param wraparound: Wrap symmetrically from end-to-end when at edges or corners in matrix
         :param all_directional: Use neighbors from all 8-directions or standard 4-directions
         :param bidirectional: Run algorithm bidirectionally (forward and backward pass) or not
+        :param token: Cancellation token, given the number of cells visited out of the cells of the map as progress
         :return: List of coordinates representing the best path to target
         """
         def dfs_step(goal, stack, visited, nonvisited, backtrack):
             nonlocal found
+            if token:
+                token.step(len(visited_ordered), rows * cols)
             current = stack.pop()       # get from the end
             for x, y in Common.valid_moves(current[0], current[1], rows, cols, wraparound, all_directional):
                 if not matrix[x][y] and (x, y) not in visited and not MatrixHelpers.check_diagonal_crossing(current[0], current[1], x, y, matrix):
@@ -78,7 +82,7 @@ class Pathfinding:
                 dfs_step(target, fwd_stack, fwd_visited, bwd_visited, fwd_backtrack)
         return path, visited_ordered
 
-    def breadth_first_search(self, start, target, matrix, wraparound=False, all_directional=False, bidirectional=False):
+    def breadth_first_search(self, start, target, matrix, wraparound=False, all_directional=False, bidirectional=False, token=None):
         """
         Returns list of coordinates representing the best path to target in a matrix of shape (rows, cols)
         using the Breadth First Search algorithm
@@ -89,10 +93,13 @@ class Pathfinding:
         :param wraparound: Wrap symmetrically from end-to-end when at edges or corners in matrix
         :param all_directional: Use neighbors from all 8-directions or standard 4-directions
         :param bidirectional: Run algorithm bidirectionally (forward and backward pass) or not
+        :param token: Cancellation token, given the number of cells visited out of the cells of the map as progress
         :return: List of coordinates representing the best path to target
         """
         def bfs_step(goal, q, visited, nonvisited, backtrack):
             nonlocal found
+            if token:
+                token.step(len(visited_ordered), rows * cols)
             current = q.pop(0)  # get from the start instead of end (this is literally the only difference from DFS)
             for x, y in Common.valid_moves(current[0], current[1], rows, cols, wraparound, all_directional):
                 if not matrix[x][y] and (x, y) not in visited and not MatrixHelpers.check_diagonal_crossing(current[0], current[1], x, y, matrix):
@@ -124,7 +131,7 @@ class Pathfinding:
                 bfs_step(target, fwd_queue, fwd_visited, bwd_visited, fwd_backtrack)
         return path, visited_ordered
 
-    def greedy_best_first_search(self, start, target, matrix, wraparound=False, all_directional=False, bidirectional=False, heuristic=0):
+    def greedy_best_first_search(self, start, target, matrix, wraparound=False, all_directional=False, bidirectional=False, heuristic=0, token=None):
         """
         Returns list of coordinates representing the best path to target in a matrix of shape (rows, cols)
         using a Greedy Best First Search algorithm
@@ -136,10 +143,13 @@ class Pathfinding:
         :param all_directional: Use neighbors from all 8-directions or standard 4-directions
         :param bidirectional: Run algorithm bidirectionally (forward and backward pass) or not
         :param heuristic: Distance metric used
+        :param token: Cancellation token, given the number of cells visited out of the cells of the map as progress
         :return: List of coordinates representing the best path to target
         """
         def greedy_best_first_step(goal, pq, visited, nonvisited, backtrack):
             nonlocal found
+            if token:
+                token.step(len(visited_ordered), rows * cols)
             _, current = heapq.heappop(pq)
             for x, y in Common.valid_moves(current[0], current[1], rows, cols, wraparound, all_directional):
                 if not matrix[x][y] and (x, y) not in visited and not MatrixHelpers.check_diagonal_crossing(current[0], current[1], x, y, matrix):
@@ -174,7 +184,7 @@ class Pathfinding:
                 greedy_best_first_step(target, fwd_pq, fwd_visited, bwd_visited, fwd_backtrack)
         return path, visited_ordered
 
-    def a_star(self, start, target, matrix, wraparound=False, all_directional=False, bidirectional=False, heuristic=0):
+    def a_star(self, start, target, matrix, wraparound=False, all_directional=False, bidirectional=False, heuristic=0, token=None):
         """
         Returns list of coordinates representing the best path to target in a matrix of shape (rows, cols)
         using the A* pathfinding algorithm
@@ -186,10 +196,13 @@ class Pathfinding:
         :param all_directional: Use neighbors from all 8-directions or standard 4-directions
         :param bidirectional: Run algorithm bidirectionally (forward and backward pass) or not
         :param heuristic: Distance metric used
+        :param token: Cancellation token, given the number of cells visited out of the cells of the map as progress
         :return: List of coordinates representing the best path to target
         """
         def a_star_step(goal, pq, visited, nonvisited, gscore, backtrack):
             nonlocal found
+            if token:
+                token.step(len(visited_ordered), rows * cols)
             _, current = heapq.heappop(pq)
             visited.add(current)
             for x, y in Common.valid_moves(current[0], current[1], rows, cols, wraparound, all_directional):
@@ -228,7 +241,7 @@ class Pathfinding:
                 a_star_step(target, fwd_pq, fwd_visited, bwd_visited, fwd_gscore, fwd_backtrack)
         return path, visited_ordered
 
-    def dijkstra(self, start, target, matrix, wraparound=False, all_directional=False, bidirectional=False):
+    def dijkstra(self, start, target, matrix, wraparound=False, all_directional=False, bidirectional=False, token=None):
         """
         Returns list of coordinates representing the best path to target in a matrix of shape (rows, cols)
         using Dijkstra's pathfinding algorithm
@@ -239,11 +252,14 @@ class Pathfinding:
         :param wraparound: Wrap symmetrically from end-to-end when at edges or corners in matrix
         :param all_directional: Use neighbors from all 8-directions or standard 4-directions
         :param bidirectional: Run algorithm bidirectionally (forward and backward pass) or not
+        :param token: Cancellation token, given the number of cells visited out of the cells of the map as progress
         :return: List of coordinates representing the best path to target
         """
     
         def dijkstra_step(goal, pq, visited, nonvisited, gscore, backtrack):
             nonlocal found
+            if token:
+                token.step(len(visited_ordered), rows * cols)
             dist, current = heapq.heappop(pq)
             visited.add(current)
             for x, y in Common.valid_moves(current[0], current[1], rows, cols, wraparound, all_directional):
@@ -283,7 +299,7 @@ class Pathfinding:
         return path, visited_ordered
 
     # https://en.wikipedia.org/wiki/Fringe_search
-    def fringe_search(self, start, target, matrix, wraparound=False, all_directional=False, bidirectional=False, heuristic=0):
+    def fringe_search(self, start, target, matrix, wraparound=False, all_directional=False, bidirectional=False, heuristic=0, token=None):
         """
         Returns list of coordinates representing the best path to target in a matrix of shape (rows, cols)
         using the Fringe Search algorithm
@@ -295,11 +311,14 @@ class Pathfinding:
         :param all_directional: Use neighbors from all 8-directions or standard 4-directions
         :param bidirectional: Run algorithm bidirectionally (forward and backward pass) or not
         :param heuristic: Distance metric used
+        :param token: Cancellation token, given the number of cells visited out of the cells of the map as progress
         :return: List of coordinates representing the best path to target
         """
     
         def fringe_step(goal, fringe, visited, nonvisited, cache, flimit):
             nonlocal found, meeting_point
+            if token:
+                token.step(len(visited_ordered), rows * cols)
             fmin = float('inf')
             for node in fringe:
                 g, parent = cache[node]
@@ -352,7 +371,7 @@ class Pathfinding:
             path.extend(MatrixHelpers.reconstruct_path(meeting_point, fwd_cache, bwd_cache))
         return path, visited_ordered
 
-    def bellman_ford(self, start, target, matrix, wraparound=False, all_directional=False, bidirectional=False):
+    def bellman_ford(self, start, target, matrix, wraparound=False, all_directional=False, bidirectional=False, token=None):
         """
         Returns list of coordinates representing the best path to target in a matrix of shape (rows, cols)
         using the Bellman-Ford algorithm
@@ -367,6 +386,7 @@ class Pathfinding:
         :param wraparound: Wrap symmetrically from end-to-end when at edges or corners in matrix
         :param all_directional: Use neighbors from all 8-directions or standard 4-directions
         :param bidirectional: Run algorithm bidirectionally (forward and backward pass) or not
+        :param token: Cancellation token, given the number of cells visited out of the cells of the map as progress
         :return: List of coordinates representing the best path to target
         :return:
         """
@@ -377,6 +397,8 @@ class Pathfinding:
     
         def relax_step(goal, queue, visited, nonvisited, dists, backtrack):
             nonlocal ctr, found
+            if token:
+                token.step(len(visited_ordered), rows * cols)
             ctr += 1  # Relaxation step
             u = queue.popleft()
             visited.add(u)
@@ -406,6 +428,8 @@ class Pathfinding:
         edges, path = [], []
         ctr = 0
         for x in range(rows):  # Get edges with weights
+            if token:
+                token.check()
             for y in range(cols):
                 for nx, ny in Common.valid_moves(x, y, rows, cols, wraparound, all_directional):
                     if not matrix[nx][ny] and not MatrixHelpers.check_diagonal_crossing(x, y, nx, ny, matrix):
@@ -423,10 +447,32 @@ class Pathfinding:
 
 
 
+    def junction_graph_search(self, start, target, matrix, wraparound=False, all_directional=False, bidirectional=False, analysis=None, token=None):
+        """
+        Returns list of coordinates representing the best path to target in a matrix of shape (rows, cols)
+        using Dijkstra's algorithm on the junction graph of the map (see MapAnalysis), skipping filled dead ends
+        and only expanding the corridors of relaxed edges
+
+        :param start: Start coordinate
+        :param target: Target coordinate
+        :param matrix: 2D matrix
+        :param wraparound: Wrap symmetrically from end-to-end when at edges or corners in matrix
+        :param all_directional: Use neighbors from all 8-directions or standard 4-directions
+        :param bidirectional: Unused, the junction graph is searched in one direction
+        :param analysis: Precomputed analysis of the walls of the map; built from the matrix if not given
+        :param token: Cancellation token, given the number of cells visited out of the cells of the map as progress
+        :return: List of coordinates representing the best path to target
+        """
+        if analysis is None:
+            analysis = MapAnalysis(matrix, wraparound, all_directional)
+        if token:
+            token.check()
+        return analysis.shortest_path(tuple(start), tuple(target), matrix)
+
     # https://en.wikipedia.org/wiki/Iterative_deepening_A*
     # since this is recursive, only good for small matrices
     # current implementation of the algorithm is very error prone, and goes into infinite loops often or when 4-directions are used
-    def iterative_deepening_a_star(self, start, target, matrix, wraparound=False, all_directional=False, bidirectional=False, heuristic=0):
+    def iterative_deepening_a_star(self, start, target, matrix, wraparound=False, all_directional=False, bidirectional=False, heuristic=0, token=None):
         """
         Returns list of coordinates representing the best path to target in a matrix of shape (rows, cols)
         using the Iterative Deepening A* path search algorithm (A* variant)
@@ -436,9 +482,12 @@ class Pathfinding:
         :param matrix: 2D matrix
         :param wraparound: Wrap symmetrically from end-to-end when at edges or corners in matrix
         :param all_directional: Use neighbors from all 8-directions or standard 4-directions
+        :param token: Cancellation token, given the number of cells visited out of the cells of the map as progress
         :return: List of coordinates representing the best path to target
         """
         def threshold_dfs(path, g, threshold):
+            if token:
+                token.step(len(visited_ordered), rows * cols)
             current = path[-1]
             f = g + Common.heuristic(current, target, heuristic)
             if f > threshold:
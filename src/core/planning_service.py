@@ -0,0 +1,74 @@
+import itertools
+import queue
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from typing import Callable, Hashable, Optional
+
+class PlanningService:
+	"""
+	Plans paths off the main thread, one request at a time.
+
+	A request runs a planning function on a worker with a snapshot of the grid, tagged with the grid version the
+	snapshot was taken at. Finished plans are handed back through a queue that the main thread drains when it polls;
+	a plan is only returned if it answers the latest request and the grid is still at the version it was planned on,
+	and is otherwise discarded as stale. The worker never touches the grid or the UI.
+	"""
+	def __init__(self, executor: Optional[Executor] = None):
+		self.executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix="planner")
+		self.results = queue.Queue()
+		self.pending = None     # (request id, version) of the latest request, until its plan is polled
+		self.requests = 0
+		self.discarded = 0
+		self._ids = itertools.count(1)
+
+	@property
+	def busy(self) -> bool:
+		return self.pending is not None
+
+	def request(self, version: Hashable, func: Callable, *args, executor: Optional[Executor] = None) -> int:
+		"""
+		Starts planning, replacing the pending request (whose plan will be discarded)
+
+		:param version: Version of the grid the arguments were taken from
+		:param func: Planning function, run on the worker
+		:param args: Arguments of the planning function, which must not be modified until it has finished
+		:param executor: Executor to run this request on instead of the service's own
+		:return: ID of the request
+		"""
+		request_id = next(self._ids)
+		self.pending = (request_id, version)
+		self.requests += 1
+		future = (executor or self.executor).submit(func, *args)
+		# runs on the worker thread, so it only hands the future over
+		future.add_done_callback(lambda done: self.results.put((request_id, version, done)))
+		return request_id
+
+	def poll(self, version: Hashable) -> Optional[Future]:
+		"""
+		Drains finished plans, on the main thread
+
+		:param version: Current version of the grid
+		:return: The finished future of the pending request if it is still current, or None
+		"""
+		while True:
+			try:
+				request_id, planned_on, future = self.results.get_nowait()
+			except queue.Empty:
+				return None
+			if self.pending is None or request_id != self.pending[0]:
+				self.discarded += 1
+				continue
+			self.pending = None
+			if planned_on != version:
+				self.discarded += 1
+				continue
+			return future
+
+	def cancel(self):
+		"""
+		Drops the pending request; its plan is discarded when it finishes
+		"""
+		self.pending = None
+
+	def close(self):
+		self.pending = None
+		self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,115 @@
+import struct
+from multiprocessing import shared_memory
+from typing import List, Optional, Tuple
+
+_HEADER = struct.Struct('QII')      # sequence number, rows, columns
+_attached = {}      # segment name -> grid attached to by this process
+
+class SharedGrid:
+	"""
+	Tile matrix in shared memory, one byte per cell, so that worker processes can read the map without it being
+	pickled for every task.
+
+	The main process publishes the tiles into a shared memory segment. A grid sent to a worker is pickled as the name
+	of its segment only; the worker attaches to the segment once, and can then index the grid like the tile matrix
+	(grid[row][col]), reading the rows straight from shared memory. Publishing is guarded by a sequence number (a
+	seqlock) in the header of the segment, which is odd while the tiles are being written: readers needing a
+	consistent copy retry until they see the same even number before and after copying. A new segment is allocated
+	when the size of the map changes.
+	"""
+	def __init__(self):
+		self.shm: Optional[shared_memory.SharedMemory] = None
+		self.rows, self.cols = 0, 0
+		self._owner = True
+		self._rows = []
+
+	def __len__(self):
+		return self.rows
+
+	def __getitem__(self, row) -> memoryview:
+		return self._rows[row]
+
+	def __reduce__(self):
+		return SharedGrid.attach, (self.shm.name,)
+
+	@property
+	def name(self) -> Optional[str]:
+		return self.shm.name if self.shm else None
+
+	@property
+	def version(self) -> int:
+		"""
+		Number of times the tiles were published
+		"""
+		return _HEADER.unpack_from(self.shm.buf)[0] // 2 if self.shm else 0
+
+	@staticmethod
+	def attach(name: str) -> 'SharedGrid':
+		"""
+		Returns the grid of a segment, attaching to it on first use; used when unpickling a grid in a worker
+
+		:param name: Name of the shared memory segment
+		"""
+		grid = _attached.get(name)
+		if grid is None:
+			# the map was resized, so the segments attached to before are no longer used
+			for old in _attached.values():
+				old.close()
+			_attached.clear()
+			grid = _attached[name] = SharedGrid()
+			grid._open(shared_memory.SharedMemory(name), owner=False)
+		return grid
+
+	def _open(self, shm, owner):
+		self.shm, self._owner = shm, owner
+		_, self.rows, self.cols = _HEADER.unpack_from(shm.buf)
+		self._rows = [shm.buf[_HEADER.size + row * self.cols:_HEADER.size + (row + 1) * self.cols] for row in range(self.rows)]
+
+	def publish(self, tiles: List[List[int]]) -> int:
+		"""
+		Writes the tiles into shared memory, on the main process only
+
+		:param tiles: Tile matrix, with values from 0 to 255
+		:return: Version of the published tiles
+		"""
+		rows, cols = len(tiles), len(tiles[0])
+		if (rows, cols) != (self.rows, self.cols):
+			self.close()
+			shm = shared_memory.SharedMemory(create=True, size=_HEADER.size + rows * cols)
+			_HEADER.pack_into(shm.buf, 0, 0, rows, cols)
+			self._open(shm, owner=True)
+		buf = self.shm.buf
+		sequence = _HEADER.unpack_from(buf)[0] + 1
+		struct.pack_into('Q', buf, 0, sequence)
+		for view, row in zip(self._rows, tiles):
+			view[:] = bytes(row)
+		struct.pack_into('Q', buf, 0, sequence + 1)
+		return (sequence + 1) // 2
+
+	def snapshot(self) -> Tuple[int, List[bytes]]:
+		"""
+		Copies the tiles, retrying while they are being published
+
+		:return: Tuple of the version and the rows of tiles
+		"""
+		while True:
+			before = _HEADER.unpack_from(self.shm.buf)[0]
+			if before % 2 == 0:
+				rows = [bytes(view) for view in self._rows]
+				if _HEADER.unpack_from(self.shm.buf)[0] == before:
+					return before // 2, rows
+
+	def close(self):
+		"""
+		Detaches from the segment, and removes it if this grid created it
+		"""
+		if self.shm is None:
+			return
+		for view in self._rows:
+			view.release()
+		self._rows = []
+		self.shm.close()
+		if self._owner:
+			self.shm.unlink()
+		self.shm = None
+		self.rows, self.cols = 0, 0
@@ -0,0 +1,390 @@
+import random
+from concurrent.futures import TimeoutError
+from typing import Callable, List, Optional, Tuple
+# from snakesim.src.core.map_analysis import MapAnalysis
+# from snakesim.src.core.parallel_search import ParallelSearch
+# from snakesim.src.core.planning_service import PlanningService
+# from snakesim.src.core.shared_grid import SharedGrid
+# from snakesim.src.core.snake_body import SnakeBody
+# from snakesim.src.util.common import Common, AppException
+# from snakesim.src.util.sim_global import SimConfig, SimState
+from .map_analysis import MapAnalysis
+from .parallel_search import ParallelSearch
+from .planning_service import PlanningService
+from .shared_grid import SharedGrid
+from .snake_body import SnakeBody
+from ..util.common import Common, AppException
+from ..util.sim_global import SimConfig, SimState
+
+class SimEngine:
+	"""
+	Game rules of the simulator (target placement, moves, growth, collisions and the chase mode), independent of any
+	display. The engine owns the map, snake and target state kept in SimState, and runs without tkinter; views
+	subscribe to it as observers, and are called with an event name and its data on every change:
+
+	- 'target': the target was placed or moved, with its (row, column)
+	- 'caught': the snake reached the target, which was removed
+	- 'plan': a new path was planned, with the path and the visited cells
+	- 'move': the snake moved, with its new head and removed tail as (row, column, item); observers drawing the
+	  snake may store the item drawing the new head in SNAKE.items[0]
+	- 'grow': the snake grew by the given (row, column) at its tail; observers may store its item in SNAKE.items[-1]
+	- 'timeout': planning took too long and was given up
+
+	With a planning service, paths are planned off the main thread: a step that needs a new path requests one and
+	raises AppException.PlanPending, and the step is taken once the plan has arrived. Grid changes must be reported
+	with grid_changed(), so that plans made on an older grid are discarded. With a shared grid, the tiles are
+	published to shared memory for each request instead of being copied, and planners in worker processes read them
+	from there. With a parallel search, bidirectional breadth first, Dijkstra and A* searches run both of their
+	frontiers at once, on two worker processes.
+	"""
+	GAME_OVER = (AppException.RanIntoObject, AppException.TargetBlocked, AppException.TargetCaught)
+
+	def __init__(self, config: SimConfig, state: SimState, core, timeout_call: Optional[Callable] = None,
+	             planner: Optional[PlanningService] = None, shared_grid: Optional[SharedGrid] = None,
+	             parallel: Optional[ParallelSearch] = None):
+		self.config = config
+		self.state = state
+		self.core = core
+		self.planner = planner
+		self.shared_grid = shared_grid
+		self.parallel = parallel
+		self.observers: List[Callable] = []
+		self.steps = 0
+		self._timeout_call = timeout_call
+
+	def subscribe(self, observer: Callable):
+		"""
+		Adds an observer, called as observer(event, *data) on every change of the simulation state
+		"""
+		self.observers.append(observer)
+
+	def unsubscribe(self, observer: Callable):
+		self.observers.remove(observer)
+
+	def _notify(self, event, *data):
+		for observer in self.observers:
+			observer(event, *data)
+
+	def grid_changed(self):
+		"""
+		Records a change of the tile matrix made outside of the engine
+		"""
+		self.state.GRID_VERSION += 1
+
+	def reset(self):
+		"""
+		Clears the map and the snake, sized to the current number of rows and columns
+		"""
+		self.grid_changed()
+		self.state.TILES[:] = [[0 for _ in range(self.config.COLS)] for _ in range(self.config.ROWS)]
+		self.state.MAP_ANALYSIS = None
+		self.state.SNAKE = SnakeBody(self.config.ROWS, self.config.COLS)
+		self.state.HEAD[:] = [None, None]
+		self.state.ROUTING[:] = []
+		self.state.TARGET_PLACED = False
+
+	def reset_snake(self):
+		"""
+		Removes the snake and the target from the map
+		"""
+		self.grid_changed()
+		for row, col, _ in self.state.SNAKE:
+			self.state.TILES[row][col] = 0
+		self.state.ROUTING[:] = []
+		self.state.HEAD[:] = [None, None]
+		self.state.SNAKE = SnakeBody(self.config.ROWS, self.config.COLS)
+		self.state.TARGET_PLACED = False
+
+	def reset_map(self):
+		"""
+		Removes every wall from the map, keeping the snake
+		"""
+		self.grid_changed()
+		self.state.MAP_ANALYSIS = None
+		self.state.TILES[:] = [[0 for _ in range(self.config.COLS)] for _ in range(self.config.ROWS)]
+		for row, col, _ in self.state.SNAKE:
+			self.state.TILES[row][col] = SnakeBody.TILE
+
+	def load_map(self, matrix: List[List[int]]):
+		"""
+		Replaces the map with the given matrix of walls (1) and free cells (0); the snake must be reset first
+		"""
+		self.grid_changed()
+		self.state.TILES[:] = [[1 if val else 0 for val in row] for row in matrix]
+		self.state.MAP_ANALYSIS = None
+
+	def spawn_snake(self, row=None, col=None):
+		"""
+		Places a snake of length one on the given cell, or on a random free cell
+
+		:param row: Row of the head
+		:param col: Column of the head
+		"""
+		while row is None or self.state.TILES[row][col]:
+			row, col = random.randrange(self.config.ROWS), random.randrange(self.config.COLS)
+		self.grid_changed()
+		self.state.TILES[row][col] = SnakeBody.TILE
+		self.state.SNAKE.push_head(row, col)
+		self.state.HEAD[:] = row, col
+		self.state.PREV[:] = self.state.CURR[:] = row, col
+
+	def update_target(self):
+		"""
+		Randomly modifies the location of the target, to a free cell that is not in a closed space
+		"""
+		self.state.TARGET[:] = [random.randrange(self.config.ROWS), random.randrange(self.config.COLS)]
+		while True:
+			if self.state.TILES[self.state.TARGET[0]][self.state.TARGET[1]] == 0:
+				if not Common.check_closed_path(self.state.TILES, self.state.TARGET[0], self.state.TARGET[1])[0]:
+					break
+			self.state.TARGET[:] = [random.randrange(self.config.ROWS), random.randrange(self.config.COLS)]
+
+	def place_target(self):
+		"""
+		Places a new target at a random location
+		"""
+		self.update_target()
+		self.state.TARGET_PLACED = True
+		self._notify('target', *self.state.TARGET)
+
+	def set_direction(self, direction):
+		"""
+		Changes the direction of movement in the games
+
+		:param direction: -1/1 for left/right, 2/-2 for up/down
+		"""
+		if self.state.LAST_DIRECTION_IN_GAME[0] is None or self.state.LAST_DIRECTION_IN_GAME[1] is None:
+			self.state.LAST_DIRECTION_IN_GAME[:] = self.state.CURRENT_DIRECTION_IN_GAME
+		if direction == -1:
+			self.state.CURRENT_DIRECTION_IN_GAME[:] = [0, -1]
+		elif direction == 1:
+			self.state.CURRENT_DIRECTION_IN_GAME[:] = [0, 1]
+		elif direction == 2:
+			self.state.CURRENT_DIRECTION_IN_GAME[:] = [-1, 0]
+		else:
+			self.state.CURRENT_DIRECTION_IN_GAME[:] = [1, 0]
+
+	def move_target(self, direction) -> bool:
+		"""
+		Moves the target (the player, in the chase game) one cell in the given direction, if that cell is free
+
+		:param direction: -1/1 for left/right, 2/-2 for up/down
+		:return: True if the target has moved
+		"""
+		self.set_direction(direction)
+		if self.state.HEAD == self.state.TARGET:
+			return False
+		adjusted = Common.diagonal_adjusted(self.state.TARGET[0], self.state.TARGET[1], self.state.TARGET[0] + self.state.CURRENT_DIRECTION_IN_GAME[0],
+		                                    self.state.TARGET[1] + self.state.CURRENT_DIRECTION_IN_GAME[1], self.config.ROWS, self.config.COLS)
+		if self.state.TILES[adjusted[0]][adjusted[1]] != 0:
+			return False
+		self.state.TARGET[:] = [adjusted[0], adjusted[1]]
+		self.state.TARGET_PLACED = True
+		self._notify('target', *self.state.TARGET)
+		return True
+
+	def map_analysis(self) -> MapAnalysis:
+		"""
+		Returns the analysis (dead ends and junction graph) of the walls on the current map, building it again if
+		the map or the movement settings have changed since it was last built
+		"""
+		analysis = self.state.MAP_ANALYSIS
+		if analysis is None or analysis.wraparound != self.config.WRAPAROUND or analysis.all_directional != self.config.EIGHT_DIRECTIONAL \
+				or (analysis.rows, analysis.cols) != (self.config.ROWS, self.config.COLS):
+			walls = [[1 if val == 1 else 0 for val in row] for row in self.state.TILES]
+			analysis = self.state.MAP_ANALYSIS = MapAnalysis(walls, self.config.WRAPAROUND, self.config.EIGHT_DIRECTIONAL)
+		return analysis
+
+	@staticmethod
+	def find_path(core, alg, args, heuristic, analysis=None, timeout_call=None, token=None):
+		"""
+		Runs a pathfinding algorithm; only reads its arguments, so it may run on another thread
+
+		:param core: Pathfinding implementation
+		:param alg: ID of pathfinding algorithm (1-9)
+		:param args: Start, target, tile matrix (or shared grid), wraparound, eight-directional and bidirectional settings
+		:param heuristic: ID of the heuristic
+		:param analysis: Analysis of the map, for junction graph search
+		:param timeout_call: Function running IDA* with a time limit, returning None if it ran out of time
+		:param token: Cancellation token for the search (not passed on to the timeout call)
+		:return: Tuple of the path (from the target back to the start) and the visited vertices
+		"""
+		if isinstance(args[2], SharedGrid):
+			# a consistent copy of the rows costs one memcpy per row, and is faster to index than the shared memory
+			args = args[:2] + (args[2].snapshot()[1],) + args[3:]
+		if alg == 1:
+			return core.depth_first_search(*args, token=token)
+		elif alg == 2:
+			return core.breadth_first_search(*args, token=token)
+		elif alg == 3:
+			return core.dijkstra(*args, token=token)
+		elif alg == 4:
+			return core.a_star(*args, heuristic, token=token)
+		elif alg == 5:
+			return core.greedy_best_first_search(*args, heuristic, token=token)
+		elif alg == 6:
+			return core.fringe_search(*args, heuristic, token=token)
+		elif alg == 7:
+			return core.bellman_ford(*args, token=token)
+		elif alg == 8:
+			if timeout_call:
+				return timeout_call(core.iterative_deepening_a_star, *args, heuristic)
+			return core.iterative_deepening_a_star(*args, heuristic, token=token)
+		return core.junction_graph_search(*args, analysis=analysis, token=token)
+
+	def plan_args(self, x, y, alg, snapshot=False):
+		"""
+		Returns the arguments of find_path for planning from the given coordinates to the target
+
+		:param x: Base X coordinate
+		:param y: Base Y coordinate
+		:param alg: ID of pathfinding algorithm
+		:param snapshot: Give a copy (or the published shared grid) instead of the live tiles, for planning elsewhere
+		:return: Tuple of the core, algorithm, arguments, heuristic, map analysis and timeout call
+		"""
+		tiles = self.state.TILES
+		if snapshot and self.shared_grid is not None:
+			self.shared_grid.publish(tiles)
+			tiles = self.shared_grid
+		elif snapshot:
+			tiles = [row[:] for row in tiles]
+		args = ((x, y), tuple(self.state.TARGET), tiles, self.config.WRAPAROUND, self.config.EIGHT_DIRECTIONAL, self.config.BIDIRECTIONAL)
+		# snapshots are planned by the planning service, whose executor enforces its own time limit
+		timeout_call = None if snapshot else self._timeout_call
+		return self.core, alg, args, self.config.HEURISTIC, self.map_analysis() if alg == 9 else None, timeout_call
+
+	def _runs_in_parallel(self, alg) -> bool:
+		return self.parallel is not None and self.config.BIDIRECTIONAL and alg in ParallelSearch.ALGORITHMS
+
+	def _finish_plan(self, path_and_visited):
+		if path_and_visited is None:
+			self._notify('timeout')
+			raise AppException.PlanTimedOut
+		del path_and_visited[0][-1]
+		return path_and_visited
+
+	def best_path(self, x, y, alg):
+		"""
+		Returns the shortest or best path (along with the visited vertices) from the given coordinates to the target,
+		found with the given algorithm
+
+		:param x: Base X coordinate
+		:param y: Base Y coordinate
+		:param alg: ID of pathfinding algorithm
+		:return: Tuple of the path and visited vertices, or the next move as a coordinate tuple for random steps
+		:raises AppException.PlanTimedOut: If the search ran out of time
+		"""
+		if alg == 0 or not alg:
+			return self.core.random_step((x, y), self.state.TILES, self.config.WRAPAROUND, self.config.EIGHT_DIRECTIONAL)
+		if self._runs_in_parallel(alg):
+			_, alg, args, heuristic, _, _ = self.plan_args(x, y, alg)
+			try:
+				return self._finish_plan(self.parallel.find_path(alg, args, heuristic))
+			except TimeoutError:
+				return self._finish_plan(None)
+		return self._finish_plan(SimEngine.find_path(*self.plan_args(x, y, alg)))
+
+	def _planned_path(self, x, y, alg):
+		"""
+		Returns the plan requested from the planning service, or requests one
+
+		:raises AppException.PlanPending: If the plan has not arrived yet
+		"""
+		version = (self.state.GRID_VERSION, x, y, alg)
+		future = self.planner.poll(version)
+		if future is None:
+			if not self.planner.busy and self._runs_in_parallel(alg):
+				_, alg, args, heuristic, _, _ = self.plan_args(x, y, alg, snapshot=True)
+				self.planner.request(version, self.parallel.find_path, alg, args, heuristic, executor=self.parallel.executor)
+			elif not self.planner.busy:
+				self.planner.request(version, SimEngine.find_path, *self.plan_args(x, y, alg, snapshot=True))
+			raise AppException.PlanPending
+		try:
+			path_and_visited = future.result()
+		except TimeoutError:
+			path_and_visited = None
+		return self._finish_plan(path_and_visited)
+
+	def _next_move(self) -> Tuple[int, int]:
+		if self.state.SNAKE_GAME:
+			head, direction = self.state.HEAD, self.state.CURRENT_DIRECTION_IN_GAME
+			if self.state.TILES[(head[0] + direction[0]) % self.config.ROWS][(head[1] + direction[1]) % self.config.COLS] != 0:
+				direction = self.state.LAST_DIRECTION_IN_GAME
+			else:
+				self.state.LAST_DIRECTION_IN_GAME[:] = direction
+			return Common.diagonal_adjusted(head[0], head[1], head[0] + direction[0], head[1] + direction[1], self.config.ROWS, self.config.COLS)
+		try:
+			# when snake is chasing, currently this doesn't re-evaluate the best path immediately when the
+			# target's position has changed, maybe something to-do in the future; moreover this gives the snake
+			# AI a more natural feeling, compared to knowing the target's location at all times (idk)
+			if not self.state.ROUTING or Common.check_path_blocked(self.state.ROUTING, self.state.TILES):
+				if self.planner and self.config.ALGO:
+					path_and_visited = self._planned_path(self.state.HEAD[0], self.state.HEAD[1], self.config.ALGO)
+				else:
+					path_and_visited = self.best_path(self.state.HEAD[0], self.state.HEAD[1], alg=self.config.ALGO)
+				if not isinstance(path_and_visited[0], int):
+					self.state.ROUTING[:] = path_and_visited[0]
+					self._notify('plan', path_and_visited[0], path_and_visited[1])
+				else:
+					self.state.ROUTING[:] = path_and_visited
+			if isinstance(self.state.ROUTING[-1], tuple):
+				return self.state.ROUTING.pop()
+			newpos = tuple(self.state.ROUTING)
+			self.state.ROUTING.clear()
+			return newpos
+		except IndexError:
+			raise AppException.TargetBlocked
+
+	def step(self) -> Tuple[int, int]:
+		"""
+		Advances the simulation by one move of the snake
+
+		:return: New position of the head
+		:raises AppException.RanIntoObject: If the snake ran into a wall or itself
+		:raises AppException.TargetBlocked: If there is no path to the target
+		:raises AppException.TargetCaught: If the snake caught the target in the chase game
+		:raises AppException.PlanPending: If the step waits for a path from the planning service
+		:raises AppException.PlanTimedOut: If the search for the path ran out of time
+		"""
+		if not self.state.SNAKE_CHASING and not self.state.TARGET_PLACED:
+			self.place_target()
+		newpos = self._next_move()
+		if self.state.TILES[newpos[0]][newpos[1]] != 0:
+			raise AppException.RanIntoObject
+		snake = self.state.SNAKE
+		tail = snake.pop_tail()
+		self.state.TILES[tail[0]][tail[1]] = 0
+		self.state.TILES[newpos[0]][newpos[1]] = SnakeBody.TILE
+		snake.push_head(newpos[0], newpos[1])
+		self.state.PREV[:] = self.state.CURR
+		self.state.CURR[:] = snake.tail
+		self.state.HEAD[:] = newpos
+		self.steps += 1
+		self._notify('move', newpos, tail)
+		if self.state.HEAD == self.state.TARGET:
+			self.state.TARGET_PLACED = False
+			self._notify('caught')
+			if self.state.SNAKE_CHASING:
+				raise AppException.TargetCaught
+			elif self.state.SNAKE_GAME:
+				new_tail = self.core.random_step((self.state.CURR[0], self.state.CURR[1]), self.state.TILES)
+				self.state.TILES[new_tail[0]][new_tail[1]] = SnakeBody.TILE
+				snake.push_tail(new_tail[0], new_tail[1])
+				self.state.PREV[:] = self.state.CURR
+				self.state.CURR[:] = new_tail[0], new_tail[1]
+				self._notify('grow', new_tail)
+		return newpos
+
+	def run(self, n) -> int:
+		"""
+		Runs up to n steps, stopping early if the game ends
+
+		:param n: Number of steps
+		:return: Number of steps run
+		"""
+		for i in range(n):
+			try:
+				self.step()
+			except SimEngine.GAME_OVER:
+				return i
+		return n
@@ -0,0 +1,78 @@
+from collections import deque
+from typing import Iterator, Optional, Tuple
+
+class SnakeBody:
+	"""
+	Cells of the snake from head to tail, kept as flat, row-major indices in a deque alongside the canvas item
+	drawing each cell, with an occupancy bitmap of the map. Pushing the head, growing or popping the tail, and
+	checking whether a cell is part of the snake all take constant time, whatever the length of the snake.
+	"""
+	TILE = 2    # value of snake cells on the tile matrix (free cells are 0, walls are 1)
+
+	def __init__(self, rows, cols):
+		self.rows, self.cols = rows, cols
+		self.cells = deque()
+		self.items = deque()
+		self.occupied = bytearray(rows * cols)
+
+	def __len__(self):
+		return len(self.cells)
+
+	def __contains__(self, cell):
+		row, col = cell
+		return 0 <= row < self.rows and 0 <= col < self.cols and bool(self.occupied[row * self.cols + col])
+
+	def __iter__(self) -> Iterator[Tuple[int, int, int]]:
+		"""
+		Yields (row, column, item) for every cell, from head to tail
+		"""
+		for k, item in zip(self.cells, self.items):
+			yield k // self.cols, k % self.cols, item
+
+	@property
+	def head(self) -> Optional[Tuple[int, int]]:
+		return divmod(self.cells[0], self.cols) if self.cells else None
+
+	@property
+	def tail(self) -> Optional[Tuple[int, int]]:
+		return divmod(self.cells[-1], self.cols) if self.cells else None
+
+	@property
+	def head_item(self) -> Optional[int]:
+		return self.items[0] if self.items else None
+
+	def push_head(self, row, col, item=0):
+		"""
+		Adds a cell in front of the head
+
+		:param row: Row of the cell
+		:param col: Column of the cell
+		:param item: Canvas item drawing the cell
+		"""
+		k = row * self.cols + col
+		self.cells.appendleft(k)
+		self.items.appendleft(item)
+		self.occupied[k] = 1
+
+	def push_tail(self, row, col, item=0):
+		"""
+		Adds a cell behind the tail
+
+		:param row: Row of the cell
+		:param col: Column of the cell
+		:param item: Canvas item drawing the cell
+		"""
+		k = row * self.cols + col
+		self.cells.append(k)
+		self.items.append(item)
+		self.occupied[k] = 1
+
+	def pop_tail(self) -> Tuple[int, int, int]:
+		"""
+		Removes the tail
+
+		:return: Row, column and canvas item of the removed cell
+		"""
+		k = self.cells.pop()
+		self.occupied[k] = 0
+		return k // self.cols, k % self.cols, self.items.pop()
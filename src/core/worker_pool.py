@@ -0,0 +1,206 @@
+import itertools
+import multiprocessing
+import threading
+import time
+from collections import deque
+from concurrent.futures import CancelledError, Executor, Future, TimeoutError
+from multiprocessing import connection, resource_tracker
+from multiprocessing.reduction import ForkingPickler
+from typing import Optional
+
+def _serve(conn):
+	"""
+	Worker process loop; runs (task id, function, args, kwargs) tasks received on the connection one at a time and
+	sends back (task id, succeeded, result or exception), until it receives None
+
+	:param conn: Worker end of the pipe to the pool
+	"""
+	while True:
+		task = conn.recv()
+		if task is None:
+			break
+		task_id, func, args, kwargs = task
+		try:
+			conn.send((task_id, True, func(*args, **kwargs)))
+		except BaseException as error:
+			conn.send((task_id, False, error))
+
+class _Worker:
+	def __init__(self, context):
+		self.conn, child = context.Pipe()
+		self.process = context.Process(target=_serve, args=(child,), daemon=True)
+		self.process.start()
+		child.close()
+		self.task = None    # (task id, future, deadline) of the running task
+
+	def kill(self):
+		self.process.terminate()
+		self.process.join()
+		self.conn.close()
+
+class WorkerPool(Executor):
+	"""
+	Long-lived worker processes for CPU-heavy calls, started once and reused for every task.
+
+	Tasks are queued and sent to idle workers over a pipe each, and their results are returned through futures. A task
+	may have a deadline: a task still running when its deadline passes is cancelled by terminating its worker, which
+	is replaced right away so the pool stays warm, and its future fails with a TimeoutError. A manager thread in the
+	calling process dispatches tasks and collects results; it never runs the tasks themselves.
+	"""
+	def __init__(self, size=2, timeout: Optional[float] = None, context=None):
+		self.size = size
+		self.timeout = timeout
+		self.completed = 0
+		self.timed_out = 0
+		self._context = multiprocessing.get_context(context)
+		self._backlog = deque()     # (task id, pickled task, timeout, future)
+		self._lock = threading.Lock()
+		self._wake, self._waker = multiprocessing.Pipe(duplex=False)
+		self._aborted = set()       # futures of running tasks to stop
+		self._closed = False
+		self._ids = itertools.count(1)
+		# forked workers share this process's resource tracker, so that shared memory they attach to is not removed
+		# when one of them exits
+		resource_tracker.ensure_running()
+		self._workers = [_Worker(self._context) for _ in range(size)]
+		self._manager = threading.Thread(target=self._manage, name="worker-pool", daemon=True)
+		self._manager.start()
+
+	def submit(self, fn, /, *args, **kwargs) -> Future:
+		"""
+		Queues a call, with the pool's default deadline
+
+		:return: Future of the result
+		"""
+		return self.submit_with_timeout(self.timeout, fn, *args, **kwargs)
+
+	def submit_with_timeout(self, timeout: Optional[float], fn, /, *args, **kwargs) -> Future:
+		"""
+		Queues a call with a deadline; the function and arguments must be picklable, and are pickled right away, so
+		they may be changed once this returns
+
+		:param timeout: Seconds the call may run for once started, or None for no limit
+		:return: Future of the result, failing with TimeoutError if the deadline passes
+		"""
+		future = Future()
+		task_id = next(self._ids)
+		try:
+			task = ForkingPickler.dumps((task_id, fn, args, kwargs))
+		except Exception as error:     # e.g. an argument that cannot be pickled
+			future.set_exception(error)
+			return future
+		with self._lock:
+			if self._closed:
+				raise RuntimeError("cannot submit to a closed worker pool")
+			self._backlog.append((task_id, task, timeout, future))
+			self._waker.send_bytes(b'')
+		return future
+
+	def call(self, fn, *args, timeout: Optional[float] = None, **kwargs):
+		"""
+		Runs a call and waits for its result
+
+		:return: The result, or None if the call ran out of time
+		"""
+		try:
+			return self.submit_with_timeout(timeout, fn, *args, **kwargs).result()
+		except TimeoutError:
+			return None
+
+	def cancel(self, future: Future) -> bool:
+		"""
+		Cancels a task; a task that has started is stopped by terminating its worker, which is replaced
+
+		:return: False if the task had already finished
+		"""
+		if future.cancel():
+			return True
+		if future.done():
+			return False
+		with self._lock:
+			self._aborted.add(future)
+			self._waker.send_bytes(b'')
+		return True
+
+	def _dispatch(self):
+		with self._lock:
+			for worker in self._workers:
+				if worker.task is not None:
+					continue
+				while self._backlog:
+					task_id, task, timeout, future = self._backlog.popleft()
+					if not future.set_running_or_notify_cancel():
+						continue
+					worker.conn.send_bytes(task)
+					worker.task = (task_id, future, time.perf_counter() + timeout if timeout is not None else None)
+					break
+
+	def _collect(self, worker):
+		try:
+			task_id, succeeded, value = worker.conn.recv()
+		except (EOFError, OSError):
+			# the worker died; fail its task and replace it
+			self._replace(worker, RuntimeError("worker process exited unexpectedly"))
+			return
+		if worker.task is not None and worker.task[0] == task_id:
+			future = worker.task[1]
+			worker.task = None
+			self.completed += 1
+			if succeeded:
+				future.set_result(value)
+			else:
+				future.set_exception(value)
+
+	def _replace(self, worker, error):
+		task, worker.task = worker.task, None
+		worker.kill()
+		with self._lock:
+			if not self._closed:
+				self._workers[self._workers.index(worker)] = _Worker(self._context)
+		if task is not None:
+			task[1].set_exception(error)
+
+	def _manage(self):
+		while not self._closed:
+			self._dispatch()
+			busy = [worker for worker in self._workers if worker.task is not None]
+			deadlines = [worker.task[2] for worker in busy if worker.task[2] is not None]
+			# sleeps until a result arrives, a task is submitted or the nearest deadline passes
+			timeout = max(0.0, min(deadlines) - time.perf_counter()) if deadlines else None
+			ready = connection.wait([self._wake] + [worker.conn for worker in busy], timeout)
+			if self._wake in ready:
+				while self._wake.poll():
+					self._wake.recv_bytes()
+			with self._lock:
+				aborted, self._aborted = self._aborted, set()
+			for worker in busy:
+				if worker.conn in ready:
+					self._collect(worker)
+				elif worker.task[1] in aborted:
+					self._replace(worker, CancelledError())
+				elif worker.task[2] is not None and time.perf_counter() >= worker.task[2]:
+					self.timed_out += 1
+					self._replace(worker, TimeoutError())
+
+	def shutdown(self, wait=True, *, cancel_futures=False):
+		"""
+		Stops the workers, cancelling queued tasks and failing running ones
+		"""
+		with self._lock:
+			if self._closed:
+				return
+			self._closed = True
+			backlog, self._backlog = self._backlog, deque()
+			self._waker.send_bytes(b'')
+		self._manager.join()
+		for *_, future in backlog:
+			future.cancel()
+		for worker in self._workers:
+			if worker.task is not None:
+				worker.task[1].set_exception(RuntimeError("worker pool was shut down"))
+			try:
+				worker.conn.send(None)
+			except OSError:
+				pass
+			worker.process.join(0.5 if wait else 0)
+			worker.kill()
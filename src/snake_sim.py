@@ -1,8 +1,10 @@
 import os
 import queue
+import itertools
 import math
 import random
-import multiprocessing
+import time
+from concurrent.futures import ThreadPoolExecutor
 import tkinter as tk
 import tkinter.font as tk_font
 
@@ -10,6 +12,28 @@ from .util.sim_global import *
 from .util.sim_logic_wrapper import *
 from .util.sim_wrappers import SimWrappers
 from .util.common import Common, AppException, Tuple
+from .util.event_log import EventLog
+from .util.matrix_helpers import MatrixHelpers
+from .core.maze_pool import MazePool
+from .core.snake_body import SnakeBody
+from .core.sim_engine import SimEngine
+from .core.planning_service import PlanningService
+from .core.worker_pool import WorkerPool
+from .core.shared_grid import SharedGrid
+from .core.algorithm_race import AlgorithmRace
+from .core.parallel_search import ParallelSearch
+from .core.job_manager import JobManager
+from .view.rect_pool import RectPool
+from .view.wall_renderer import WallRenderer
+from .view.bitmap_wall_renderer import BitmapWallRenderer
+from .view.trace_player import TracePlayer
+from .view.sim_loop import SimLoop
+from .view.animation_scheduler import AnimationScheduler
+from .view.callback_tracer import CallbackTracer
+from .view.scanline_filter import ScanlineFilter, ImageFrameFilter
+from .view.tcl_batch import TclBatch
+from .view.stroke_buffer import StrokeBuffer
+from .view.viewport import Viewport
 from .widget.tooltip import ToolTip
 from .widget.custom_button import CustomButton
 
@@ -19,20 +43,54 @@ class SnakeSim:
         self.canvas = None
         self.widgets = None
         self.message_queue = None
-        self.visualizer_thread = None
+        self.visualizer = None
+        self.sim_loop = None
+        self.animations = None
+        self.strokes = None
+        self.scanlines = None
+        self.stale_snake_items = []
+        self.job_poll = None    # subscription polling the background jobs, while there are any
+        self.rects = None
+        self.walls = None
+        self.wall_renderers = None
+        self.viewport = None
         self.config = config
         self.state = state
         self.data = presets
         self.core = core
+        # wraps the Tk callbacks scheduled and bound from here on
+        self.tracer = CallbackTracer(config.STALL_THRESHOLD) if config.TRACE_CALLBACKS else None
+        if self.tracer:
+            self.tracer.install()
+        # long-running work (path planning, map analysis) runs on worker threads that never touch Tk
+        self.background = ThreadPoolExecutor(max_workers=sum(config.JOB_LIMITS.values()), thread_name_prefix="tasks")
+        self.jobs = JobManager(self.background, config.JOB_LIMITS)
+        # planning runs in worker processes started here, before Tk, so that they start small and are reused
+        self.pool = WorkerPool(config.WORKER_POOL_SIZE, timeout=config.PLAN_TIMEOUT)
+        # the process generating maps ahead of time is started here too, and pointed at each new algorithm and size later on
+        self.maze_pool = MazePool(config.MAZE_POOL_SIZE)
+        self.engine = SimEngine(config, state, core, timeout_call=self._call_with_timeout,
+                                planner=PlanningService(self.pool) if config.BACKGROUND_PLANNING else None,
+                                shared_grid=SharedGrid() if config.SHARED_GRID else None,
+                                parallel=ParallelSearch(self.pool) if config.PARALLEL_BIDIRECTIONAL else None)
+        self.engine.subscribe(self._on_engine_event)
+        self.race = AlgorithmRace(self.pool, config.RACE_MEMORY)
         self.init_buffers()
         self.setup()
     
     def init_buffers(self):
         self.state.TARGET = [random.randrange(self.config.ROWS), random.randrange(self.config.COLS)]
-        self.state.TILES = [[0 for _ in range(self.config.COLS)] for _ in range(self.config.ROWS)]
+        self.engine.reset()
     
     def setup(self):
         self.root = tk.Tk(className="SnakeSim")
+        # every animation (button pulses, filter, simulation, visualizer) is ticked by this one scheduler
+        self.animations = AnimationScheduler(self.root)
+        self.animations.tracer = self.tracer
+        CustomButton.scheduler = self.animations
+        CustomButton.tracer = self.tracer
+        # cells painted with the mouse are applied to the map once per frame
+        self.strokes = StrokeBuffer(self.animations, self._apply_stroke)
         self.root.title("SnakeSim")
         self.root.state('zoomed')
         self.root.minsize(self.config.MIN_WIDTH, self.config.MIN_HEIGHT)
@@ -45,19 +103,39 @@ class SnakeSim:
         self.canvas.bind("<B1-Motion>", self._mouse_event_handler)
         self.canvas.bind("<B3-Motion>", self._mouse_event_handler)
         self.canvas.bind("<B2-Motion>", self._mouse_event_handler)
+        for button in (1, 2, 3):
+            self.canvas.bind(f"<ButtonRelease-{button}>", lambda _: self.strokes.end())
+        self.root.bind("<KeyPress-bracketleft>", lambda _: self._set_visualizer_speed(0.5))
+        self.root.bind("<KeyPress-bracketright>", lambda _: self._set_visualizer_speed(2))
+        self.root.bind("<KeyPress-Return>", lambda _: self.visualizer.skip_to_end())
+        self.canvas.bind("<MouseWheel>", lambda event: self._zoom(1.25 if event.delta > 0 else 0.8, event.x, event.y))
+        self.canvas.bind("<Button-4>", lambda event: self._zoom(1.25, event.x, event.y))
+        self.canvas.bind("<Button-5>", lambda event: self._zoom(0.8, event.x, event.y))
+        self.root.bind("<KeyPress-Up>", lambda _: self._pan(-1, 0))
+        self.root.bind("<KeyPress-Down>", lambda _: self._pan(1, 0))
+        self.root.bind("<KeyPress-Left>", lambda _: self._pan(0, -1))
+        self.root.bind("<KeyPress-Right>", lambda _: self._pan(0, 1))
+        self.root.bind("<KeyPress-f>", lambda _: self._toggle_camera_follow())
+        self.root.bind("<KeyPress-u>", lambda _: self._toggle_unthrottled())
+        self.root.bind("<KeyPress-Escape>", lambda _: self._cancel_job())
+        self.root.bind("<KeyPress-t>", lambda _: self._export_trace())
+        self.visualizer = TracePlayer(self.animations, self.config.VISUALIZER_SPEED)
+        self.sim_loop = SimLoop(self.animations, self.engine.step, self._render_snake, wait=(AppException.PlanPending,))
+        self.viewport = Viewport(self.config.ROWS, self.config.COLS, self.canvas.winfo_width(), self.canvas.winfo_height())
         
         self.update_cell_size()
+        # create pooled items before the filter frames, so they are stacked below them
+        self.rects = RectPool(self.canvas)
+        self.wall_renderers = (WallRenderer(self.rects), BitmapWallRenderer(self.canvas, self.data.COLOR_SCHEME['canvas'][self.config.THEME]))
+        self.rects.prewarm("target", 1)
+        self.rects.prewarm("snek", self.config.RECT_POOL_SIZE)
+        self._draw_walls()
 
-        self.state.FRAMES = []
-        scanline_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), 'filter', 'scanline_h')
-        for filename in os.listdir(scanline_dir):
-            if filename.endswith('.png'):
-                image_path = os.path.join(scanline_dir, filename)
-                image = tk.PhotoImage(file=image_path)
-                self.state.FRAMES.append(image)
-        for frame in self.state.FRAMES:
-            frame_id = self.canvas.create_image(0, 0, image=frame, anchor=tk.NW, tags="filter")
-            self.state.FRAME_ID.append(frame_id)
+        if self.config.FILTER_MODE == 0:
+            scanline_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), 'filter', 'scanline_h')
+            self.scanlines = ImageFrameFilter(self.canvas, scanline_dir)
+        else:
+            self.scanlines = ScanlineFilter(self.canvas, animated=self.config.FILTER_MODE == 1)
         # Create buttons
         buttons = [
             CustomButton(text=self.data.WIDGET_ICONS["reset-snake"], name="reset-snake", command=self.reset_snake),
@@ -77,6 +155,7 @@ class SnakeSim:
             CustomButton(text=self.data.WIDGET_ICONS["make-connected"], name="make-connected", command=lambda: self._update_map(1)),
             CustomButton(text=self.data.WIDGET_ICONS["make-open"], name="make-open", command=lambda: self._update_map(2)),
             CustomButton(text=self.data.WIDGET_ICONS["visualizer"], name="visualizer", command=self._toggle_visualizer),
+            CustomButton(text=self.data.WIDGET_ICONS["race"], name="race", command=self._race_algorithms),
             CustomButton(text=self.data.WIDGET_ICONS['help'], name="help", cursor="question_arrow", command=self._show_help),
             CustomButton(text=self.data.WIDGET_ICONS['about'], name="about", command=self._show_about)
         ]
@@ -123,6 +202,7 @@ class SnakeSim:
         help_text = tk.Text(self.root, cursor="arrow")
         help_text.insert(tk.END, self.data.HELP_INFO)
         help_text.bind("<Button-1>", self._highlight_button_in_help)
+        race_text = tk.Text(self.root, name="race-results", cursor="arrow")
         # Create panels from frames and labels
         about_panel = tk.Frame(self.canvas, cursor="arrow")
         about_title = tk.Label(about_panel, name="title", text=f"\U0001F40D SnakeSim")
@@ -139,7 +219,7 @@ class SnakeSim:
             "sliders": [slider1, slider2],
             "spinners": [spinner1],
             "dropdowns": [(dropdown_menu, dropdown1), (dropdown_menu2, dropdown2), (dropdown_menu3, dropdown3)],
-            "textbox": [help_text],
+            "textbox": [help_text, race_text],
             "panels": [(about_panel, (about_title, about_powered, about_version, about_dev))],
             "tooltips": []
         }
@@ -173,6 +253,7 @@ class SnakeSim:
         # whenever canvas is resized, so don't need to be placed exactly
         for button in self.widgets["buttons"][4:]:
             self.canvas.create_window(0, 0, anchor="nw", window=button, tags=button.winfo_name())
+        self._configure_maze_pool()
         self._start_animation()
         self.message_queue = queue.Queue()
         self._pulse_button(button_id='help', pulse=True)
@@ -206,6 +287,9 @@ class SnakeSim:
                 elif group_name == "textbox":
                     widget.configure(borderwidth=5, padx=15, pady=15, wrap="word", relief="groove", width=50,
                                      font=tk_font.Font(family=tk_font.families()[self.config.FONT_INDEX], size=16, weight='bold'))
+                    if widget.winfo_name() == "race-results":
+                        # the table is aligned in columns, so it needs a fixed width font
+                        widget.configure(wrap="none", width=64, font=tk_font.Font(family="Courier", size=13, weight='bold'))
                 elif group_name == "panels":
                     title_font = tk_font.Font(family=tk_font.families()[self.config.FONT_INDEX], size=24, weight='bold')
                     body_font = tk_font.Font(family=tk_font.families()[self.config.FONT_INDEX], size=12)
@@ -222,6 +306,8 @@ class SnakeSim:
         """
         self.config.THEME = -~self.config.THEME % len(self.data.COLOR_SCHEME['canvas'])
         self.canvas.configure(background=self.data.COLOR_SCHEME['canvas'][self.config.THEME])
+        for walls in self.wall_renderers:
+            walls.recolor(self.data.COLOR_SCHEME['w_fill'][self.config.THEME], self.data.COLOR_SCHEME['canvas'][self.config.THEME])
         for group_name, widgets in self.widgets.items():
             for widget in widgets:
                 if group_name == "buttons":
@@ -268,11 +354,15 @@ class SnakeSim:
                                                  selectcolor=self.data.COLOR_SCHEME['h_fill'][self.config.THEME])
     
     def _start_animation(self):
-        self.state.FILTER_WORKER = Thread(target=self._filter_playback, args=(0,), daemon=True)
-        self.state.FILTER_WORKER.start()
+        self.scanlines.show(self.canvas.winfo_width(), self.canvas.winfo_height())
+        self.state.FILTER_WORKER = self.animations.subscribe(self._filter_playback, priority=-1, interval=self.config.FRAME_DELAY / 1000)
 
     def _on_canvas_resize(self):
         self.update_cell_size()
+        if self.state.FILTER_WORKER_STATUS and self.scanlines:
+            self.scanlines.show(self.canvas.winfo_width(), self.canvas.winfo_height())
+        if self.walls:
+            self._refresh_view()
         bottom_padding = 10
         for button in self.widgets["buttons"][4:]:
             self.canvas.coords(button.winfo_name(), self.canvas.winfo_width() - self.widgets['buttons'][4].winfo_reqwidth() - 10, bottom_padding)
@@ -307,7 +397,8 @@ class SnakeSim:
                                 5 if pathfinding == 'greedy best first' else \
                                 6 if pathfinding == 'fringe' else \
                                 7 if pathfinding == 'bellman-ford' else \
-                                8 if pathfinding == 'iterative deepening a*' else 9
+                                8 if pathfinding == 'iterative deepening a*' else \
+                                9 if pathfinding == 'junction graph' else 10
         elif var_id == 2:   # distance metric label
             metric = var.get().lower()
             self.config.HEURISTIC = 0 if metric == 'chebyshev' else \
@@ -323,39 +414,145 @@ class SnakeSim:
                                     4 if maze == 'recursive division' else \
                                     5 if maze == 'cell opening' else 6
                                     # 6 if maze == 'iterative prims' else 7     # TBD later
+            self._configure_maze_pool()
 
     def _on_close(self):
         """
         Cleanup before exiting application.
         """
         self.state.FILTER_WORKER_STATUS = False
-        self.state.FILTER_WORKER.join()
+        self.animations.unsubscribe(self.state.FILTER_WORKER)
+        self.jobs.close()
+        if self.engine.planner:
+            self.engine.planner.close()
+        self.background.shutdown(wait=False, cancel_futures=True)
+        self.race.close()
+        if self.tracer:
+            self.tracer.uninstall()
+        if self.engine.parallel:
+            self.engine.parallel.close()
+        self.pool.shutdown(wait=False)
+        if self.engine.shared_grid:
+            self.engine.shared_grid.close()
+        if self.maze_pool:
+            self.maze_pool.close()
         self.root.destroy()
     
-    @staticmethod
-    def _call_and_save(func, *args, **kwargs):
-        q = kwargs.pop('queue')
-        result = func(*args, **kwargs)
-        q.put(result)
+    def _call_with_notification(self, kind, func, *args, key=None, replaces=(), callback=None, callback_args=None, with_result=False):
+        """
+        Runs a function as a background job while showing the progress of the jobs, then runs the callback
+        on the main thread once it has finished. Jobs can be cancelled, and a job identical to one still
+        pending is not started again.
+
+        :param kind: Kind of the job, which limits how many jobs like it run at once (see SimConfig.JOB_LIMITS)
+        :param func: Function to run; it must not call Tk, and is given a cancellation token as its token argument
+        :param args: Arguments of the function
+        :param key: Identifies the work of the job among its kind, or None to always start it
+        :param replaces: Kinds of jobs to cancel first, whose results would be made stale by this one
+        :param callback: Function called once it has finished
+        :param callback_args: Arguments of the callback
+        :param with_result: Pass the result of the function to the callback, before its arguments
+        :return:
+        """
+        self.jobs.submit(kind, self.tracer.wrap(func, 'background') if self.tracer else func, *args, key=key, replaces=replaces,
+                         callback=lambda result: callback(*((result,) if with_result else ()), *(callback_args or ())) if callback else None)
+        self._show_cancel_button()
+        if self.job_poll is None:
+            self.job_poll = self.animations.subscribe(self._poll_jobs, interval=0.05)
+
+    def _job_pending(self, kind, key):
+        """
+        Check whether a job identical to the given one is still pending, and if so show the progress of the jobs
+        instead of starting it again.
+
+        :return: True if the job is pending
+        """
+        if self.jobs.find(kind, key) is None:
+            return False
+        self.show_message(self.jobs.status())
+        return True
+
+    def _poll_jobs(self, now):
+        """
+        Runs the callbacks of the background jobs that have finished, and shows the progress of the others.
+
+        :param now: Time of the animation frame
+        :return: False once no jobs are left
+        """
+        polling = False
+        try:
+            for job in self.jobs.poll():
+                if job.cancelled:
+                    continue    # cancelled by the user, or replaced by a newer job
+                try:
+                    job.callback(job.future.result())
+                except AppException.Cancelled:
+                    continue
+                except Exception as error:
+                    # a failing job must not stop the callbacks of the others
+                    self._disable_active_visualizer_button()
+                    self.show_message(f"Task failed ({job.kind}): {type(error).__name__}")
+            if self.jobs.busy:
+                polling = True
+                status = self.jobs.status()
+                if status:
+                    self.show_message(status)
+                return
+            if not self.race.running:
+                self.canvas.delete("cancel-job")
+            return False
+        finally:
+            # the scheduler drops the subscription when this returns False or raises, so the next job subscribes again
+            if not polling:
+                self.job_poll = None
+
+    def _show_cancel_button(self):
+        """
+        Show a cancel button above the message area, while a background call or race is running.
+
+        :return:
+        """
+        self.canvas.delete("cancel-job")
+        font = tk_font.Font(family=tk_font.families()[self.config.FONT_INDEX], size=14, weight='bold')
+        self.canvas.create_text(10, self.root.winfo_height() - 80, anchor="w", text="\u2716 Cancel (Esc)", font=font,
+                                fill=self.data.COLOR_SCHEME['wid_fg'][self.config.THEME], tags="cancel-job")
+        self.canvas.tag_bind("cancel-job", "<Button-1>", lambda _: self._cancel_job())
+
+    def _cancel_job(self):
+        """
+        Cancel the background jobs and race; they stop within milliseconds, without being waited on.
+
+        :return:
+        """
+        if self.jobs.cancel_all():
+            self._disable_active_visualizer_button()
+            self.show_message("Cancelled")
+        if self.race.running:
+            self.race.cancel()
+        self.canvas.delete("cancel-job")
 
-    @SimWrappers.show_loading
-    def _call_with_notification(self, func, *args, callback=None, callback_args=None):
-        func(*args)
+    def _export_trace(self):
+        """
+        Save the callbacks traced so far as Chrome trace-event JSON in the working directory, and start a new trace.
+
+        :return:
+        """
+        if not self.tracer:
+            return
+        path = os.path.abspath(time.strftime("snakesim-trace-%Y%m%d-%H%M%S.json"))
+        self.tracer.export(path)
+        slowest = max(self.tracer.stalls, key=lambda stall: stall[1], default=None)
+        self.show_message(f"Saved trace to {os.path.basename(path)}: {len(self.tracer.stalls)} stalls"
+                          + (f", longest {slowest[0]} ({slowest[1] * 1000:.0f} ms)" if slowest else ""))
+        self.tracer.clear()
 
     def _call_with_timeout(self, func, *args, **kwargs):
-        timeout = 5         # time limit of 5 seconds for given function
-        q = multiprocessing.Queue()
-        kwargs['queue'] = q
-        process = multiprocessing.Process(target=self._call_and_save, args=(func, *args), kwargs=kwargs)
-        process.start()
-        process.join(timeout)
-        if process.is_alive():
-            self.show_message("Operation timed out :(")
-            process.terminate()
-            process.join()
-            return None
-        res = q.get()
-        return res
+        """
+        Runs a function on the worker pool, giving up after the planning time limit. Does not call Tk.
+
+        :return: The result of the function, or None if it ran out of time
+        """
+        return self.pool.call(func, *args, timeout=self.config.PLAN_TIMEOUT, **kwargs)
     
     def _await_for_timer(self, timer_call, *args, **kwargs):
         if kwargs:
@@ -387,48 +584,88 @@ class SnakeSim:
     @SimWrappers.call_safe
     def _mouse_event_handler(self, event):
         """
-        Draw or erase on canvas on user interaction.
+        Draw or erase on canvas on user interaction; the cells are collected and applied on the next frame.
 
         :param event: Current mouse event
         :return:
         """
-        canvas_x = self.canvas.winfo_rootx()
-        canvas_y = self.canvas.winfo_rooty()
-        canvas_width = self.canvas.winfo_width()
-        canvas_height = self.canvas.winfo_height()
-        if canvas_x <= event.x_root <= canvas_x + canvas_width and canvas_y <= event.y_root <= canvas_y + canvas_height:
-            col = event.x // self.config.COL_WIDTH
-            row = event.y // self.config.ROW_HEIGHT
-            if not self.state.TILES[row][col]:
-                # if event.state == 0x0100:  # LMB hit
-                if 200 < event.state < 300:  # LMB hit
-                    if self.state.HEAD.count(None) == len(self.state.HEAD):
-                        self.state.TILES[row][col] = self.canvas.create_rectangle(col * self.config.COL_WIDTH, row * self.config.ROW_HEIGHT,
-                                                                                  (col + 1) * self.config.COL_WIDTH, (row + 1) * self.config.ROW_HEIGHT,
-                                                                                  fill=self.data.COLOR_SCHEME['h_fill'][self.config.THEME],
-                                                                                  tags=["snek"], stipple='gray75')
-                        self.state.SNAKE[self.state.TILES[row][col]] = [row, col]
-                        self.state.PREV[:] = self.state.CURR
-                        self.state.CURR[:] = row, col
-                        self.state.HEAD[:] = row, col
-                    elif (row, col) in Common.valid_moves(self.state.CURR[0], self.state.CURR[1], self.config.ROWS, self.config.COLS):
-                        if any(self.state.TILES[coord[0]][coord[1]] != 0 for coord in Common.valid_moves(row, col, self.config.ROWS, self.config.COLS)
-                               if 0 <= coord[0] < self.config.ROWS and 0 <= coord[1] < self.config.COLS):
-                            self.state.TILES[row][col] = self.canvas.create_rectangle(col * self.config.COL_WIDTH, row * self.config.ROW_HEIGHT,
-                                                                                      (col + 1) * self.config.COL_WIDTH, (row + 1) * self.config.ROW_HEIGHT,
-                                                                                      fill=self.data.COLOR_SCHEME['b_fill'][self.config.THEME],
-                                                                                      tags="snek", stipple='gray75')
-                            self.state.SNAKE[self.state.TILES[row][col]] = [row, col]
-                            self.state.PREV[:] = self.state.CURR
-                            self.state.CURR[:] = row, col
-                # elif event.state == 0x0400:  # RMB hit
-                elif 1000 < event.state < 1100:  # RMB hit
-                    self._create_block(row, col, self.config.COL_WIDTH, self.config.ROW_HEIGHT, self.state.MAZE_DYN)
-            # if event.state == 0x0200:   # Middle button hit
-            if 500 < event.state < 600:   # Middle button hit
-                if [row, col] not in self.state.SNAKE.values():
-                    self.canvas.delete(self.state.TILES[row][col])
+        # the canvas size is kept by the viewport, instead of being queried from Tk on every motion event
+        if not (0 <= event.x < self.viewport.width and 0 <= event.y < self.viewport.height):
+            return
+        row, col = self.viewport.to_cell(event.x, event.y)
+        if not self.viewport.contains(row, col):
+            return
+        # if event.state == 0x0100:  # LMB hit
+        if 200 < event.state < 300:  # LMB hit
+            # the cells of a snake drawn by hand must share a side, or it could not move along them
+            self.strokes.add('snake', row, col, four_connected=True)
+        # elif event.state == 0x0400:  # RMB hit
+        elif 1000 < event.state < 1100:  # RMB hit
+            self.strokes.add('wall', row, col)
+        # elif event.state == 0x0200:   # Middle button hit
+        elif 500 < event.state < 600:   # Middle button hit
+            self.strokes.add('erase', row, col)
+
+    @SimWrappers.call_safe
+    def _apply_stroke(self, mode, cells):
+        """
+        Applies the cells painted with the mouse since the last frame, changing the map and its analysis once.
+
+        :param mode: 'snake', 'wall' or 'erase'
+        :param cells: Cells painted, in order
+        :return:
+        """
+        cells = [(row, col) for row, col in cells if 0 <= row < self.config.ROWS and 0 <= col < self.config.COLS]
+        if mode == 'snake':
+            if any([self._extend_drawn_snake(row, col) for row, col in cells if not self.state.TILES[row][col]]):
+                self.engine.grid_changed()
+            return
+        if mode == 'wall':
+            changed = []
+            for row, col in cells:
+                if not self.state.TILES[row][col]:
+                    block = self._block_cells(row, col, self.state.MAZE_DYN)
+                    for i, j in block:
+                        self.state.TILES[i][j] = 1
+                    changed += block
+            if changed:
+                self.engine.grid_changed()
+                self.walls.add(changed)
+        else:
+            changed = [(row, col) for row, col in cells if self.state.TILES[row][col] and (row, col) not in self.state.SNAKE]
+            if changed:
+                self.walls.remove(changed)
+                for row, col in changed:
                     self.state.TILES[row][col] = 0
+                self.engine.grid_changed()
+        if changed and self.state.MAP_ANALYSIS:
+            self.state.MAP_ANALYSIS.update(changed, 1 if mode == 'wall' else 0)
+
+    def _extend_drawn_snake(self, row, col):
+        """
+        Adds a free cell to the snake being drawn by hand, starting the snake if there is none.
+
+        :param row: Row of the cell
+        :param col: Column of the cell
+        :return: True if the cell was added
+        """
+        if self.state.HEAD.count(None) == len(self.state.HEAD):
+            item = self.rects.acquire("snek", *self.viewport.box(row, col), fill=self.data.COLOR_SCHEME['h_fill'][self.config.THEME],
+                                      stipple='gray75', outline='black')
+            self.state.HEAD[:] = row, col
+        elif (row, col) in Common.valid_moves(self.state.CURR[0], self.state.CURR[1], self.config.ROWS, self.config.COLS):
+            if not any(self.state.TILES[coord[0]][coord[1]] != 0 for coord in Common.valid_moves(row, col, self.config.ROWS, self.config.COLS)
+                       if 0 <= coord[0] < self.config.ROWS and 0 <= coord[1] < self.config.COLS):
+                return False
+            item = self.rects.acquire("snek", *self.viewport.box(row, col), fill=self.data.COLOR_SCHEME['b_fill'][self.config.THEME],
+                                      stipple='gray75', outline='black')
+        else:
+            return False
+        self.state.TILES[row][col] = SnakeBody.TILE
+        self.state.SNAKE.push_tail(row, col, item)
+        self.state.PREV[:] = self.state.CURR
+        self.state.CURR[:] = row, col
+        return True
 
     def _handle_game_exception(self, message_key):
         """
@@ -441,23 +678,17 @@ class SnakeSim:
         self.show_message(random.choice(self.data.MESSAGES[message_key]))
         self._pulse_button(button_id='reset-snake', pulse=True)
     
-    def _filter_playback(self, n):
+    def _filter_playback(self, now):
         """
-        Displays frames of the filter (CRT effect) once.
+        Displays the next frame of the filter (CRT effect).
 
-        :param n: current frame
-        :return:
+        :param now: Time of the animation frame
+        :return: False once the filter has been turned off
         """
-        if not self.state.FRAMES:
-            return
-        if self.state.FILTER_WORKER_STATUS:
-            if n < len(self.state.FRAMES):
-                self.canvas.itemconfigure(self.state.FRAME_ID[(n-1) % len(self.state.FRAMES)], state=tk.HIDDEN)
-                self.canvas.itemconfigure(self.state.FRAME_ID[n], state=tk.NORMAL)
-                self.canvas.tag_raise(self.state.FRAME_ID[n])
-                n = n + 1 if n != len(self.state.FRAMES) - 1 else 0
-                # self.widgets['buttons'][2].configure(command=lambda: self.step(thd))      # why did i put this here?
-                self.root.after(self.config.FRAME_DELAY, self._filter_playback, n)
+        if not self.state.FILTER_WORKER_STATUS:
+            return False
+        # self.widgets['buttons'][2].configure(command=lambda: self.step(thd))      # why did i put this here?
+        self.scanlines.advance()
 
     def _toggle_movement_bindings(self, toggle, continuous=False):
         if toggle:
@@ -490,14 +721,13 @@ class SnakeSim:
         button = self._get_button('crt-mode')
         if not self.state.FILTER_WORKER_STATUS:
             button.configure(foreground=self.data.COLOR_SCHEME['h_fill'][self.config.THEME], relief="flat")
-            self.state.FILTER_WORKER.join()
+            self.animations.unsubscribe(self.state.FILTER_WORKER)
             items = self.canvas.find_withtag("filter")
             for item in items:
                 self.canvas.itemconfigure(item, state=tk.HIDDEN)
         else:
             button.configure(foreground=self.data.COLOR_SCHEME['wid_fg'][self.config.THEME], relief="sunken")
-            self.state.FILTER_WORKER = Thread(target=self._filter_playback, args=(0,), daemon=True)
-            self.state.FILTER_WORKER.start()
+            self._start_animation()
 
     @SimWrappers.call_safe
     def _toggle_snake_chase(self):
@@ -507,7 +737,7 @@ class SnakeSim:
         :return:
         """
         self.state.SNAKE_CHASING = not self.state.SNAKE_CHASING
-        self._stop("sim", thd=self.state.SIM_CALLBACK)
+        self._stop("sim")
         if self.state.SNAKE_GAME:
             self.state.SNAKE_GAME = not self.state.SNAKE_GAME
             self._get_button('play-snake').configure(foreground=self.data.COLOR_SCHEME['h_fill'][self.config.THEME], relief="flat")
@@ -531,7 +761,7 @@ class SnakeSim:
         :return:
         """
         self.state.SNAKE_GAME = not self.state.SNAKE_GAME
-        self._stop("sim", thd=self.state.SIM_CALLBACK)
+        self._stop("sim")
         if self.state.SNAKE_CHASING:
             self.state.SNAKE_CHASING = not self.state.SNAKE_CHASING
             self._get_button('snake-chase').configure(foreground=self.data.COLOR_SCHEME['h_fill'][self.config.THEME], relief="flat")
@@ -607,8 +837,8 @@ class SnakeSim:
         :return:
         """
         if self.state.VISUALIZER_CALLBACK:
-            self.root.after_cancel(self.state.VISUALIZER_CALLBACK)
-        self.canvas.delete('highlight')
+            self.visualizer.stop()
+        self.rects.release_all("highlight")
         self.state.VISUALIZER_CALLBACK = None
         self._disable_active_visualizer_button()
     
@@ -644,36 +874,14 @@ class SnakeSim:
         :param repeat:
         :return:
         """
-        def change_direction():
-            if self.state.LAST_DIRECTION_IN_GAME[0] is None or self.state.LAST_DIRECTION_IN_GAME[1] is None:
-                self.state.LAST_DIRECTION_IN_GAME[:] = self.state.CURRENT_DIRECTION_IN_GAME
-            if direction == -1:
-                self.state.CURRENT_DIRECTION_IN_GAME[:] = [0, -1]
-            elif direction == 1:
-                self.state.CURRENT_DIRECTION_IN_GAME[:] = [0, 1]
-            elif direction == 2:
-                self.state.CURRENT_DIRECTION_IN_GAME[:] = [-1, 0]
-            else:
-                self.state.CURRENT_DIRECTION_IN_GAME[:] = [1, 0]
-    
         if repeat:
             if self.state.KEY_PRESSED:
-                if self.state.HEAD != self.state.TARGET:
-                    change_direction()
-                    adjusted = Common.diagonal_adjusted(self.state.TARGET[0], self.state.TARGET[1], self.state.TARGET[0] + self.state.CURRENT_DIRECTION_IN_GAME[0],
-                                                        self.state.TARGET[1] + self.state.CURRENT_DIRECTION_IN_GAME[1], self.config.ROWS, self.config.COLS)
-                    next_move = [adjusted[0], adjusted[1]]
-                    if self.state.TILES[next_move[0]][next_move[1]] == 0:
-                        self.state.TARGET[:] = next_move
-                        self.canvas.delete("target")
-                        self.canvas.create_rectangle(self.state.TARGET[1] * self.config.COL_WIDTH, self.state.TARGET[0] * self.config.ROW_HEIGHT,
-                                                     (self.state.TARGET[1] + 1) * self.config.COL_WIDTH, (self.state.TARGET[0] + 1) * self.config.ROW_HEIGHT,
-                                                     fill='orange', tags="target")
+                self.engine.move_target(direction)
                 if self.state.MOVING_CALLBACK:
                     self.root.after_cancel(self.state.MOVING_CALLBACK)
                 self.state.MOVING_CALLBACK = self.root.after(self.config.DELAY - self.config.MIN_CHASE_DELAY if self.config.DELAY <= 80 else 70, self._move_in_game, direction, repeat)
         else:
-            change_direction()
+            self.engine.set_direction(direction)
     
     def _show_about(self):
         """
@@ -795,7 +1003,7 @@ class SnakeSim:
     def _visualize_sections(self, sections, color, col_width, row_height):
         """
         Highlight the points in the given group/map sections with the corresponding group color on canvas,
-        with a delay inbetween successive points.
+        played back a batch of points per frame.
         
         :param sections:
         :param color:
@@ -803,81 +1011,130 @@ class SnakeSim:
         :param row_height:
         :return:
         """
-        def start_highlighting(next_point):
-            nonlocal index
-            try:
-                point = next(next_point)
-                if point not in [tuple(self.state.HEAD), tuple(self.state.TARGET)]:
-                    self.canvas.create_rectangle(point[1] * col_width, point[0] * row_height, (point[1] + 1) * col_width,
-                                                 (point[0] + 1) * row_height, tags=["highlight"], width=0,
-                                                 fill=color if not multiple else color[index])
-                self.state.VISUALIZER_CALLBACK = self.root.after(1, start_highlighting, next_point)
-            except StopIteration:
-                if multiple and index < len(sections)-1:
-                    index += 1
-                    self.state.VISUALIZER_CALLBACK = self.root.after(1, start_highlighting, iter(sections[index]))
-                else:
-                    self._disable_active_visualizer_button()
-                    self.state.VISUALIZER_CALLBACK = None
-                    return
-
-        self.canvas.delete("highlight")
-        index, self.state.VISUALIZER_CALLBACK = 0, 1   # this is  actually needed, it prevents root.after from finishing immediately elsewhere
         multiple = isinstance(sections[0][0], list) or isinstance(sections[0][0], tuple)
-        next_point = iter(sections[index]) if multiple else iter(sections)
-        self.visualizer_thread = Thread(target=lambda: start_highlighting(next_point), daemon=True)
-        self.visualizer_thread.start()
+        points = itertools.chain.from_iterable(((point, color[index]) for point in section) for index, section in enumerate(sections)) \
+            if multiple else ((point, color) for point in sections)
+        self._visualize_points(points)
+
+    def _visualize_points(self, points):
+        """
+        Highlight the given points on canvas, each with its own color, played back a batch of points per frame.
+
+        :param points: Iterable of (point, color) pairs
+        :return:
+        """
+        def highlight_points(chunk):
+            skipped = (tuple(self.state.HEAD), tuple(self.state.TARGET))
+            # consecutive points of the same color share one batch of canvas operations
+            for fill, group in itertools.groupby(chunk, key=lambda point_and_fill: point_and_fill[1]):
+                boxes = [self.viewport.box(*point) for point, _ in group if point not in skipped and self.viewport.contains(*point)]
+                if boxes:
+                    self.rects.acquire_many("highlight", boxes, width=0, fill=fill)
+
+        def finish():
+            self._disable_active_visualizer_button()
+            self.state.VISUALIZER_CALLBACK = None
+
+        self.rects.release_all("highlight")
+        self.state.VISUALIZER_CALLBACK = self.visualizer.play(points, highlight_points, finish)
+
+    def _race_algorithms(self):
+        """
+        Race every pathfinding algorithm from the snake's head to the target on the worker pool, or hide the results
+        of the last race.
+
+        :return:
+        """
+        button = self._get_button('race')
+        if self.widgets["textbox"][1].winfo_viewable():
+            self.canvas.delete("race_window")
+            button.configure(foreground=self.data.COLOR_SCHEME['wid_fg'][self.config.THEME], relief="flat")
+            return
+        if self.race.running:
+            self.show_message("A race is already running")
+            return
+        if None in self.state.HEAD:
+            self.show_message("Draw a snake to race from!")
+            return
+        self.race.start(self.engine, range(1, len(self.data.PATHFINDING_NAMES)), self.data.PATHFINDING_NAMES, self.config.RACE_TIMEOUT)
+        self._pulse_button(button=button, pulse=True)
+        self._show_cancel_button()
+        self.show_message(f"Racing {len(self.race.results)} algorithms...")
+
+        def check_if_finished(now):
+            if not self.race.running:
+                self._pulse_button(button=button, pulse=False)
+                self.show_message("Race cancelled")
+                return False
+            if self.race.poll():
+                if not self.jobs.busy:
+                    self.canvas.delete("cancel-job")
+                self._pulse_button(button=button, pulse=False)
+                self._show_race_results()
+                return False
+        self.animations.subscribe(check_if_finished, interval=0.05)
+
+    def _show_race_results(self):
+        """
+        Display the ranked results of the last race, and play back the race if the visualizer is on.
+
+        :return:
+        """
+        text = self.widgets["textbox"][1]
+        lines = self.race.table()
+        text.configure(state="normal", height=len(lines))
+        text.delete("1.0", tk.END)
+        text.insert(tk.END, "   " + lines[0])
+        for result, line in zip(self.race.ranked(), lines[1:]):
+            text.tag_configure(result.name, foreground=self.data.RACE_COLORS[result.alg])
+            text.insert(tk.END, "\n")
+            text.insert(tk.END, "\u25A0 ", result.name)
+            text.insert(tk.END, line)
+        text.configure(state="disabled")
+        self.canvas.delete("race_window")
+        self.canvas.create_window(self.canvas.winfo_width() // 2, 90, anchor="n", window=text, tags="race_window")
+        self._get_button('race').configure(foreground=self.data.COLOR_SCHEME['wid_fg'][self.config.THEME], relief="sunken")
+        if self.config.VISUALIZE:
+            self._stop_visualizer_callback()
+            self._visualize_points(self.race.trace(dict(enumerate(self.data.RACE_COLORS))))
 
     @SimWrappers.call_safe
-    def _visualise_maze_in_place(self, coords, col_width, row_height, matrix=None):
+    def _visualise_maze_in_place(self, events, col_width, row_height, startx=0, starty=0):
         """
-        Draw a point or a set of points from a given matrix or the global tile matrix on the canvas with a delay
-        inbetween successive points.
+        Replay the cell edits recorded in a map generation event log on the canvas, a batch of edits
+        per frame.
         
-        :param coords:
+        :param events: Event log of the generated map
         :param col_width:
         :param row_height:
-        :param matrix:
+        :param startx: Row offset of the generated map on canvas
+        :param starty: Column offset of the generated map on canvas
         :return:
         """
-        def update_point(next_point=None):
-            nonlocal index
-            if not next_point:
-                x, y = coords
-                if self.state.TILES[x][y]:
-                    self.canvas.delete(self.state.TILES[x][y])
-                self.state.TILES[x][y] = self.canvas.create_rectangle(y * col_width, x * row_height, (y + 1) * col_width, (x + 1) * row_height,
-                                                                      fill=self.data.COLOR_SCHEME['w_fill'][self.config.THEME], tags=["wall"], width=0)
-            else:
-                try:
-                    x, y = next(next_point)
-                    if index == 0:
-                        self.state.TILES[x][y] = self.canvas.create_rectangle(y * col_width, x * row_height, (y + 1) * col_width, (x + 1) * row_height,
-                                                                              fill=self.data.COLOR_SCHEME['w_fill'][self.config.THEME], tags=["wall"], width=0)
-                    else:
-                        self.canvas.delete(self.state.TILES[x][y])
-                        if matrix[x][y]:
-                            self.state.TILES[x][y] = self.canvas.create_rectangle(y * col_width, x * row_height, (y + 1) * col_width, (x + 1) * row_height,
-                                                                                  fill=self.data.COLOR_SCHEME['w_fill'][self.config.THEME], tags=["wall"], width=0)
-                        else:
-                            self.state.TILES[x][y] = 0
-                    self.state.VISUALIZER_CALLBACK = self.root.after(1, update_point, next_point)
-                except StopIteration:
-                    if multiple and index < len(coords) - 1:
-                        index += 1
-                        self.state.VISUALIZER_CALLBACK = self.root.after(1, update_point, iter(coords[index]))
-                    else:
-                        self.root.after_cancel(self.state.VISUALIZER_CALLBACK)
-                        self._disable_active_visualizer_button()
-                        self.state.VISUALIZER_CALLBACK = None
-
-        if isinstance(coords[0], int):
-            update_point()
-        elif matrix:
-            index = 0
-            multiple = isinstance(coords[0][0], list) or isinstance(coords[0][0], tuple)
-            point_generator = iter(coords[index]) if multiple else iter(coords)
-            update_point(iter(point_generator))
+        def update_points(chunk):
+            self.engine.grid_changed()
+            # consecutive edits of the same kind are drawn together
+            for op, group in itertools.groupby(chunk, key=lambda event: event[2]):
+                cells = [(x + startx, y + starty) for x, y, _ in group]
+                value = 1 if op == EventLog.SET else 0
+                for x, y in cells:
+                    self.state.TILES[x][y] = value
+                if value:
+                    self.walls.add(cells)
+                else:
+                    self.walls.remove(cells)
+
+        def finish():
+            self._disable_active_visualizer_button()
+            self.state.VISUALIZER_CALLBACK = None
+            self.state.MAP_ANALYSIS = None
+
+        if events.filled:
+            for i in range(startx, startx + events.rows):
+                for j in range(starty, starty + events.cols):
+                    self.state.TILES[i][j] = 1
+            self.redraw_map()
+        self.state.VISUALIZER_CALLBACK = self.visualizer.play(events, update_points, finish)
 
     @SimWrappers.call_safe
     def _display_holes_in_map(self):
@@ -889,14 +1146,36 @@ class SnakeSim:
         if self.state.VISUALIZER_CALLBACK:
             self._stop_visualizer_callback()
             return
+        version = self.state.GRID_VERSION
+        if self._job_pending('holes', version):
+            return
         points = []
+
+        def show_holes():
+            if self.state.GRID_VERSION != version:
+                # the map was changed (e.g. by a map edit finishing) while the holes were being found
+                self._pulse_button(button_id='find-holes', pulse=False)
+                self.show_message("The map has changed, find the holes again")
+                return
+            self._visualize_sections(points, self.data.COLOR_SCHEME['highlight_space'][self.config.THEME],
+                                     self.config.COL_WIDTH, self.config.ROW_HEIGHT)
+
         self._pulse_button(button_id='find-holes', pulse=True)
-        self._call_with_notification(Common.get_closed_spaces, self.state.TILES, points, callback=self._visualize_sections,
-                                     callback_args=(points, self.data.COLOR_SCHEME['highlight_space'][self.config.THEME],
-                                                    self.config.COL_WIDTH, self.config.ROW_HEIGHT))
+        self._call_with_notification('holes', Common.get_closed_spaces, [row[:] for row in self.state.TILES], points, key=version,
+                                     callback=show_holes)
 
     def _set_maze_gen_algo(self, x):
         self.config.MAZE_ALGO = int(x)
+        self._configure_maze_pool()
+
+    def _configure_maze_pool(self):
+        """
+        Point the background map pool at the current maze generation algorithm and map size.
+        
+        :return:
+        """
+        if self.maze_pool:
+            self.maze_pool.configure(self.config.MAZE_ALGO, self.config.ROWS, self.config.COLS)
 
     def _set_wall_width(self, x):
         """
@@ -915,11 +1194,23 @@ class SnakeSim:
         :return:
         """
         self.config.ROWS, self.config.COLS = 30 * int(x), 60 * int(x)
+        self._configure_maze_pool()
+        self.viewport.reset()
         self.update_cell_size()
-        self.reset_map()
         self.reset_snake()
-        self.update_target()
+        self.reset_map()
+        self.engine.update_target()
         
+    def _set_visualizer_speed(self, factor):
+        """
+        Scale the playback speed of the visualizer.
+
+        :param factor: Multiplier applied to the current speed
+        :return:
+        """
+        self.config.VISUALIZER_SPEED = self.visualizer.set_speed(self.visualizer.speed * factor)
+        self.show_message(f"Visualizer speed x{self.config.VISUALIZER_SPEED:g}")
+
     def _set_speed(self, cmd, spinner):
         """
         Adjust the snake's speed (delay between moving again).
@@ -939,9 +1230,60 @@ class SnakeSim:
                 self.widgets['spinners'][0].configure(foreground="red")
                 self.root.after(500, lambda: self.widgets['spinners'][0].configure(foreground=self.data.COLOR_SCHEME['wid_fg'][self.config.THEME]))
         spinner.config(value=str(self.config.DELAY))
+        self.sim_loop.timestep = self.config.DELAY / 1000
 
     def update_cell_size(self):
-        self.config.COL_WIDTH, self.config.ROW_HEIGHT = math.ceil(self.canvas.winfo_width() / self.config.COLS), math.ceil(self.canvas.winfo_height() / self.config.ROWS)
+        self.viewport.resize(self.config.ROWS, self.config.COLS, self.canvas.winfo_width(), self.canvas.winfo_height())
+        self.config.COL_WIDTH, self.config.ROW_HEIGHT = self.viewport.col_width, self.viewport.row_height
+
+    def _draw_walls(self):
+        """
+        Redraw the walls inside the viewport, with the bitmap renderer if it is selected, or if cells are
+        too small to be worth drawing one by one.
+
+        :return: Number of canvas items used for walls
+        """
+        use_bitmap = self.config.WALL_RENDERER == 1 or (self.config.WALL_RENDERER == 2 and self.viewport.lod)
+        walls = self.wall_renderers[1 if use_bitmap else 0]
+        if walls is not self.walls:
+            if self.walls:
+                self.walls.clear()
+            self.walls = walls
+        return self.walls.redraw(self.state.TILES, self.config.COL_WIDTH, self.config.ROW_HEIGHT,
+                                 self.data.COLOR_SCHEME['w_fill'][self.config.THEME], self.viewport.window)
+
+    def _refresh_view(self):
+        """
+        Redraw the visible part of the map after the viewport has been moved, zoomed or resized.
+
+        :return:
+        """
+        self.config.COL_WIDTH, self.config.ROW_HEIGHT = self.viewport.col_width, self.viewport.row_height
+        self._draw_walls()
+        self.rects.release_all("highlight")
+        batch = TclBatch(self.canvas)
+        for row, col, item in self.state.SNAKE:
+            batch.coords(item, *self.viewport.box(row, col))
+        for item in self.rects.items("target"):
+            batch.coords(item, *self.viewport.box(*self.state.TARGET))
+        batch.run()
+
+    def _zoom(self, factor, x, y):
+        if self.viewport.zoom_at(factor, x, y):
+            self._refresh_view()
+
+    def _pan(self, rows, cols):
+        top, left, bottom, right = self.viewport.window
+        if self.viewport.pan(rows * max(1, (bottom - top) // 8), cols * max(1, (right - left) // 8)):
+            self._refresh_view()
+
+    def _toggle_unthrottled(self):
+        self.state.UNTHROTTLED = self.sim_loop.unthrottled = not self.state.UNTHROTTLED
+        self.show_message(f"Unthrottled simulation {'on' if self.state.UNTHROTTLED else 'off'}")
+
+    def _toggle_camera_follow(self):
+        self.state.CAMERA_FOLLOW = not self.state.CAMERA_FOLLOW
+        self.show_message(f"Camera follow {'on' if self.state.CAMERA_FOLLOW else 'off'}")
 
     @SimWrappers.call_safe
     def reset_snake(self):
@@ -950,12 +1292,11 @@ class SnakeSim:
 
         :return:
         """
-        self.canvas.delete("snek", "target", "message")
-        self.state.TILES[:] = [[0 if self.state.TILES[i][j] in self.state.SNAKE.keys() else self.state.TILES[i][j]
-                                for j in range(self.config.COLS)] for i in range(self.config.ROWS)]
-        self.state.ROUTING[:] = []
-        self.state.HEAD[:] = [None, None]
-        self.state.SNAKE.clear()
+        self.rects.release_all("snek")
+        self.rects.release_all("target")
+        self.canvas.delete("message")
+        self.stale_snake_items.clear()
+        self.engine.reset_snake()
         self._pulse_button(button_id='reset-snake', pulse=False)
 
     @SimWrappers.call_safe
@@ -965,33 +1306,43 @@ class SnakeSim:
 
         :return:
         """
-        self.canvas.delete("wall", "highlight")
-        snake_tile_ids = [self.state.TILES[i][j] for i, j in self.state.SNAKE.values()]
-        self.state.TILES[:] = [[0 for _ in range(self.config.COLS)] for _ in range(self.config.ROWS)]
-        for sid in snake_tile_ids:
-            tile = self.state.SNAKE[sid]
-            self.state.TILES[tile[0]][tile[1]] = sid
+        self.rects.release_all("highlight")
+        self.engine.reset_map()
+        self._draw_walls()
         self._pulse_button(button_id='reset-map', pulse=False)
 
     @SimWrappers.call_safe
-    def redraw_map(self):
+    def redraw_map(self, report=False):
         """
-        Redraw the global tile matrix as a map on canvas.
-        
-        WARNING: this does not clear existing tiles
+        Redraw the walls (tiles set to 1) of the global tile matrix as a map on canvas, replacing the
+        walls drawn before.
         
+        :param report: Show what the redraw took in the message area
+        :return:
+        """
+        if self.tracer:
+            # the time taken by redraws shows up in the exported trace
+            with self.tracer.span("redraw_map", 'redraw'):
+                self._draw_walls()
+        else:
+            self._draw_walls()
+        self.engine.grid_changed()
+        self.state.MAP_ANALYSIS = None
+        if report:
+            self.show_message(self._redraw_stats())
+
+    def _redraw_stats(self):
+        """
+        Describe the last redraw of the walls, for the message area.
+
         :return:
         """
-        for i in range(self.config.ROWS):  # draw map
-            for j in range(self.config.COLS):
-                if self.state.TILES[i][j] == 1:
-                    self.state.TILES[i][j] = self.canvas.create_rectangle(j * self.config.COL_WIDTH,
-                                                                          i * self.config.ROW_HEIGHT,
-                                                                          (j + 1) * self.config.COL_WIDTH,
-                                                                          (i + 1) * self.config.ROW_HEIGHT,
-                                                                          fill=self.data.COLOR_SCHEME['w_fill'][
-                                                                              self.config.THEME], tags=["wall"], width=0)
-        print(len(self.canvas.find_all()))
+        stats = (f"Drew {self.walls.cell_count:,} walls with {self.walls.item_count:,} items "
+                 f"in {self.walls.redraw_time * 1000:.1f} ms")
+        if isinstance(self.walls, WallRenderer):
+            # the most wall rectangles shown at once, i.e. what the pool of wall items has grown to
+            stats += f" (peak {self.rects.high_water.get(self.walls.tag, 0):,})"
+        return stats
 
     @SimWrappers.call_safe
     def _update_map(self, method):
@@ -1001,32 +1352,23 @@ class SnakeSim:
         :param method:
         :return:
         """
+        if self._job_pending('map', ('edit', method)):
+            return
         self.reset_snake()
         maze = [[1 if val else 0 for val in row] for row in self.state.TILES]
+
+        def apply():
+            for i in range(0, self.config.ROWS):
+                for j in range(0, self.config.COLS):
+                    self.state.TILES[i][j] = maze[i][j]
+            self.redraw_map(report=True)
+
         if method == 1:
-            Common.make_map_connected(maze, 0, 0, self.config.ROWS - 1, self.config.COLS - 1,
-                                     self.config.ROWS, self.config.COLS)
+            self._call_with_notification('map', Common.make_map_connected, maze, 0, 0, self.config.ROWS - 1, self.config.COLS - 1,
+                                         self.config.ROWS, self.config.COLS, key=('edit', method), replaces=('map', 'holes'), callback=apply)
         elif method == 2:
-            Common.make_map_open(maze)
-        self.canvas.delete("wall")
-        for i in range(0, self.config.ROWS):
-            for j in range(0, self.config.COLS):
-                self.state.TILES[i][j] = maze[i][j]
-        self.redraw_map()
+            self._call_with_notification('map', Common.make_map_open, maze, key=('edit', method), replaces=('map', 'holes'), callback=apply)
     
-    def update_target(self):
-        """
-        Randomly modifies the location of the target.
-        
-        :return:
-        """
-        self.state.TARGET[:] = [random.randrange(self.config.ROWS), random.randrange(self.config.COLS)]
-        while True:
-            if self.state.TILES[self.state.TARGET[0]][self.state.TARGET[1]] == 0:
-                if not Common.check_closed_path(self.state.TILES, self.state.TARGET[0], self.state.TARGET[1])[0]:
-                    break
-            self.state.TARGET[:] = [random.randrange(self.config.ROWS), random.randrange(self.config.COLS)]
-
     def _step(self, thd=None):
         """
         Run one step of the simulation.
@@ -1058,138 +1400,90 @@ class SnakeSim:
         if thd:
             self.root.after_cancel(thd)
         if tag == 'sim':
+            self.sim_loop.stop()
             self._get_button('step').configure(state="normal", text=self.data.WIDGET_ICONS["step"], foreground=self.data.COLOR_SCHEME['wid_fg'][self.config.THEME], command=self._step)
             self._get_button('reset-snake').configure(state="normal")
             self._get_button('run').configure(state="normal")
 
-    @SimWrappers.call_safe
-    def _create_block(self, x, y, y_width, x_height, dynamic=False):
+    def _block_cells(self, x, y, dynamic=False):
         """
-        Draws a block of tiles of the specified size on canvas.
+        Returns the free cells of a block of wall placed at a cell.
     
         :param x: X coordinate
         :param y: Y coordinate
-        :param y_width: Width of block
-        :param x_height: Height of block
         :param dynamic: Toggle block randomizer
-        :return:
+        :return: Cells of the block that are free
         """
         block = random.choices(population=[1, 2, 3, 4], weights=[0.9, 0.04, 0.007, 0.004], k=1)[0] if dynamic else self.config.WALL_WIDTH
-        self.state.TILES[x][y] = self.canvas.create_rectangle(y * y_width, x * x_height, (y + block) * y_width, (x + block) * x_height,
-                                                              fill=self.data.COLOR_SCHEME['w_fill'][self.config.THEME], tags=["wall"], width=0)
-        for i, r2 in enumerate([r1[y:y + block] for r1 in self.state.TILES[x:x + block]], start=x):
-            for j, c2 in enumerate(r2, start=y):
-                self.state.TILES[i][j] = self.state.TILES[x][y]
+        return [(i, j) for i in range(x, min(x + block, self.config.ROWS)) for j in range(y, min(y + block, self.config.COLS))
+                if not self.state.TILES[i][j]]
 
-    def best_path(self, x, y, alg):
+    def _on_engine_event(self, event, *data):
         """
-        Get the shortest or best path (along with the visited vertices) from the current coordinates to
-        TARGET based on the given algorithm.
-        
-        :param x: Base X coordinate
-        :param y: Base Y coordinate
-        :param alg: ID of pathfinding algorithm
-        :return: Best move as a coordinate tuple
+        Draws the changes of the simulation state reported by the engine.
+
+        :param event: Name of the event
+        :param data: Data of the event
+        :return:
         """
-        if alg == 0 or not alg:
-            return self.core.random_step((x, y), self.state.TILES, self.config.WRAPAROUND, self.config.EIGHT_DIRECTIONAL)
-        else:
-            args = ((x, y), self.state.TARGET, self.state.TILES, self.config.WRAPAROUND, self.config.EIGHT_DIRECTIONAL, self.config.BIDIRECTIONAL)
-            if alg == 1:
-                path_and_visited = self.core.depth_first_search(*args)
-            elif alg == 2:
-                path_and_visited = self.core.breadth_first_search(*args)
-            elif alg == 3:
-                path_and_visited = self.core.dijkstra(*args)
-            elif alg == 4:
-                path_and_visited = self.core.a_star(*args, self.config.HEURISTIC)
-            elif alg == 5:
-                path_and_visited = self.core.greedy_best_first_search(*args, self.config.HEURISTIC)
-            elif alg == 6:
-                path_and_visited = self.core.fringe_search(*args, self.config.HEURISTIC)
-            elif alg == 7:
-                path_and_visited = self.core.bellman_ford(*args)
-            elif alg == 8:
-                path_and_visited = self._call_with_timeout(self.core.iterative_deepening_a_star, *args, self.config.HEURISTIC)
-            del path_and_visited[0][-1]
-            return path_and_visited
+        if event == 'move':
+            # new cells are left undrawn (item 0) until the next render, which draws every step taken since at once
+            if data[1][2]:
+                self.stale_snake_items.append(data[1][2])
+        elif event == 'target':
+            self.rects.release_all("target")
+            self.rects.acquire("target", *self.viewport.box(*data), fill='orange')
+        elif event == 'caught':
+            self.rects.release_all("target")
+        elif event == 'timeout':
+            self.show_message("Operation timed out :(")
+        elif event == 'plan' and self.config.VISUALIZE:
+            self._visualize_sections([list(data[1]), data[0]],
+                                     [self.data.COLOR_SCHEME['highlight_visited'][self.config.THEME],
+                                      self.data.COLOR_SCHEME['highlight_path'][self.config.THEME]],
+                                     self.config.COL_WIDTH, self.config.ROW_HEIGHT)
+            raise AppException.VisualizerPending
 
-    def _sim(self, loop=False):
+    def _render_snake(self):
         """
-        Simulates an iteration of the current pathfinding algorithm once with the snake.
-        
-        :param loop: If this is true, the method is called again, basically getting
-                    the next simulation state
+        Draws the cells the snake has moved into or grown by since the last render, and hides the cells it has left,
+        with a single Tcl batch each.
+
+        :return:
+        """
+        snake = self.state.SNAKE
+        self.rects.release_many("snek", self.stale_snake_items)
+        self.stale_snake_items.clear()
+        head = 0
+        while head < len(snake) and not snake.items[head]:
+            head += 1
+        tail = len(snake)
+        while tail > head and not snake.items[tail - 1]:
+            tail -= 1
+        cells = [divmod(snake.cells[k], self.config.COLS) for k in itertools.chain(range(head), range(tail, len(snake)))]
+        if not cells:
+            return
+        outline = self.data.COLOR_SCHEME['canvas'][self.config.THEME]
+        body = self.data.COLOR_SCHEME['b_fill'][self.config.THEME]
+        items = self.rects.acquire_many("snek", [self.viewport.box(row, col) for row, col in cells], fill=body, stipple='gray75', outline=outline)
+        for k, item in zip(itertools.chain(range(head), range(tail, len(snake))), items):
+            snake.items[k] = item
+        if head:
+            self.canvas.itemconfig(snake.items[0], fill=self.data.COLOR_SCHEME['h_fill'][self.config.THEME])
+            if head < len(snake):
+                self.canvas.itemconfig(snake.items[head], fill=body)
+            if self.state.CAMERA_FOLLOW and self.viewport.follow(*snake.head):
+                self._refresh_view()
+
+    def _on_sim_stopped(self, error):
+        """
+        Handles the exception that stopped a simulation step or run.
+
+        :param error: Exception raised by the step
         :return:
         """
         try:
-            if not self.state.SNAKE_CHASING and not self.canvas.coords("target"):
-                self.update_target()
-                self.canvas.create_rectangle(self.state.TARGET[1] * self.config.COL_WIDTH, self.state.TARGET[0] * self.config.ROW_HEIGHT, (self.state.TARGET[1] + 1) * self.config.COL_WIDTH,
-                                             (self.state.TARGET[0] + 1) * self.config.ROW_HEIGHT, fill='orange', tags="target")
-            newpos: Tuple[int, int]
-            if not self.state.SNAKE_GAME:
-                try:
-                    # when snake is chasing, currently this doesn't re-evaluate the best path immediately when the
-                    # target's position has changed, maybe something to-do in the future; moreover this gives the snake
-                    # AI a more natural feeling, compared to knowing the target's location at all times (idk)
-                    # Regardless, this may be implemented later, maybe a toggle to ramp up difficulty
-                    if not self.state.ROUTING or Common.check_path_blocked(self.state.ROUTING, self.state.TILES):
-                        path_and_visited = self.best_path(self.state.HEAD[0], self.state.HEAD[1], alg=self.config.ALGO)
-                        if not isinstance(path_and_visited[0], int):
-                            self.state.ROUTING[:] = path_and_visited[0]
-                            if self.config.VISUALIZE:
-                                self._visualize_sections([list(path_and_visited[1]), path_and_visited[0]],
-                                                         [self.data.COLOR_SCHEME['highlight_visited'][self.config.THEME],
-                                                          self.data.COLOR_SCHEME['highlight_path'][self.config.THEME]],
-                                                         self.config.COL_WIDTH, self.config.ROW_HEIGHT)
-                                raise AppException.VisualizerPending
-                        else:
-                            self.state.ROUTING[:] = path_and_visited
-                    if isinstance(self.state.ROUTING[-1], tuple):
-                        newpos = self.state.ROUTING[-1]
-                        del self.state.ROUTING[-1]
-                    else:
-                        newpos = tuple(self.state.ROUTING)
-                        self.state.ROUTING.clear()
-                except IndexError:
-                    raise AppException.TargetBlocked
-            else:
-                if self.state.TILES[(self.state.HEAD[0]+self.state.CURRENT_DIRECTION_IN_GAME[0]) % self.config.ROWS][(self.state.HEAD[1]+self.state.CURRENT_DIRECTION_IN_GAME[1]) % self.config.COLS] != 0:
-                    newpos = Common.diagonal_adjusted(self.state.HEAD[0], self.state.HEAD[1], self.state.HEAD[0] + self.state.LAST_DIRECTION_IN_GAME[0],
-                                                      self.state.HEAD[1] + self.state.LAST_DIRECTION_IN_GAME[1], self.config.ROWS, self.config.COLS)
-                else:
-                    newpos = Common.diagonal_adjusted(self.state.HEAD[0], self.state.HEAD[1], self.state.HEAD[0] + self.state.CURRENT_DIRECTION_IN_GAME[0],
-                                                      self.state.HEAD[1] + self.state.CURRENT_DIRECTION_IN_GAME[1], self.config.ROWS, self.config.COLS)
-                    self.state.LAST_DIRECTION_IN_GAME[:] = self.state.CURRENT_DIRECTION_IN_GAME
-            if self.state.TILES[newpos[0]][newpos[1]] != 0:
-                raise AppException.RanIntoObject
-            self.state.TILES[newpos[0]][newpos[1]] = self.canvas.create_rectangle(newpos[1] * self.config.COL_WIDTH, newpos[0] * self.config.ROW_HEIGHT,
-                                                                                  (newpos[1] + 1) * self.config.COL_WIDTH, (newpos[0] + 1) * self.config.ROW_HEIGHT,
-                                                                                  fill=self.data.COLOR_SCHEME['h_fill'][self.config.THEME], tags=["snek"],
-                                                                                  stipple='gray75', outline=self.data.COLOR_SCHEME['canvas'][self.config.THEME])
-            last = self.state.SNAKE.popitem()
-            self.canvas.itemconfig(self.state.TILES[self.state.HEAD[0]][self.state.HEAD[1]], fill=self.data.COLOR_SCHEME['b_fill'][self.config.THEME])
-            self.canvas.delete(self.state.TILES[last[1][0]][last[1][1]])
-            self.state.TILES[last[1][0]][last[1][1]] = 0
-            self.state.SNAKE = {**{self.state.TILES[newpos[0]][newpos[1]]: [newpos[0], newpos[1]]}, **self.state.SNAKE}
-            self.state.PREV[:] = self.state.CURR
-            self.state.CURR[:] = self.state.SNAKE[list(self.state.SNAKE)[-1]]
-            self.state.HEAD[:] = newpos
-            if self.state.HEAD == self.state.TARGET:
-                self.canvas.delete("target")
-                if self.state.SNAKE_CHASING:
-                    raise AppException.TargetCaught
-                elif self.state.SNAKE_GAME:
-                    new_tail = self.core.random_step((self.state.CURR[0], self.state.CURR[1]), self.state.TILES)
-                    self.state.SNAKE[self.state.TILES[new_tail[0]][new_tail[1]]] = [new_tail[0], new_tail[1]]
-                    self.state.PREV[:] = self.state.CURR
-                    self.state.CURR[:] = new_tail[0], new_tail[1]
-            if loop:
-                self.state.SIM_CALLBACK = self.root.after(self.config.DELAY, self._sim, loop)
-                self._get_button('step').configure(text="\u25A0", foreground="red", command=lambda: self._stop('sim', self.state.SIM_CALLBACK))
-                self._get_button('reset-snake').configure(state="disabled")
-                self._get_button('run').configure(state="disabled")
+            raise error
         except AppException.RanIntoObject:
             self._handle_game_exception("collision")
         except AppException.TargetBlocked:
@@ -1198,8 +1492,32 @@ class SnakeSim:
             self._handle_game_exception("game_over")
         except AppException.VisualizerPending:
             self._await_for_timer(lambda: self.state.VISUALIZER_CALLBACK, func=self._run)
-        except TypeError:
-            self._stop('sim', self.state.SIM_CALLBACK)
+        except AppException.PlanPending:
+            # a single step waits for its path from the planner
+            self.root.after(self.config.FRAME_DELAY, self._sim)
+        except AppException.PlanTimedOut:
+            self._stop('sim')
+
+    def _sim(self, loop=False):
+        """
+        Simulates an iteration of the current pathfinding algorithm once with the snake.
+        
+        :param loop: If this is true, the simulation keeps running on a fixed timestep (the snake's delay), or as
+                    fast as possible when unthrottled, until it is stopped
+        :return:
+        """
+        if not loop:
+            try:
+                self.engine.step()
+            except Exception as error:
+                self._on_sim_stopped(error)
+            finally:
+                self._render_snake()
+            return
+        self.sim_loop.start(self.config.DELAY / 1000, self.state.UNTHROTTLED, on_stop=self._on_sim_stopped)
+        self._get_button('step').configure(text="\u25A0", foreground="red", command=lambda: self._stop('sim'))
+        self._get_button('reset-snake').configure(state="disabled")
+        self._get_button('run').configure(state="disabled")
 
     # @SimWrappers.call_safe
     def _gen_maze(self):
@@ -1208,37 +1526,39 @@ class SnakeSim:
         
         :return:
         """
+        rows, cols = self.config.ROWS, self.config.COLS
+        key = ('maze', self.config.MAZE_ALGO, rows, cols, self.config.VISUALIZE)
+        if self._job_pending('map', key):
+            return
         self.reset_map()
         self.reset_snake()
-        startx, starty = 0, 0
-        if self.config.MAZE_ALGO == 0:
-            maze, original_points, converted_points = self.core.simple_maze_generation(self.config.ROWS, self.config.COLS)
-        elif self.config.MAZE_ALGO == 1:
-            maze, original_points, converted_points = self.core.diagonal_maze_generation(self.config.ROWS, self.config.COLS)
-        elif self.config.MAZE_ALGO == 2:
-            maze, original_points, converted_points = self.core.dungeon_rooms_maze_generation(self.config.ROWS, self.config.COLS)
-        elif self.config.MAZE_ALGO == 3:
-            maze, original_points, converted_points = self.core.dfs_maze_generation(self.config.ROWS, self.config.COLS)
-            startx, starty = 1, 1
-        elif self.config.MAZE_ALGO == 4:
-            maze, original_points, converted_points = self.core.recursive_division_maze_generation(self.config.ROWS, self.config.COLS)
-        elif self.config.MAZE_ALGO == 5:
-            maze, original_points, converted_points = self.core.cell_opening_maze_generation(self.config.ROWS, self.config.COLS)
-        elif self.config.MAZE_ALGO == 6:
-            maze, original_points, converted_points = self.core.iterative_prims_maze_generation(self.config.ROWS, self.config.COLS)
+
+        def load(packed, note=None):
+            self.state.TILES[:] = MatrixHelpers.unpack(packed, rows, cols)
+            self.redraw_map()
+            self.show_message(f"{self._redraw_stats()}, {note}" if note else self._redraw_stats())
+
         if self.config.VISUALIZE:
             if self.state.VISUALIZER_CALLBACK:
                 self._stop_visualizer_callback()
             self._pulse_button('gen-maze', pulse=True)
-            if original_points:
-                self._visualise_maze_in_place([original_points, converted_points], self.config.COL_WIDTH, self.config.ROW_HEIGHT, matrix=maze)
-            else:
-                self._visualise_maze_in_place(converted_points, self.config.COL_WIDTH, self.config.ROW_HEIGHT, matrix=maze)
+            self._call_with_notification('map', self.core.generate, self.config.MAZE_ALGO, rows, cols, True, key=key,
+                                         replaces=('map', 'holes'), with_result=True,
+                                         callback=lambda result: self._visualise_maze_in_place(result[1], self.config.COL_WIDTH,
+                                                                                               self.config.ROW_HEIGHT, *result[2]))
         else:
-            for im, i in enumerate(range(startx, self.config.ROWS)):
-                for jm, j in enumerate(range(starty, self.config.COLS)):
-                    self.state.TILES[i][j] = maze[im][jm]
-            self.redraw_map()
+            packed = self.maze_pool.take() if self.maze_pool else None
+            if packed is None:
+                if self.maze_pool:
+                    self.show_message(f"Map pool empty (hit rate {self.maze_pool.hit_rate:.0%})")
+                self._call_with_notification('map', self.core.generate, self.config.MAZE_ALGO, rows, cols, key=key,
+                                             replaces=('map', 'holes'), with_result=True,
+                                             callback=lambda result: load(MatrixHelpers.pack(result[0], rows, cols, *result[2])))
+            else:
+                # a map generated in the background would replace this one once it had finished
+                for job in self.jobs.pending(('map', 'holes')):
+                    self.jobs.cancel(job)
+                load(packed, f"map pool hit rate {self.maze_pool.hit_rate:.0%}")
 
 # def run_app():
 #     configuration = SimConfig()
@@ -1,8 +1,13 @@
+import itertools
 import math
+import re
 from typing import List, Tuple
 import random
 
 class Common:
+	_DEAD_END_TABLE = bytes(1 if count == 3 else 0 for count in range(256))
+	_OPEN_TABLE = bytes(0 if val else 1 for val in range(256))
+
 	@staticmethod
 	def valid_moves(x, y, rows, cols, prune=False, all_directional=False) -> List[Tuple[int, int]]:
 		"""
@@ -94,6 +99,36 @@ class Common:
 					stack.append((new_x, new_y))
 		return True, list(visited)
 	
+	@staticmethod
+	def bresenham(x0, y0, x1, y1, four_connected=False) -> List[Tuple[int, int]]:
+		"""
+		Returns the cells on the line between two cells, using Bresenham's line algorithm
+
+		:param x0: X coordinate of the first cell
+		:param y0: Y coordinate of the first cell
+		:param x1: X coordinate of the last cell
+		:param y1: Y coordinate of the last cell
+		:param four_connected: Move along one axis at a time, so that consecutive cells share a side
+		:return: List of coordinates from the first cell to the last, both included
+		"""
+		dx, dy = abs(x1 - x0), -abs(y1 - y0)
+		sx, sy = 1 if x0 < x1 else -1, 1 if y0 < y1 else -1
+		err = dx + dy
+		cells = [(x0, y0)]
+		while x0 != x1 or y0 != y1:
+			e2 = 2 * err
+			step_x, step_y = e2 >= dy, e2 <= dx
+			if step_x:
+				err += dy
+				x0 += sx
+				if step_y and four_connected:
+					cells.append((x0, y0))
+			if step_y:
+				err += dx
+				y0 += sy
+			cells.append((x0, y0))
+		return cells
+
 	@staticmethod
 	def diagonal_adjusted(x1, y1, x2, y2, rows, cols) -> Tuple[int, int]:
 		"""
@@ -170,25 +205,73 @@ class Common:
 		return points
 	
 	@staticmethod
-	def get_closed_spaces(maze, out):
+	def get_closed_spaces(maze, out, token=None):
 		"""
 		Returns a list of points that are contained within closed spaces in the map
 		:param maze: 2D matrix
 		:param out: Reference list to return output in (inplace)
+		:param token: Cancellation token, given the number of cells searched as progress
 		:return:
 		"""
-		for i in range(len(maze)):
-			for j in range(len(maze[0])):
+		rows, cols = len(maze), len(maze[0])
+		for i in range(rows):
+			for j in range(cols):
+				if token:
+					token.step(i * cols + j, rows * cols)
 				if (i, j) not in out and maze[i][j] == 0:
 					tpl = Common.check_closed_path(maze, i, j)
 					if tpl[0]:
 						out.extend(tpl[1])
 	
 	@staticmethod
-	def make_map_connected(matrix: List[List[int]], startx, starty, endx, endy, rows, cols):
+	def label_open_regions(grid, rows, cols, token=None) -> Tuple[List[Tuple[int, int, int]], List[int]]:
+		"""
+		Labels the 4-connected regions of open cells in a flat, row-major grid; works on horizontal runs of open cells
+		(merged with the overlapping runs of the previous row) instead of on single cells
+
+		:param grid: Flat, row-major grid with one byte per cell (0 for open cells)
+		:param rows: Number of rows in grid
+		:param cols: Number of columns in grid
+		:param token: Cancellation token, checked once per row
+		:return: Tuple of the runs of open cells as (row, first column, end column) tuples in row-major order, and the
+				region label of each run
+		"""
+		def find(x):
+			while parent[x] != x:
+				parent[x] = parent[parent[x]]
+				x = parent[x]
+			return x
+
+		runs, parent, prev = [], [], []
+		for i in range(rows):
+			if token:
+				token.check()
+			current, p = [], 0
+			for match in re.finditer(rb'\x00+', grid[i * cols:(i + 1) * cols]):
+				a, b = match.span()
+				idx = len(runs)
+				runs.append((i, a, b))
+				parent.append(idx)
+				current.append(idx)
+				while p < len(prev) and runs[prev[p]][2] <= a:  # skip runs above that end before this one
+					p += 1
+				q = p
+				while q < len(prev) and runs[prev[q]][1] < b:  # union with every run above that overlaps this one
+					root_a, root_b = find(idx), find(prev[q])
+					if root_a != root_b:
+						parent[max(root_a, root_b)] = min(root_a, root_b)
+					q += 1
+			prev = current
+		return runs, [find(idx) for idx in range(len(runs))]
+
+	@staticmethod
+	def make_map_connected(matrix: List[List[int]], startx, starty, endx, endy, rows, cols, token=None):
 		"""
 		Makes the map represented by the 2d matrix well-connected in-place, with less frequent dead ends and more branches
 
+		Dead ends are found for the whole map at once, by summing shifted copies of the (flattened) wall grid packed
+		into a single integer, one byte per cell
+
 		:param matrix: 2d matrix
 		:param startx: initial X coordinate
 		:param starty: initial Y coordinate
@@ -196,64 +279,73 @@ class Common:
 		:param endy: last Y coordinate to stop at
 		:param rows: Number of rows in parent matrix
 		:param cols: Number of rows in parent matrix
+		:param token: Cancellation token, given the number of dead ends opened up as progress
 		"""
-		for im, i in enumerate(range(startx, endx)):
-			for jm, j in enumerate(range(starty, endy)):
-				if im == 0 or jm == 0 or im == rows - 2 or jm == cols - 2:  # this helps make entry points at the edges of map
-					if (im == 0 and matrix[im + 1][jm] == 0 and random.random() < 0.4) or \
-						(im == rows - 2 and matrix[im - 1][jm] == 0 and random.random() < 0.4) or \
-						(jm == 0 and matrix[im][jm + 1] == 0 and random.random() < 0.4) or \
-						(jm == cols - 2 and matrix[im][jm - 1] == 0 and random.random() < 0.4):
-						matrix[im][jm] = 0
-				if matrix[im][jm] == 0:
-					count_of_ones = 0  # this is to not create dead ends, make the map well-connected
-					neighbors = []
-					directions = [(-1, 0), (1, 0), (0, -1), (0, 1)]
-					for di, dj in directions:
-						ni, nj = (im + di) % rows, (jm + dj) % cols
-						if 1 <= ni < rows - 2 and 1 <= nj < cols - 2:
-							if matrix[ni][nj] == 1:
-								count_of_ones += 1
-								neighbors.append((ni, nj))  # Store the neighbor's position
-					# If there are exactly 3 ones surrounding the 0
-					if count_of_ones == 3:
-						# Randomly select one neighbor to set to 0
-						selected_neighbor = random.choice(neighbors)
-						matrix[selected_neighbor[0]][selected_neighbor[1]] = 0
-	
+		n = rows * cols
+		height, width = endx - startx, endy - starty
+		grid = bytearray(map(bool, itertools.chain.from_iterable(matrix)))
+		# this helps make entry points at the edges of map
+		edges = {(im, jm) for im in (0, height - 1) for jm in range(width)} | {(im, jm) for im in range(height) for jm in (0, width - 1)}
+		for im, jm in sorted(edges):
+			if (im == 0 and grid[(im + 1) * cols + jm] == 0 and random.random() < 0.4) or \
+				(im == rows - 2 and grid[(im - 1) * cols + jm] == 0 and random.random() < 0.4) or \
+				(jm == 0 and grid[im * cols + jm + 1] == 0 and random.random() < 0.4) or \
+				(jm == cols - 2 and grid[im * cols + jm - 1] == 0 and random.random() < 0.4):
+				grid[im * cols + jm] = 0
+		# only walls in the inner part of the map count towards (and can be removed from) dead ends
+		interior = bytearray(n)
+		region = bytearray(n)
+		for i in range(1, rows - 2):
+			interior[i * cols + 1:i * cols + cols - 2] = b'\x01' * (cols - 3)
+		for i in range(height):
+			region[i * cols:i * cols + width] = b'\x01' * width
+		full = (1 << 8 * n) - 1
+		walls = int.from_bytes(grid, 'big') & int.from_bytes(interior, 'big')
+		# neighbour count convolution; byte k of the sum is the number of walls at k - 1, k + 1, k - cols and k + cols
+		counts = ((walls >> 8) + (walls << 8) + (walls >> 8 * cols) + (walls << 8 * cols)) & full
+		dead_ends = int.from_bytes(counts.to_bytes(n, 'big').translate(Common._DEAD_END_TABLE), 'big')
+		dead_ends &= int.from_bytes(grid.translate(Common._OPEN_TABLE), 'big') & int.from_bytes(region, 'big')
+		dead_ends = dead_ends.to_bytes(n, 'big')
+		total = dead_ends.count(1) if token else 0
+		for index, match in enumerate(re.finditer(b'\x01', dead_ends)):
+			if token:
+				token.step(index, total)
+			k = match.start()
+			neighbors = [nk for nk in (k - cols, k + cols, k - 1, k + 1) if 0 <= nk < n and interior[nk] and grid[nk]]
+			if len(neighbors) == 3:  # still a dead end (a neighbouring dead end may already have been opened up)
+				grid[random.choice(neighbors)] = 0
+		for i in range(rows):
+			matrix[i][:] = grid[i * cols:(i + 1) * cols]
+
 	@staticmethod
-	def make_map_open(matrix):
+	def make_map_open(matrix, token=None):
+		"""
+		Opens up every region of the map in-place, by turning one wall bordering each region into a gap;
+		all regions are labelled in a single pass beforehand
+
+		:param matrix: 2D matrix
+		:param token: Cancellation token, given the number of runs of open cells done as progress
+		"""
 		rows, cols = len(matrix), len(matrix[0])
-		visited = [[False] * cols for _ in range(rows)]
-		# Find all closed spaces (you can modify the starting point as needed)
-		for y in range(rows):
-			for x in range(cols):
-				if matrix[y][x] == 0 and not visited[y][x]:
-					closed_space = Common.flood_fill(matrix, x, y, visited)
-					# Check if we have a closed space
-					if closed_space:
-						# Choose an exit point (e.g., the first point found in the closed space)
-						exit_point = None
-						for (ex, ey) in closed_space:
-							# Check the neighbors to find a `1` to turn into a `0`
-							if (ex + 1 < cols and matrix[ey][ex + 1] == 1) or \
-								(ex - 1 >= 0 and matrix[ey][ex - 1] == 1) or \
-								(ey + 1 < rows and matrix[ey + 1][ex] == 1) or \
-								(ey - 1 >= 0 and matrix[ey - 1][ex] == 1):
-								exit_point = (ex, ey)
-								break
-						# If an exit point was found, make it open
-						if exit_point:
-							exit_x, exit_y = exit_point
-							# Change one of the bordering `1`s to `0`
-							if exit_x + 1 < cols and matrix[exit_y][exit_x + 1] == 1:
-								matrix[exit_y][exit_x + 1] = 0
-							elif exit_x - 1 >= 0 and matrix[exit_y][exit_x - 1] == 1:
-								matrix[exit_y][exit_x - 1] = 0
-							elif exit_y + 1 < rows and matrix[exit_y + 1][exit_x] == 1:
-								matrix[exit_y + 1][exit_x] = 0
-							elif exit_y - 1 >= 0 and matrix[exit_y - 1][exit_x] == 1:
-								matrix[exit_y - 1][exit_x] = 0
+		grid = bytearray(map(bool, itertools.chain.from_iterable(matrix)))
+		runs, labels = Common.label_open_regions(grid, rows, cols, token)
+		opened = set()
+		for index, ((y, start, end), label) in enumerate(zip(runs, labels)):
+			if token:
+				token.step(index, len(runs))
+			if label in opened:
+				continue
+			for x in range(start, end):
+				# Change one of the bordering `1`s to `0`
+				k = y * cols + x
+				for nk, inside in ((k + 1, x + 1 < cols), (k - 1, x - 1 >= 0), (k + cols, y + 1 < rows), (k - cols, y - 1 >= 0)):
+					if inside and grid[nk] == 1:
+						grid[nk] = 0
+						matrix[nk // cols][nk % cols] = 0
+						opened.add(label)
+						break
+				if label in opened:
+					break
 	
 	@staticmethod
 	def heuristic(a, b, opt=0):
@@ -277,6 +369,18 @@ class Common:
 		# Convert to hex format
 		return f'#{new_color[0] // 256:02x}{new_color[1] // 256:02x}{new_color[2] // 256:02x}'
 
+	@staticmethod
+	def color_ramp(c1, c2, steps):
+		"""
+		Precompute evenly spaced colours from c1 to c2 (both included) as hex strings.
+
+		:param c1: Start colour, as 16-bit RGB components
+		:param c2: End colour, as 16-bit RGB components
+		:param steps: Number of colours
+		:return: List of colours
+		"""
+		return [Common.interpolate_color(c1, c2, k / (steps - 1)) for k in range(steps)]
+
 class AppException:
 	class TargetBlocked(Exception):
 		pass
@@ -288,4 +392,52 @@ class AppException:
 		pass
 	
 	class VisualizerPending(Exception):
-		pass
\ No newline at end of file
+		pass
+	
+	class PlanPending(Exception):
+		pass
+	
+	class PlanTimedOut(Exception):
+		pass
+	
+	class Cancelled(Exception):
+		pass
+
+class CancelToken:
+	"""
+	Lets a long-running call be cancelled from another thread, and report how far along it is.
+
+	The call reports its progress with step() every so often, which raises AppException.Cancelled once the token has
+	been cancelled; cancelling only sets a flag, and checking it is a single attribute read, so calls may check in
+	their inner loops and stop within milliseconds.
+	"""
+	def __init__(self):
+		self.cancelled = False
+		self.done = 0
+		self.total = 0
+
+	@property
+	def fraction(self) -> float:
+		return min(self.done / self.total, 1.0) if self.total else 0.0
+
+	def cancel(self):
+		self.cancelled = True
+
+	def check(self):
+		"""
+		:raises AppException.Cancelled: If the token has been cancelled
+		"""
+		if self.cancelled:
+			raise AppException.Cancelled
+
+	def step(self, done, total):
+		"""
+		Reports progress, and checks for cancellation
+
+		:param done: Units of work done
+		:param total: Units of work in all
+		:raises AppException.Cancelled: If the token has been cancelled
+		"""
+		if self.cancelled:
+			raise AppException.Cancelled
+		self.done, self.total = done, total
\ No newline at end of file
@@ -0,0 +1,60 @@
+from array import array
+from typing import Iterator, Tuple
+
+class EventLog:
+	"""
+	Compact record of the cell edits made while generating a map, used for replaying the generation on canvas.
+	Each event is stored as a single integer in a flat array: the flat cell index shifted left by one, with the
+	op code (set or clear) in the lowest bit.
+
+	If `filled` is set, the replay starts from a grid of shape (rows, cols) that is entirely walls, so generators
+	that carve their maze out of a solid block do not need to record every wall up front.
+	"""
+	CLEAR = 0
+	SET = 1
+
+	def __init__(self, rows, cols, filled=False):
+		self.rows = rows
+		self.cols = cols
+		self.filled = filled
+		self.events = array('q')
+
+	def set(self, i, j):
+		"""
+		Records a wall being placed at the given cell
+
+		:param i: Row of cell
+		:param j: Column of cell
+		"""
+		self.events.append((i * self.cols + j) << 1 | EventLog.SET)
+
+	def clear(self, i, j):
+		"""
+		Records a wall being removed from the given cell
+
+		:param i: Row of cell
+		:param j: Column of cell
+		"""
+		self.events.append((i * self.cols + j) << 1)
+
+	def set_all(self, matrix):
+		"""
+		Records a set event for every wall in the given matrix, in row-major order
+
+		:param matrix: 2D matrix
+		"""
+		cols = self.cols
+		self.events.extend((i * cols + j) << 1 | EventLog.SET
+		                   for i, row in enumerate(matrix) for j, val in enumerate(row) if val)
+
+	def __len__(self):
+		return len(self.events)
+
+	def __iter__(self) -> Iterator[Tuple[int, int, int]]:
+		"""
+		Yields events as (row, column, op) tuples, in the order they were recorded
+		"""
+		cols = self.cols
+		for event in self.events:
+			i, j = divmod(event >> 1, cols)
+			yield i, j, event & 1
@@ -39,6 +39,37 @@ class MatrixHelpers:
 			subset.append(row)
 		return subset
 	
+	@staticmethod
+	def pack(matrix: List[List[int]], rows, cols, startx=0, starty=0) -> bytes:
+		"""
+		Packs a 2D matrix into a flat, row-major byte string of shape (rows, cols), with one byte per cell
+		(1 for any non-zero value); cells not covered by the matrix are left empty
+
+		:param matrix: 2D matrix
+		:param rows: Number of rows of packed matrix
+		:param cols: Number of columns of packed matrix
+		:param startx: Row offset the matrix is placed at
+		:param starty: Column offset the matrix is placed at
+		:return: Packed matrix
+		"""
+		packed = bytearray(rows * cols)
+		for i, row in enumerate(matrix[:rows - startx], start=startx):
+			base = i * cols + starty
+			packed[base:base + min(len(row), cols - starty)] = bytes(1 if val else 0 for val in row[:cols - starty])
+		return bytes(packed)
+
+	@staticmethod
+	def unpack(packed, rows, cols) -> List[List[int]]:
+		"""
+		Unpacks a flat, row-major byte string into a 2D matrix of shape (rows, cols)
+
+		:param packed: Packed matrix
+		:param rows: Number of rows of matrix
+		:param cols: Number of columns of matrix
+		:return: 2D matrix
+		"""
+		return [list(packed[i * cols:(i + 1) * cols]) for i in range(rows)]
+
 	@staticmethod
 	def reconstruct_path(point, forward, backward=None):
 		def get_path_section(root, backtrack):
@@ -5,8 +5,10 @@ SimState: These variables are internal application variables and must not be mod
 SimData: These variables hold larger values and can be changed while maintaining the variable format
 """
 
-from typing import List, Dict, Optional
-from threading import Thread
+import os
+from typing import Dict, List, Optional
+from ..core.map_analysis import MapAnalysis
+from ..core.snake_body import SnakeBody
 
 class SimConfig:
 	def __init__(self):
@@ -26,6 +28,21 @@ class SimConfig:
 		self.FONT_INDEX: int = 3
 		self.FRAME_DELAY: int = 50
 		self.MIN_CHASE_DELAY: int = 3
+		self.MAZE_POOL_SIZE: int = 3
+		self.RECT_POOL_SIZE: int = 64
+		self.WALL_RENDERER: int = 2     # 0: merged rectangle runs, 1: single bitmap image, 2: bitmap when zoomed out
+		self.VISUALIZER_SPEED: float = 1.0
+		self.BACKGROUND_PLANNING: bool = True
+		self.WORKER_POOL_SIZE: int = max(2, os.cpu_count() or 1)   # worker processes for planning and races, started with the app
+		self.PLAN_TIMEOUT: float = 5.0      # seconds a plan may take before it is given up
+		self.RACE_TIMEOUT: float = 10.0     # seconds each algorithm may take in a race
+		self.RACE_MEMORY: bool = True       # measure the peak memory use of each algorithm in a race (plans it twice)
+		self.SHARED_GRID: bool = True       # workers read the map from shared memory instead of a pickled copy
+		self.PARALLEL_BIDIRECTIONAL: bool = True    # bidirectional BFS/Dijkstra/A* search from both ends at once, on two workers
+		self.TRACE_CALLBACKS: bool = False  # time every Tk callback, and sample the stack of the ones that stall the UI
+		self.STALL_THRESHOLD: float = 0.05  # seconds a callback may block the event loop for before it counts as a stall
+		self.JOB_LIMITS: Dict[str, int] = {'map': 1, 'holes': 1}    # background jobs of each kind run at once (map edits and mazes, finding holes)
+		self.FILTER_MODE: int = 1       # 0: image frames from the filter directory, 1: generated scanlines, 2: static scanlines
 		self.WRAPAROUND: bool = True
 		self.EIGHT_DIRECTIONAL: bool = True
 		self.BIDIRECTIONAL: bool = False
@@ -33,27 +50,29 @@ class SimConfig:
 
 class SimState:
 	def __init__(self):
-		self.SIM_CALLBACK: Optional[str] = None
 		self.MOVING_CALLBACK: Optional[str] = None
 		self.MESSAGE_CALLBACK: Optional[str] = None
 		self.VISUALIZER_CALLBACK: Optional[str] = None
-		self.FILTER_WORKER: Optional[Thread] = None
+		self.FILTER_WORKER: Optional[int] = None   # subscription of the filter to the animation scheduler
 		self.FILTER_WORKER_STATUS: bool = True
 		self.KEY_PRESSED: bool = False
 		self.SNAKE_CHASING: bool = False
 		self.SNAKE_GAME: bool = False
 		self.MAZE_DYN: bool = False
+		self.CAMERA_FOLLOW: bool = False
+		self.UNTHROTTLED: bool = False
+		self.GRID_VERSION: int = 0
+		self.TARGET_PLACED: bool = False
 		self.TARGET: List[Optional[int], Optional[int]] = [None, None]
 		self.HEAD: List[Optional[int], Optional[int]] = [None, None]
 		self.CURR: List[int, int] = [0, 0]
 		self.PREV: List[int, int] = [0, 0]
 		self.LAST_DIRECTION_IN_GAME: List[Optional[int], Optional[int]] = [None, None]
 		self.CURRENT_DIRECTION_IN_GAME: List[int, int] = [0, 1]
-		self.FRAMES: List = []
-		self.FRAME_ID: List = []
 		self.ROUTING: List = []
 		self.TILES: List = []
-		self.SNAKE: Dict = {}
+		self.SNAKE: Optional[SnakeBody] = None
+		self.MAP_ANALYSIS: Optional[MapAnalysis] = None
 
 class SimData:
 	def __init__(self):
@@ -175,6 +194,7 @@ class SimData:
 			'make-connected': "Break closed edges",
 			'make-open': "Open closed spaces",
 			'visualizer': "Toggle visualizer",
+			'race': "Race all pathfinding\nalgorithms",
 		}
 		
 		self.WIDGET_ICONS = {
@@ -198,13 +218,22 @@ class SimData:
 			'make-connected': "\U0001F517",
 			'make-open': "\U0001FA93",
 			'visualizer': "\U0001F441",
+			'race': "\u23F1",
 			'help': "\u2754",
 			'about': "\u24D8"
 		}
 		
 		# currently supporting only these; more can be added in pathfinding.py
 		self.PATHFINDING_ALGOS = [
-			'Random Walk', 'Depth First', 'Breadth First', 'Greedy Best First', 'A*', 'Dijkstra', 'Fringe', 'Bellman-Ford', 'Iterative Deepening A*'
+			'Random Walk', 'Depth First', 'Breadth First', 'Greedy Best First', 'A*', 'Dijkstra', 'Fringe', 'Bellman-Ford', 'Iterative Deepening A*',
+			'Junction Graph'
+		]
+		# names by algorithm ID (see SimEngine.find_path), where Dijkstra and greedy best first are swapped
+		self.PATHFINDING_NAMES = [self.PATHFINDING_ALGOS[i] for i in (0, 1, 2, 5, 4, 3, 6, 7, 8, 9)]
+		
+		# colour of each pathfinding algorithm by ID when playing back a race
+		self.RACE_COLORS = [
+			'#FFFFFF', '#E6194B', '#3CB44B', '#FFE119', '#4363D8', '#F58231', '#911EB4', '#42D4F4', '#F032E6', '#BFEF45'
 		]
 		
 		self.MAZE_GENERATION_ALGOS = [
@@ -227,13 +256,16 @@ class SimData:
 		                 f"{self.WIDGET_ICONS['dynamic-wall']} - Toggle making walls having randomized width while drawing\n\n" \
 		                 f"{self.WIDGET_ICONS['wraparound']} - Toggle wrapping symmetrically from end-to-end when at edges\n\n" \
 		                 f"{self.WIDGET_ICONS['cardinal_movement']} - Toggle 4-directional or 8-directional movement\n\n" \
-		                 f"{self.WIDGET_ICONS['bidirectional']} - Toggle making pathfinding bidirectional\n\n" \
+		                 f"{self.WIDGET_ICONS['bidirectional']} - Toggle making pathfinding bidirectional; breadth first, Dijkstra and A* then search " \
+		                 f"from both ends at once, on two processes\n\n" \
 		                 f"{self.WIDGET_ICONS['gen-maze']} - Generate maze with a new seed\n\n" \
 		                 f"{self.WIDGET_ICONS['find-holes']} - Finds all holes or closed spaces in the map and highlights them\n\n" \
 		                 f"{self.WIDGET_ICONS['make-connected']} - Breaks up points in closed spaces to enforce connectivity\n\n" \
 		                 f"{self.WIDGET_ICONS['make-open']} - Tears up calculated sections of the map to enforce connectivity\n\n" \
 		                 f"{self.WIDGET_ICONS['visualizer']} - Toggle visualizing pathfinding/maze-generation algorithms;" \
 		                 f"if this is toggled off, it will clear all visualized/highlighted areas\n\n" \
+		                 f"{self.WIDGET_ICONS['race']} - Race every pathfinding algorithm from the snake's head to the target, and rank them " \
+		                 f"by time taken; with the visualizer on, their searches are played back together, one colour each\n\n" \
 		                 f"{self.WIDGET_ICONS['crt-mode']} - Toggle the scanline filter for a CRT effect (reduces app performance)\n\n" \
 		                 f"{self.WIDGET_ICONS['play-snake']} - Toggle playing the game of Snake\n\n" \
 		                 f"{self.WIDGET_ICONS['snake-chase']} - Toggle playing as the target instead of the snake in Snake\n\n" \
@@ -247,6 +279,13 @@ class SimData:
 		                 f"or the visualizer buttons to reset to the original state\n\n" \
 		                 f"\u2B50 Buttons may sometimes pulse as a hint or while they are performing a task\n\n" \
 		                 f"\u2B50 Certain buttons (on the right side) affect the way pathfinding works and can be toggled on or off at any point\n\n" \
+		                 f"\u2B50 While visualizing, use [ and ] to slow down or speed up playback, and Enter to skip to the end\n\n" \
+		                 f"\u2B50 Long tasks (maze generation, finding holes, making the map connected or open, races) show their progress, " \
+		                 f"and can be cancelled with Esc or the cancel button above the message area; pressing a button again while " \
+		                 f"its task is still running does not start it twice\n\n" \
+		                 f"\u2B50 Use the mouse wheel to zoom in or out, the arrow keys to move the view, and F to make the view follow the snake\n\n" \
+		                 f"\u2B50 Press U to run the simulation as fast as possible, drawing the snake once per frame\n\n" \
+		                 f"\u2B50 With callback tracing on (SimConfig.TRACE_CALLBACKS), press T to save the trace of the UI for chrome://tracing\n\n" \
 		                 f"\u2B50 Changing the maze generation algorithm will not change the current maze, it must be regenerated\n\n" \
 		                 f"\u2B50 Increasing the maze size will reduce the speed of visualization and may thus incur some performance loss\n\n" \
 		                 f"\u2B50 It is advisable to use the filter effect only when working with small mazes, otherwise it will cause significant lag;" \
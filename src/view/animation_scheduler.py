@@ -0,0 +1,86 @@
+import itertools
+import time
+import tkinter as tk
+from typing import Callable, Optional
+
+class AnimationScheduler:
+	"""
+	Ticks every running animation from a single Tk callback per frame, instead of one after() chain per animation.
+
+	Subscribers are called with the time of the frame, from the highest priority to the lowest, every frame or at
+	most once per given interval; a subscriber returning False or raising an exception is removed. Once the frame's time budget is used up,
+	subscribers with a negative priority (cosmetic ones, like pulsing buttons) are put off to a later frame. The
+	scheduler stops ticking while it has no subscribers.
+	"""
+	def __init__(self, root: tk.Misc, frame_delay=16, budget=0.012):
+		self.root = root
+		self.frame_delay = frame_delay
+		self.budget = budget
+		self.after_id: Optional[str] = None
+		self.ticks = 0
+		self.deferred = 0
+		self.tracer = None      # CallbackTracer recording a span for every subscriber ticked, if set
+		self._ticking = False
+		self._subscribers = {}      # handle -> [priority, interval, due, callback]
+		self._order = []            # handles from the highest priority to the lowest
+		self._handles = itertools.count(1)
+
+	def __len__(self):
+		return len(self._subscribers)
+
+	def subscribe(self, callback: Callable, priority=0, interval=0.0) -> int:
+		"""
+		Adds an animation, first ticked on the next frame
+
+		:param callback: Function called with the time of the frame (as returned by time.perf_counter())
+		:param priority: Subscribers with a higher priority are ticked first; negative ones may be put off
+		:param interval: Minimum time between ticks, in seconds
+		:return: Handle of the subscription, always truthy
+		"""
+		handle = next(self._handles)
+		self._subscribers[handle] = [priority, interval, 0.0, callback]
+		self._order.append(handle)
+		self._order.sort(key=lambda h: -self._subscribers[h][0])
+		if self.after_id is None and not self._ticking:
+			self.after_id = self.root.after(0, self._tick)
+		return handle
+
+	def unsubscribe(self, handle):
+		"""
+		Removes an animation; removing one that is not subscribed does nothing
+		"""
+		if self._subscribers.pop(handle, None) is not None:
+			self._order.remove(handle)
+		if not self._subscribers and self.after_id is not None:
+			self.root.after_cancel(self.after_id)
+			self.after_id = None
+
+	def _tick(self):
+		now = time.perf_counter()
+		self.after_id, self._ticking = None, True
+		self.ticks += 1
+		try:
+			for handle in tuple(self._order):
+				subscriber = self._subscribers.get(handle)
+				if subscriber is None or now < subscriber[2]:
+					continue
+				if subscriber[0] < 0 and time.perf_counter() - now >= self.budget:
+					self.deferred += 1
+					continue
+				subscriber[2] = now + subscriber[1]
+				try:
+					if self.tracer is not None:
+						with self.tracer.span(subscriber[3], 'animation'):
+							done = subscriber[3](now) is False
+					else:
+						done = subscriber[3](now) is False
+				except Exception:
+					self.unsubscribe(handle)
+					raise
+				if done:
+					self.unsubscribe(handle)
+		finally:
+			# a failing animation is removed, but must not stop the others
+			self._ticking = False
+			if self._subscribers:
+				self.after_id = self.root.after(self.frame_delay, self._tick)
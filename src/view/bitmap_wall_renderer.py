@@ -0,0 +1,124 @@
+import time
+import tkinter as tk
+from typing import List, Tuple
+# from snakesim.src.view.tcl_batch import TclBatch
+from .tcl_batch import TclBatch
+
+class BitmapWallRenderer:
+	"""
+	Draws the wall layer of a map into a single canvas image, as an alternative to one rectangle per wall run.
+
+	The map is kept in a photo image with one pixel per cell, written row by row with put(), and shown zoomed to the
+	cell size. Open cells are painted in the canvas background colour, so the image is kept below every other item.
+	Redrawing and recolouring cost is bounded by the pixel count of the map rather than by the number of walls. Only
+	the cells inside the window given to redraw() are drawn.
+	"""
+	def __init__(self, canvas: tk.Canvas, background, tag="wall"):
+		self.canvas = canvas
+		self.tag = tag
+		self.rows = self.cols = 0
+		self.top = self.left = 0
+		self.col_width = self.row_height = 0
+		self.fill = None
+		self.background = background
+		self.redraw_time = 0.0
+		self._walls = []
+		self._cells = tk.PhotoImage(master=canvas)
+		self._image = tk.PhotoImage(master=canvas)
+		self.item = canvas.create_image(0, 0, image=self._image, anchor=tk.NW, tags=tag)
+		canvas.tag_lower(self.item)
+
+	@property
+	def item_count(self):
+		return 1
+
+	@property
+	def cell_count(self):
+		return sum(map(sum, self._walls))
+
+	def _put_rows(self):
+		colors = (self.background, self.fill)
+		batch = TclBatch(self.canvas)
+		for i, row in enumerate(self._walls):
+			batch.call(self._cells, 'put', [[colors[v] for v in row]], '-to', 0, i)
+		batch.run()
+
+	def _scale(self):
+		self._image.blank()
+		self._image.configure(width=self.cols * self.col_width, height=self.rows * self.row_height)
+		self._image.tk.call(self._image, 'copy', self._cells, '-zoom', self.col_width, self.row_height)
+
+	def _paint(self):
+		self._cells.blank()
+		self._cells.configure(width=self.cols, height=self.rows)
+		self._put_rows()
+		self._scale()
+
+	def clear(self):
+		"""
+		Removes every wall from the canvas
+		"""
+		self.rows = self.cols = 0
+		self._walls = []
+		self._cells.blank()
+		self._image.blank()
+
+	def redraw(self, matrix: List[List[int]], col_width, row_height, fill, window=None) -> int:
+		"""
+		Draws the walls of the given map again, replacing the previous image
+
+		:param matrix: 2D matrix where wall cells are 1
+		:param col_width: Width of a cell on canvas
+		:param row_height: Height of a cell on canvas
+		:param fill: Wall colour
+		:param window: (top, left, bottom, right) bounds of the cells to draw, drawn from the canvas origin;
+		               defaults to the whole map
+		:return: Number of canvas items used
+		"""
+		start = time.perf_counter()
+		top, left, bottom, right = window or (0, 0, len(matrix), len(matrix[0]))
+		self.top, self.left = top, left
+		self.rows, self.cols = bottom - top, right - left
+		self.col_width, self.row_height, self.fill = col_width, row_height, fill
+		self._walls = [[1 if val == 1 else 0 for val in row[left:right]] for row in matrix[top:bottom]]
+		self._paint()
+		self.redraw_time = time.perf_counter() - start
+		return 1
+
+	def recolor(self, fill, background=None):
+		"""
+		Repaints the walls, and optionally the open cells, in new colours
+
+		:param fill: Wall colour
+		:param background: Colour of open cells
+		"""
+		self.fill = fill
+		self.background = background or self.background
+		if self.rows:
+			self._paint()
+
+	def _patch(self, cells, value):
+		color = self.fill if value else self.background
+		for row, col in cells:
+			row, col = row - self.top, col - self.left
+			if 0 <= row < self.rows and 0 <= col < self.cols and self._walls[row][col] != value:
+				self._walls[row][col] = value
+				self._cells.put(color, to=(col, row, col + 1, row + 1))
+				self._image.put(color, to=(col * self.col_width, row * self.row_height,
+				                           (col + 1) * self.col_width, (row + 1) * self.row_height))
+
+	def add(self, cells: List[Tuple[int, int]]):
+		"""
+		Paints new wall cells
+
+		:param cells: List of (row, column) coordinates of the new walls
+		"""
+		self._patch(cells, 1)
+
+	def remove(self, cells: List[Tuple[int, int]]):
+		"""
+		Erases wall cells
+
+		:param cells: List of (row, column) coordinates of the removed walls
+		"""
+		self._patch(cells, 0)
@@ -0,0 +1,190 @@
+import collections
+import json
+import os
+import sys
+import threading
+import time
+import tkinter as tk
+import traceback
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Dict, List, Optional
+
+def _describe(func) -> str:
+	"""
+	Returns a readable name for a callback, with the place it was defined at for lambdas and nested functions
+	"""
+	name = getattr(func, '__qualname__', None) or type(func).__name__
+	code = getattr(func, '__code__', None)
+	if code is not None and ('<' in name or '.<locals>.' in name):
+		name = f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+	return name
+
+class CallbackTracer:
+	"""
+	Times every Tk callback (after, after_idle and event bindings) on the main thread, to find out what blocks the
+	event loop.
+
+	Once installed, callbacks scheduled or bound from then on are wrapped to record their name, start and duration in
+	a ring buffer. Spans can also be recorded around parts of a callback, such as the subscribers of the animation
+	scheduler, or around calls on other threads. A watchdog thread checks the running spans every so often, and
+	while one has run for longer than the stall threshold, samples the stack of the main thread into the innermost
+	such span. Spans that ran for longer than the threshold are kept as stalls with their stack samples, unless a
+	span inside them already was, so that a slow frame is blamed on the subscriber that made it slow rather than on
+	the tick running it. The trace can be exported as Chrome trace-event JSON, for opening in chrome://tracing or
+	Perfetto.
+	"""
+	PATCHED = (
+		(tk.Misc, 'after', 2), (tk.Misc, 'after_idle', 1), (tk.Misc, 'bind', 2), (tk.Misc, 'bind_all', 2),
+		(tk.Canvas, 'tag_bind', 3),
+	)   # class, method, position of the callback among the arguments (after self)
+
+	def __init__(self, threshold=0.05, capacity=100000, max_samples=5, depth=30):
+		self.threshold = threshold
+		self.max_samples = max_samples
+		self.depth = depth
+		self.events = collections.deque(maxlen=capacity)    # (name, kind, thread id, start, duration, stack samples)
+		self.stalls = collections.deque(maxlen=1000)        # (name, duration, stack samples) of the slow callbacks
+		self.origin = time.perf_counter()
+		self._main = threading.main_thread().ident
+		self._active = []       # [name, start, samples, stalled inside] of the spans running on the main thread, outermost first
+		self._originals = {}
+		self._watchdog: Optional[threading.Thread] = None
+		self._stop = threading.Event()
+
+	@property
+	def installed(self) -> bool:
+		return bool(self._originals)
+
+	def install(self):
+		"""
+		Wraps the callbacks scheduled and bound from now on, and starts the watchdog
+		"""
+		if self.installed:
+			return
+		for cls, method, position in CallbackTracer.PATCHED:
+			original = self._originals[(cls, method)] = getattr(cls, method)
+			setattr(cls, method, self._patch(original, method, position))
+		self._stop.clear()
+		self._watchdog = threading.Thread(target=self._watch, name="stall-watchdog", daemon=True)
+		self._watchdog.start()
+
+	def uninstall(self):
+		"""
+		Restores the Tk methods and stops the watchdog; callbacks wrapped before keep being traced
+		"""
+		for (cls, method), original in self._originals.items():
+			setattr(cls, method, original)
+		self._originals.clear()
+		self._stop.set()
+
+	def _patch(self, original, kind, position):
+		tracer = self
+
+		@wraps(original)
+		def patched(widget, *args, **kwargs):
+			if len(args) > position - 1 and callable(args[position - 1]):
+				args = args[:position - 1] + (tracer.wrap(args[position - 1], kind),) + args[position:]
+			elif callable(kwargs.get('func')):
+				kwargs['func'] = tracer.wrap(kwargs['func'], kind)
+			return original(widget, *args, **kwargs)
+		return patched
+
+	def wrap(self, func: Callable, kind='call') -> Callable:
+		"""
+		Returns a function that runs the given one in a span named after it
+
+		:param func: Function to trace
+		:param kind: Category of the span, e.g. the Tk method it was scheduled or bound with
+		"""
+		name = _describe(func)
+
+		@wraps(func)
+		def traced(*args, **kwargs):
+			with self.span(name, kind):
+				return func(*args, **kwargs)
+		return traced
+
+	@contextmanager
+	def span(self, name, kind='span'):
+		"""
+		Records the time taken by the body of the with statement
+
+		:param name: Name of the span, or a function to name it after
+		:param kind: Category of the span
+		"""
+		if not isinstance(name, str):
+			name = _describe(name)
+		main = threading.get_ident() == self._main
+		start = time.perf_counter()
+		entry = [name, start, [], False]
+		if main:
+			self._active.append(entry)
+		try:
+			yield
+		finally:
+			duration = time.perf_counter() - start
+			if main:
+				self._active.pop()
+			self.events.append((name, kind, threading.get_ident(), start, duration, entry[2]))
+			# a stall is blamed on the innermost span that took too long, not on the spans it ran in
+			if main and duration >= self.threshold and not entry[3]:
+				self.stalls.append((name, duration, entry[2]))
+				for outer in self._active:
+					outer[3] = True
+
+	def _watch(self):
+		interval = self.threshold / 2
+		while not self._stop.wait(interval):
+			now = time.perf_counter()
+			# the innermost span running for longer than the threshold; the spans it runs in have too
+			entry = next((entry for entry in reversed(self._active[:]) if now - entry[1] >= self.threshold), None)
+			if entry is not None and len(entry[2]) < self.max_samples:
+				frame = sys._current_frames().get(self._main)
+				if frame is not None:
+					stack = traceback.extract_stack(frame, self.depth)
+					entry[2].append((time.perf_counter(), [f"{os.path.basename(f.filename)}:{f.lineno} {f.name}" for f in stack]))
+
+	def clear(self):
+		self.events.clear()
+		self.stalls.clear()
+
+	def summary(self, top=10) -> List[str]:
+		"""
+		Ranks the traced callbacks by the total time they took
+
+		:param top: Number of callbacks to list
+		:return: Lines of the ranking, starting with its header
+		"""
+		totals: Dict[str, List] = {}
+		for name, _, _, _, duration, _ in self.events:
+			total = totals.setdefault(name, [0, 0.0, 0.0])
+			total[0] += 1
+			total[1] += duration
+			total[2] = max(total[2], duration)
+		lines = [f"{'calls':>7}{'total ms':>11}{'max ms':>9}  callback"]
+		for name, (calls, total, longest) in sorted(totals.items(), key=lambda item: -item[1][1])[:top]:
+			lines.append(f"{calls:>7}{total * 1000:>11.1f}{longest * 1000:>9.1f}  {name}")
+		return lines
+
+	def export(self, path) -> int:
+		"""
+		Writes the trace as Chrome trace-event JSON; each span is a complete event, and each stack sample of a stall an
+		instant event
+
+		:param path: Path of the JSON file
+		:return: Number of events written
+		"""
+		pid = os.getpid()
+		names = {thread.ident: thread.name for thread in threading.enumerate()}
+		trace = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': names.get(tid, str(tid))}}
+		         for tid in {event[2] for event in self.events}]
+		for name, kind, tid, start, duration, samples in self.events:
+			trace.append({'name': name, 'cat': kind, 'ph': 'X', 'pid': pid, 'tid': tid, 'ts': round((start - self.origin) * 1e6, 3),
+			              'dur': round(duration * 1e6, 3)})
+			for sampled, stack in samples:
+				trace.append({'name': 'stall', 'cat': 'watchdog', 'ph': 'i', 's': 't', 'pid': pid, 'tid': tid,
+				              'ts': round((sampled - self.origin) * 1e6, 3), 'args': {'callback': name, 'stack': stack}})
+		with open(path, 'w') as file:
+			json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms'}, file)
+		return len(trace)
@@ -0,0 +1,140 @@
+import tkinter as tk
+from typing import List, Tuple
+# from snakesim.src.view.tcl_batch import TclBatch
+from .tcl_batch import TclBatch
+
+class RectPool:
+	"""
+	Recycles canvas rectangles instead of creating and deleting them, with one pool of items per tag.
+
+	Released items are hidden and kept on a free list; acquiring an item reuses a hidden one (moved with coords and
+	restyled with itemconfigure) and only creates a new item when the free list is empty. The high-water mark of each
+	tag is the most items it has had in use at once, i.e. the size its pool needs to be prewarmed to.
+	"""
+	def __init__(self, canvas: tk.Canvas):
+		self.canvas = canvas
+		self._free = {}
+		self._live = {}
+		self.allocated = {}
+		self.high_water = {}
+
+	def _pools(self, tag):
+		if tag not in self._free:
+			self._free[tag], self._live[tag] = [], set()
+			self.allocated[tag] = self.high_water[tag] = 0
+		return self._free[tag], self._live[tag]
+
+	def prewarm(self, tag, count, **options):
+		"""
+		Creates hidden items for the given tag until at least `count` items are allocated
+
+		:param tag: Canvas tag of the pool
+		:param count: Number of items to have allocated
+		:param options: Initial rectangle options
+		"""
+		free, _ = self._pools(tag)
+		while self.allocated[tag] < count:
+			free.append(self.canvas.create_rectangle(0, 0, 0, 0, tags=tag, state=tk.HIDDEN, **options))
+			self.allocated[tag] += 1
+
+	def acquire(self, tag, x0, y0, x1, y1, **options) -> int:
+		"""
+		Shows a rectangle with the given coordinates and options, reusing a released item of the same tag if possible
+
+		:param tag: Canvas tag of the pool
+		:param options: Rectangle options; pass every option the tag uses, since reused items keep their old ones
+		:return: Canvas item id
+		"""
+		free, live = self._pools(tag)
+		if free:
+			item = free.pop()
+			self.canvas.coords(item, x0, y0, x1, y1)
+			self.canvas.itemconfigure(item, state=tk.NORMAL, **options)
+		else:
+			item = self.canvas.create_rectangle(x0, y0, x1, y1, tags=tag, **options)
+			self.allocated[tag] += 1
+		live.add(item)
+		self.high_water[tag] = max(self.high_water[tag], len(live))
+		return item
+
+	def acquire_many(self, tag, boxes: List[Tuple[int, int, int, int]], **options) -> List[int]:
+		"""
+		Shows a rectangle for each of the given coordinates, like acquire(), but submits every canvas operation
+		in a single Tcl batch
+
+		:param tag: Canvas tag of the pool
+		:param boxes: List of (x0, y0, x1, y1) rectangle coordinates
+		:param options: Rectangle options, shared by every rectangle
+		:return: Canvas item ids, in the order of the given coordinates
+		"""
+		free, live = self._pools(tag)
+		batch = TclBatch(self.canvas)
+		items = []
+		for box in boxes:
+			if free:
+				item = free.pop()
+				batch.coords(item, *box)
+				batch.itemconfigure(item, state=tk.NORMAL, **options)
+				items.append(item)
+			else:
+				items.append(-1 - batch.create('rectangle', *box, tags=tag, **options))
+		created = batch.run()
+		items = [created[-1 - item] if item < 0 else item for item in items]
+		self.allocated[tag] += len(created)
+		live.update(items)
+		self.high_water[tag] = max(self.high_water[tag], len(live))
+		return items
+
+	def release(self, tag, item):
+		"""
+		Hides an item and returns it to the free list of its tag; releasing an item that is not in use does nothing
+
+		:param tag: Canvas tag of the pool
+		:param item: Canvas item id
+		"""
+		free, live = self._pools(tag)
+		if item in live:
+			live.remove(item)
+			self.canvas.itemconfigure(item, state=tk.HIDDEN)
+			free.append(item)
+
+	def release_many(self, tag, items: List[int]):
+		"""
+		Releases each of the given items, like release(), but submits every canvas operation in a single Tcl batch
+
+		:param tag: Canvas tag of the pool
+		:param items: Canvas item ids
+		"""
+		free, live = self._pools(tag)
+		released = [item for item in set(items) if item in live]
+		if released:
+			live.difference_update(released)
+			batch = TclBatch(self.canvas)
+			for item in released:
+				batch.itemconfigure(item, state=tk.HIDDEN)
+			batch.run()
+			free.extend(released)
+
+	def release_all(self, tag):
+		"""
+		Hides every item of the given tag, returning them to its free list
+
+		:param tag: Canvas tag of the pool
+		"""
+		free, live = self._pools(tag)
+		if live:
+			self.canvas.itemconfigure(tag, state=tk.HIDDEN)
+			free.extend(live)
+			live.clear()
+
+	def items(self, tag) -> List[int]:
+		"""
+		Returns the items of the given tag currently in use
+		"""
+		return list(self._pools(tag)[1])
+
+	def count(self, tag) -> int:
+		"""
+		Returns the number of items of the given tag currently in use
+		"""
+		return len(self._pools(tag)[1])
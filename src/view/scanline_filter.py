@@ -0,0 +1,113 @@
+import os
+import tkinter as tk
+from collections import OrderedDict
+from typing import List
+
+class ScanlineFilter:
+	"""
+	CRT effect drawn as black scanlines over the whole canvas, generated for the canvas size instead of loaded from
+	image files.
+
+	Each frame is a transparent image the size of the canvas, tiled from a one pixel wide strip; the frames of the
+	last few canvas sizes are kept, so resizing back and forth does not generate them again. The animated variant
+	shifts the lines down by a row on every frame by swapping the image of a single canvas item, and the static variant
+	never changes it. The item is only raised when another item has been stacked above it.
+	"""
+	def __init__(self, canvas: tk.Canvas, tag="filter", spacing=3, animated=True, cache_size=4):
+		self.canvas = canvas
+		self.tag = tag
+		self.spacing = spacing
+		self.animated = animated
+		self.cache_size = cache_size
+		self.item = None
+		self.phase = 0
+		self.size = (0, 0)
+		self.raises = 0
+		self._cache = OrderedDict()     # (width, height) -> phase -> image
+
+	def _frame(self, width, height, phase) -> tk.PhotoImage:
+		frames = self._cache.pop((width, height), {})
+		self._cache[(width, height)] = frames
+		while len(self._cache) > self.cache_size:
+			self._cache.popitem(last=False)
+		if phase not in frames:
+			strip = tk.PhotoImage(master=self.canvas, width=1, height=self.spacing)
+			strip.put('black', to=(0, phase, 1, phase + 1))
+			image = tk.PhotoImage(master=self.canvas, width=width, height=height)
+			# copying to a region larger than the source tiles the source over it
+			image.tk.call(image, 'copy', strip, '-to', 0, 0, width, height)
+			frames[phase] = image
+		return frames[phase]
+
+	def _raise(self):
+		if self.canvas.find_above(self.item):
+			self.canvas.tag_raise(self.item)
+			self.raises += 1
+
+	def show(self, width, height):
+		"""
+		Shows the filter over the whole canvas, generating its frames if the canvas size has changed
+
+		:param width: Canvas width in pixels
+		:param height: Canvas height in pixels
+		"""
+		width, height = max(width, 1), max(height, 1)
+		if self.item is None:
+			self.item = self.canvas.create_image(0, 0, image=self._frame(width, height, self.phase), anchor=tk.NW, tags=self.tag)
+		elif (width, height) != self.size:
+			self.canvas.itemconfigure(self.item, image=self._frame(width, height, self.phase))
+		self.size = (width, height)
+		if self.canvas.itemcget(self.item, 'state') == tk.HIDDEN:
+			self.canvas.itemconfigure(self.item, state=tk.NORMAL)
+		self._raise()
+
+	def advance(self):
+		"""
+		Moves the lines of the animated variant by one row, and raises the filter if needed
+		"""
+		if self.item is None:
+			return
+		if self.animated:
+			self.phase = (self.phase + 1) % self.spacing
+			self.canvas.itemconfigure(self.item, image=self._frame(*self.size, self.phase))
+		self._raise()
+
+class ImageFrameFilter:
+	"""
+	CRT effect played back from full size image frames (the scanline images in the filter directory), showing the
+	next one and raising it above every other item on each frame. Frames are not scaled to the canvas size.
+	"""
+	def __init__(self, canvas: tk.Canvas, directory, tag="filter"):
+		self.canvas = canvas
+		self.tag = tag
+		self.frames: List[tk.PhotoImage] = []
+		self.items: List[int] = []
+		self.current = 0
+		self.raises = 0
+		for filename in sorted(os.listdir(directory)):
+			if filename.endswith('.png'):
+				self.frames.append(tk.PhotoImage(master=canvas, file=os.path.join(directory, filename)))
+		for frame in self.frames:
+			self.items.append(canvas.create_image(0, 0, image=frame, anchor=tk.NW, tags=tag))
+
+	def show(self, width=None, height=None):
+		"""
+		Shows the current frame
+
+		:param width: Unused, frames keep the size of their images
+		:param height: Unused
+		"""
+		if self.items:
+			self.canvas.itemconfigure(self.items[self.current], state=tk.NORMAL)
+			self.canvas.tag_raise(self.items[self.current])
+			self.raises += 1
+
+	def advance(self):
+		"""
+		Hides the current frame and shows the next one above every other item
+		"""
+		if not self.items:
+			return
+		self.canvas.itemconfigure(self.items[self.current], state=tk.HIDDEN)
+		self.current = (self.current + 1) % len(self.items)
+		self.show()
@@ -0,0 +1,88 @@
+import time
+from typing import Callable, Optional
+# from snakesim.src.view.animation_scheduler import AnimationScheduler
+from .animation_scheduler import AnimationScheduler
+
+class SimLoop:
+	"""
+	Runs the simulation on the frames of an animation scheduler with a fixed timestep, independent of the frame rate.
+
+	Every frame adds the time elapsed since the previous one to an accumulator and runs one simulation step per
+	timestep it holds, then renders once if anything has changed; several steps taken in one frame are thus drawn with
+	a single redraw, and a slow step or redraw delays the steps after it instead of slowing the simulation down. In
+	unthrottled mode the timestep is ignored, and every frame runs as many steps as fit in its time budget before
+	rendering a snapshot of the result.
+	"""
+	MAX_LAG = 0.25      # seconds of simulation time a frame may catch up on, beyond which time is dropped
+
+	def __init__(self, scheduler: AnimationScheduler, step: Callable, render: Callable, budget=0.012, priority=10, wait=()):
+		self.scheduler = scheduler
+		self.step = step
+		self.render = render
+		self.wait = tuple(wait)     # exceptions meaning a step has to be retried on a later frame
+		self.budget = budget
+		self.priority = priority
+		self.timestep = 0.1
+		self.unthrottled = False
+		self.handle: Optional[int] = None
+		self.steps = 0
+		self.frames = 0
+		self._on_stop = None
+		self._lag = 0.0
+		self._last = 0.0
+
+	@property
+	def running(self):
+		return self.handle is not None
+
+	def start(self, timestep, unthrottled=False, on_stop: Optional[Callable] = None) -> str:
+		"""
+		Starts running the simulation, stopping the current run
+
+		:param timestep: Simulation time of a step, in seconds
+		:param unthrottled: Run as many steps as possible every frame, ignoring the timestep
+		:param on_stop: Function called with the exception raised by a step, which stops the run
+		:return: Handle of the subscription to the scheduler
+		"""
+		self.stop()
+		self.timestep, self.unthrottled, self._on_stop = timestep, unthrottled, on_stop
+		self.steps = self.frames = 0
+		# the first step is taken immediately, like the first call of a plain root.after() loop
+		self._lag, self._last = timestep, time.perf_counter()
+		self.handle = self.scheduler.subscribe(self._frame, self.priority)
+		return self.handle
+
+	def _frame(self, start):
+		self._lag = min(self._lag + start - self._last, max(SimLoop.MAX_LAG, self.timestep))
+		self._last = start
+		steps = 0
+		try:
+			while time.perf_counter() - start < self.budget:
+				if not self.unthrottled:
+					if self._lag < self.timestep:
+						break
+					self._lag -= self.timestep
+				self.step()
+				steps += 1
+		except self.wait:
+			if not self.unthrottled:
+				self._lag += self.timestep
+		except Exception as error:
+			self.steps += steps
+			self.stop()
+			self.render()
+			if self._on_stop:
+				self._on_stop(error)
+			return
+		self.steps += steps
+		if steps:
+			self.frames += 1
+			self.render()
+
+	def stop(self):
+		"""
+		Stops the run; steps already taken have been rendered
+		"""
+		if self.handle is not None:
+			self.scheduler.unsubscribe(self.handle)
+		self.handle = None
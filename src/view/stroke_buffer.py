@@ -0,0 +1,66 @@
+from typing import Callable, Dict, List, Optional, Tuple
+# from snakesim.src.util.common import Common
+# from snakesim.src.view.animation_scheduler import AnimationScheduler
+from ..util.common import Common
+from .animation_scheduler import AnimationScheduler
+
+class StrokeBuffer:
+	"""
+	Collects the cells painted by mouse strokes between frames, and applies them once per frame.
+
+	Motion events only sample the pointer, so fast strokes skip cells: the cells between consecutive samples of a
+	stroke are filled in with Bresenham lines. The cells of each mode (e.g. walls, erasing, the snake) are kept in
+	the order they were painted without repeats, and handed over to apply(mode, cells) in one batch per mode on the
+	next frame of the animation scheduler, so that the grid, the walls drawn and the map analysis are updated once per
+	frame instead of once per event.
+	"""
+	def __init__(self, scheduler: AnimationScheduler, apply: Callable[[str, List[Tuple[int, int]]], None], priority=1):
+		self.scheduler = scheduler
+		self.apply = apply
+		self.priority = priority
+		self.samples = 0
+		self.flushes = 0
+		self._pending: Dict[str, Dict[Tuple[int, int], None]] = {}     # mode -> cells, as an ordered set
+		self._last: Optional[Tuple[str, int, int]] = None      # mode and cell of the latest sample of the stroke
+		self._handle = None
+
+	def add(self, mode: str, row, col, four_connected=False):
+		"""
+		Adds a sample of the current stroke, along with the cells between it and the previous sample
+
+		:param mode: What the stroke paints; a stroke changing mode starts a new line
+		:param row: Row of the sampled cell
+		:param col: Column of the sampled cell
+		:param four_connected: Fill in lines whose consecutive cells share a side, for painting paths
+		"""
+		self.samples += 1
+		if self._last is not None and self._last[0] == mode:
+			line = Common.bresenham(self._last[1], self._last[2], row, col, four_connected)[1:]
+		else:
+			line = [(row, col)]
+		self._pending.setdefault(mode, {}).update(dict.fromkeys(line))
+		self._last = (mode, row, col)
+		if self._handle is None:
+			self._handle = self.scheduler.subscribe(self._tick, self.priority)
+
+	def end(self):
+		"""
+		Ends the current stroke, so that the next sample does not continue its line
+		"""
+		self._last = None
+
+	def flush(self):
+		"""
+		Applies the pending cells right away
+		"""
+		if self._handle is not None:
+			self.scheduler.unsubscribe(self._handle)
+			self._tick()
+
+	def _tick(self, now=None):
+		pending, self._pending = self._pending, {}
+		self._handle = None
+		self.flushes += 1
+		for mode, cells in pending.items():
+			self.apply(mode, list(cells))
+		return False
@@ -0,0 +1,86 @@
+import re
+import tkinter as tk
+from typing import List
+
+class TclBatch:
+	"""
+	Collects Tcl commands (canvas and image operations) into a single script, evaluated with one call into Tcl
+	instead of one round trip per command. Items created by the batch are returned in order once it is run.
+	"""
+	_SPECIAL = re.compile(r'[\s{}\[\]$;"\\]')
+
+	def __init__(self, widget: tk.Misc):
+		self.widget = widget
+		self._commands = []
+		self._created = 0
+
+	def __len__(self):
+		return len(self._commands)
+
+	@staticmethod
+	def quote(word) -> str:
+		"""
+		Returns a Tcl word for the given value; lists and tuples become Tcl lists
+		"""
+		if isinstance(word, (list, tuple)):
+			word = ' '.join(TclBatch.quote(w) for w in word)
+		word = str(word)
+		if not word:
+			return '{}'
+		if not TclBatch._SPECIAL.search(word):
+			return word
+		if '\\' not in word and TclBatch._balanced(word):
+			return '{' + word + '}'
+		return re.sub(r'([\s{}\[\]$;"\\])', lambda m: '\\n' if m.group(1) == '\n' else '\\' + m.group(1), word)
+
+	@staticmethod
+	def _balanced(word):
+		depth = 0
+		for char in word:
+			depth += (char == '{') - (char == '}')
+			if depth < 0:
+				return False
+		return depth == 0
+
+	@staticmethod
+	def _options(options):
+		return [word for key, value in options.items() for word in (f"-{key}", value)]
+
+	def call(self, *words):
+		"""
+		Adds a command to the batch
+		"""
+		self._commands.append(' '.join(TclBatch.quote(word) for word in words))
+
+	def create(self, kind, *coords, **options) -> int:
+		"""
+		Adds a command creating a canvas item
+
+		:param kind: Item type, e.g. 'rectangle'
+		:return: Position of the new item in the list returned by run()
+		"""
+		self._commands.append('lappend ids [' + ' '.join(TclBatch.quote(word) for word in (self.widget, 'create', kind, *coords, *TclBatch._options(options))) + ']')
+		self._created += 1
+		return self._created - 1
+
+	def coords(self, item, *coords):
+		self.call(self.widget, 'coords', item, *coords)
+
+	def itemconfigure(self, item, **options):
+		self.call(self.widget, 'itemconfigure', item, *TclBatch._options(options))
+
+	def delete(self, *items):
+		if items:
+			self.call(self.widget, 'delete', *items)
+
+	def run(self) -> List[int]:
+		"""
+		Evaluates every command in the batch with a single call into Tcl, and clears it
+
+		:return: IDs of the items created by the batch, in order
+		"""
+		if not self._commands:
+			return []
+		script = 'apply {{} {\nset ids {}\n' + '\n'.join(self._commands) + '\nreturn $ids\n}}'
+		self._commands, self._created = [], 0
+		return [int(item) for item in self.widget.tk.splitlist(self.widget.tk.eval(script))]
@@ -0,0 +1,102 @@
+import itertools
+import time
+from typing import Callable, Iterable, Optional
+# from snakesim.src.view.animation_scheduler import AnimationScheduler
+from .animation_scheduler import AnimationScheduler
+
+class TracePlayer:
+	"""
+	Plays back a trace (a sequence of points to draw) on the frames of an animation scheduler, one batch per frame.
+
+	Every frame draws as many points as the playback speed asks for, but stops early once the frame's time budget is
+	used up, so the frame rate stays steady no matter how long the trace is. Points are handed to the draw function in
+	chunks, so that it can submit them to the canvas together. Playback can be stopped or skipped to the end at any
+	point.
+	"""
+	BASE_RATE = 1000        # points drawn per second at speed 1
+	CHUNK = 64              # most points drawn between checks of the frame's time budget
+	MIN_SPEED = 1 / 64
+	MAX_SPEED = 1024
+
+	def __init__(self, scheduler: AnimationScheduler, speed=1.0, budget=0.010, priority=5):
+		self.scheduler = scheduler
+		self.speed = speed
+		self.budget = budget
+		self.priority = priority
+		self.handle: Optional[int] = None
+		self._points = None
+		self._draw = None
+		self._on_done = None
+		self._quota = 0.0
+		self._last = None
+
+	@property
+	def playing(self):
+		return self.handle is not None
+
+	def set_speed(self, speed) -> float:
+		"""
+		Changes the playback speed, clamped to the supported range
+
+		:param speed: Multiple of the base rate of points drawn per second
+		:return: The new speed
+		"""
+		self.speed = min(max(speed, TracePlayer.MIN_SPEED), TracePlayer.MAX_SPEED)
+		return self.speed
+
+	def play(self, points: Iterable, draw: Callable, on_done: Optional[Callable] = None) -> str:
+		"""
+		Starts playing a trace, stopping the one currently playing
+
+		:param points: Points to draw, in order
+		:param draw: Function drawing a list of points
+		:param on_done: Function called once the whole trace has been drawn
+		:return: Handle of the subscription to the scheduler, always truthy
+		"""
+		self.stop()
+		self._points, self._draw, self._on_done = iter(points), draw, on_done
+		self._quota, self._last = 0.0, None
+		self.handle = self.scheduler.subscribe(self._frame, self.priority)
+		return self.handle
+
+	def _frame(self, start):
+		if self._last is None:
+			self._last = start - self.scheduler.frame_delay / 1000
+		per_frame = self.speed * TracePlayer.BASE_RATE * (start - self._last)
+		self._last = start
+		# points left over from a frame that ran out of budget carry over, but never more than one frame's worth
+		self._quota = min(self._quota, max(per_frame, 1)) + per_frame
+		while self._quota >= 1 and time.perf_counter() - start < self.budget:
+			size = min(int(self._quota), TracePlayer.CHUNK)
+			chunk = list(itertools.islice(self._points, size))
+			if chunk:
+				self._draw(chunk)
+			self._quota -= len(chunk)
+			if len(chunk) < size:
+				self._finish()
+				return
+
+	def _finish(self):
+		on_done = self._on_done
+		self.stop()
+		if on_done:
+			on_done()
+
+	def skip_to_end(self):
+		"""
+		Draws the rest of the trace immediately
+		"""
+		if self.handle is None:
+			return
+		rest = list(self._points)
+		if rest:
+			self._draw(rest)
+		self._finish()
+
+	def stop(self):
+		"""
+		Stops playback without drawing the rest of the trace
+		"""
+		if self.handle is not None:
+			self.scheduler.unsubscribe(self.handle)
+		self.handle = self._points = self._draw = self._on_done = None
@@ -0,0 +1,118 @@
+import math
+from typing import Tuple
+
+class Viewport:
+	"""
+	Camera over the map, mapping cells to canvas coordinates. At zoom 1 the whole map fits the canvas; zooming in
+	enlarges cells and the camera can then be panned, or made to follow a cell, while only the cells inside the
+	visible window need to be drawn.
+	"""
+	MAX_ZOOM = 32
+	LOD_SIZE = 4    # cells smaller than this many pixels are drawn at a coarser level of detail
+
+	def __init__(self, rows, cols, width, height):
+		self.zoom = 1.0
+		self.top = self.left = 0
+		self.rows, self.cols = rows, cols
+		self.width, self.height = max(width, 1), max(height, 1)
+
+	@property
+	def col_width(self) -> int:
+		return max(1, math.ceil(self.width / self.cols * self.zoom))
+
+	@property
+	def row_height(self) -> int:
+		return max(1, math.ceil(self.height / self.rows * self.zoom))
+
+	@property
+	def window(self) -> Tuple[int, int, int, int]:
+		"""
+		Visible cells, as the (top, left, bottom, right) bounds of a half-open window
+		"""
+		return (self.top, self.left, self.top + min(self.rows, math.ceil(self.height / self.row_height)),
+		        self.left + min(self.cols, math.ceil(self.width / self.col_width)))
+
+	@property
+	def lod(self) -> bool:
+		"""
+		True if cells are small enough to be drawn at a coarser level of detail
+		"""
+		return self.col_width < Viewport.LOD_SIZE or self.row_height < Viewport.LOD_SIZE
+
+	def _clamp(self):
+		top, left, bottom, right = self.window
+		self.top = min(max(self.top, 0), self.rows - (bottom - top))
+		self.left = min(max(self.left, 0), self.cols - (right - left))
+
+	def resize(self, rows, cols, width, height):
+		"""
+		Updates the map dimensions and the canvas size in pixels
+		"""
+		self.rows, self.cols = rows, cols
+		self.width, self.height = max(width, 1), max(height, 1)
+		self._clamp()
+
+	def reset(self):
+		"""
+		Zooms out to show the whole map
+		"""
+		self.zoom = 1.0
+		self.top = self.left = 0
+
+	def contains(self, row, col) -> bool:
+		top, left, bottom, right = self.window
+		return top <= row < bottom and left <= col < right
+
+	def box(self, row, col) -> Tuple[int, int, int, int]:
+		"""
+		Returns the canvas coordinates of a cell
+		"""
+		x, y = (col - self.left) * self.col_width, (row - self.top) * self.row_height
+		return x, y, x + self.col_width, y + self.row_height
+
+	def to_cell(self, x, y) -> Tuple[int, int]:
+		"""
+		Returns the cell under the given canvas coordinates
+		"""
+		return self.top + int(y // self.row_height), self.left + int(x // self.col_width)
+
+	def zoom_at(self, factor, x, y) -> bool:
+		"""
+		Scales the zoom level, keeping the cell under the given canvas coordinates in place
+
+		:return: True if the view has changed
+		"""
+		zoom = min(max(self.zoom * factor, 1.0), Viewport.MAX_ZOOM)
+		if zoom == self.zoom:
+			return False
+		row, col = self.to_cell(x, y)
+		self.zoom = zoom
+		self.top, self.left = row - int(y // self.row_height), col - int(x // self.col_width)
+		self._clamp()
+		return True
+
+	def pan(self, rows, cols) -> bool:
+		"""
+		Moves the view by the given number of cells
+
+		:return: True if the view has changed
+		"""
+		view = self.top, self.left
+		self.top, self.left = self.top + rows, self.left + cols
+		self._clamp()
+		return (self.top, self.left) != view
+
+	def follow(self, row, col, margin=0.25) -> bool:
+		"""
+		Centres the view on a cell if it is closer to the edge of the view than the given fraction of its size
+
+		:return: True if the view has changed
+		"""
+		top, left, bottom, right = self.window
+		pad_rows, pad_cols = int((bottom - top) * margin), int((right - left) * margin)
+		if top + pad_rows <= row < bottom - pad_rows and left + pad_cols <= col < right - pad_cols:
+			return False
+		view = self.top, self.left
+		self.top, self.left = row - (bottom - top) // 2, col - (right - left) // 2
+		self._clamp()
+		return (self.top, self.left) != view
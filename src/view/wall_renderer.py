@@ -0,0 +1,184 @@
+import time
+from typing import List, Tuple
+# from snakesim.src.view.rect_pool import RectPool
+from .rect_pool import RectPool
+
+class WallRenderer:
+	"""
+	Draws the wall cells of a map with as few canvas rectangles as possible, by merging them into straight runs.
+
+	Horizontal runs of two or more walls are drawn first, and the remaining walls are merged into vertical runs. Every
+	wall cell is indexed to the item of the run covering it, so single cell edits only split or merge the runs next
+	to the edited cell instead of redrawing the whole layer. Only the walls inside the window given to redraw() are
+	drawn; runs and the index use coordinates relative to that window.
+	"""
+	def __init__(self, rects: RectPool, tag="wall"):
+		self.rects = rects
+		self.tag = tag
+		self.rows = self.cols = 0
+		self.top = self.left = 0
+		self.col_width = self.row_height = 0
+		self.fill = None
+		self.redraw_time = 0.0
+		self._runs = {}         # item -> (row, column, length, horizontal)
+		self._cell_item = []    # row -> column -> item of the run covering the cell, or 0
+
+	@property
+	def item_count(self):
+		return len(self._runs)
+
+	@property
+	def cell_count(self):
+		return sum(run[2] for run in self._runs.values())
+
+	def _box(self, row, col, length, horizontal):
+		x1, y1 = (col + length, row + 1) if horizontal else (col + 1, row + length)
+		return col * self.col_width, row * self.row_height, x1 * self.col_width, y1 * self.row_height
+
+	def _index(self, item, row, col, length, horizontal):
+		self._runs[item] = (row, col, length, horizontal)
+		for k in range(length):
+			if horizontal:
+				self._cell_item[row][col + k] = item
+			else:
+				self._cell_item[row + k][col] = item
+
+	def _place(self, row, col, length, horizontal):
+		item = self.rects.acquire(self.tag, *self._box(row, col, length, horizontal), fill=self.fill, width=0)
+		self._index(item, row, col, length, horizontal)
+		return item
+
+	def _drop(self, item):
+		row, col, length, horizontal = self._runs.pop(item)
+		self.rects.release(self.tag, item)
+		for k in range(length):
+			if horizontal:
+				self._cell_item[row][col + k] = 0
+			else:
+				self._cell_item[row + k][col] = 0
+		return row, col, length, horizontal
+
+	def clear(self):
+		"""
+		Removes every wall from the canvas
+		"""
+		self.rects.release_all(self.tag)
+		self._runs.clear()
+		self._cell_item = [[0] * self.cols for _ in range(self.rows)]
+
+	def redraw(self, matrix: List[List[int]], col_width, row_height, fill, window=None) -> int:
+		"""
+		Clears the wall layer and draws the walls of the given map again
+
+		:param matrix: 2D matrix where wall cells are 1
+		:param col_width: Width of a cell on canvas
+		:param row_height: Height of a cell on canvas
+		:param fill: Wall colour
+		:param window: (top, left, bottom, right) bounds of the cells to draw, drawn from the canvas origin;
+		               defaults to the whole map
+		:return: Number of canvas items used
+		"""
+		start = time.perf_counter()
+		top, left, bottom, right = window or (0, 0, len(matrix), len(matrix[0]))
+		matrix = [row[left:right] for row in matrix[top:bottom]]
+		self.top, self.left = top, left
+		self.rows, self.cols = bottom - top, right - left
+		self.col_width, self.row_height, self.fill = col_width, row_height, fill
+		self.clear()
+		runs = []
+		leftover = [[0] * self.cols for _ in range(self.rows)]
+		for i, row in enumerate(matrix):
+			j = 0
+			while j < self.cols:
+				if row[j] != 1:
+					j += 1
+					continue
+				k = j
+				while k < self.cols and row[k] == 1:
+					k += 1
+				if k - j > 1:
+					runs.append((i, j, k - j, True))
+				else:
+					leftover[i][j] = 1
+				j = k
+		for j in range(self.cols):
+			i = 0
+			while i < self.rows:
+				if not leftover[i][j]:
+					i += 1
+					continue
+				k = i
+				while k < self.rows and leftover[k][j]:
+					k += 1
+				runs.append((i, j, k - i, False))
+				i = k
+		# every run is drawn in a single Tcl batch, instead of a call per item
+		items = self.rects.acquire_many(self.tag, [self._box(*run) for run in runs], fill=self.fill, width=0)
+		for item, run in zip(items, runs):
+			self._index(item, *run)
+		self.redraw_time = time.perf_counter() - start
+		return len(self._runs)
+
+	def recolor(self, fill, background=None):
+		"""
+		Repaints the walls in a new colour
+
+		:param fill: Wall colour
+		:param background: Unused, open cells are not drawn
+		"""
+		self.fill = fill
+		self.rects.canvas.itemconfigure(self.tag, fill=fill)
+
+	def _mergeable(self, item, horizontal):
+		return bool(item) and (self._runs[item][2] == 1 or self._runs[item][3] == horizontal)
+
+	def add(self, cells: List[Tuple[int, int]]):
+		"""
+		Draws new wall cells, merging each one with the runs next to it where possible
+
+		:param cells: List of (row, column) coordinates of the new walls
+		"""
+		for row, col in cells:
+			row, col = row - self.top, col - self.left
+			if not (0 <= row < self.rows and 0 <= col < self.cols) or self._cell_item[row][col]:
+				continue
+			left = self._cell_item[row][col - 1] if col > 0 else 0
+			right = self._cell_item[row][col + 1] if col < self.cols - 1 else 0
+			up = self._cell_item[row - 1][col] if row > 0 else 0
+			down = self._cell_item[row + 1][col] if row < self.rows - 1 else 0
+			if self._mergeable(left, True) or self._mergeable(right, True):
+				start, end = col, col + 1
+				if self._mergeable(left, True):
+					start = self._drop(left)[1]
+				if self._mergeable(right, True):
+					_, c, length, _ = self._drop(right)
+					end = c + length
+				self._place(row, start, end - start, True)
+			elif self._mergeable(up, False) or self._mergeable(down, False):
+				start, end = row, row + 1
+				if self._mergeable(up, False):
+					start = self._drop(up)[0]
+				if self._mergeable(down, False):
+					r, _, length, _ = self._drop(down)
+					end = r + length
+				self._place(start, col, end - start, False)
+			else:
+				self._place(row, col, 1, True)
+
+	def remove(self, cells: List[Tuple[int, int]]):
+		"""
+		Erases wall cells, splitting the runs covering them
+
+		:param cells: List of (row, column) coordinates of the removed walls
+		"""
+		for row, col in cells:
+			row, col = row - self.top, col - self.left
+			if not (0 <= row < self.rows and 0 <= col < self.cols) or not self._cell_item[row][col]:
+				continue
+			item = self._cell_item[row][col]
+			r, c, length, horizontal = self._drop(item)
+			offset = col - c if horizontal else row - r
+			if offset:
+				self._place(r, c, offset, horizontal)
+			if length - offset - 1:
+				self._place(*((r, col + 1) if horizontal else (row + 1, c)), length - offset - 1, horizontal)
@@ -1,13 +1,24 @@
 import tkinter as tk
-from typing import Tuple
+from typing import Optional, Tuple
 # from snakesim.src.util.common import Common
+# from snakesim.src.view.animation_scheduler import AnimationScheduler
+# from snakesim.src.view.callback_tracer import CallbackTracer
 from ..util.common import Common
+from ..view.animation_scheduler import AnimationScheduler
+from ..view.callback_tracer import CallbackTracer
 
 class CustomButton(tk.Button):
 	"""
 	Button widget supporting pulsing animation.
 	"""
+	scheduler: Optional[AnimationScheduler] = None  # shared by every button, created on the first pulse if not set
+	tracer: Optional[CallbackTracer] = None     # times the commands of the buttons created while set
+	RAMP_STEPS = 64
+	_ramps = {}     # (start colour, end colour) -> precomputed colours from start to end
+	
 	def __init__(self, master=None, pulsebegin="#36454F", pulseend="#00FFFF", pulsebackground=False, **kwargs):
+		if CustomButton.tracer and callable(kwargs.get('command')):
+			kwargs['command'] = CustomButton.tracer.wrap(kwargs['command'], 'command')
 		super().__init__(master, **kwargs)
 		__doc__ = tk.Button.__doc__ + "\nThis subclass adds additional functionality."
 		self._pulse = False
@@ -15,10 +26,10 @@ class CustomButton(tk.Button):
 		self.initial_color = None
 		self.color_start = pulsebegin   # default: charcoal
 		self.color_end = pulseend  # default: cyan
-		self.pulse_speed = 0.01  # Speed of pulsing
-		self.pulse_delay = 5  # Delay between interpolation
-		self._progress = 1  # Progress for pulsing (0 to 1)
-		self.after_id = None  # Store the after ID for cancellation
+		self.pulse_period = 1.0  # Seconds for a pulse from the end colour to the start colour and back
+		self._pulse_start = None  # Time the current pulse started at
+		self._ramp_index = None  # Index of the colour currently shown
+		self.handle = None  # Scheduler subscription, for cancellation
 	
 	@property
 	def pulse(self):
@@ -28,12 +39,16 @@ class CustomButton(tk.Button):
 	def pulse(self, value: Tuple[bool, bool]):
 		self._pulse = value
 		if self._pulse:
-			self.initial_color = self.cget("background" if self.pulse_background else "foreground")
-			self.pulse_animation()
+			if self.handle is None:
+				if CustomButton.scheduler is None:
+					CustomButton.scheduler = AnimationScheduler(self._root())
+				self.initial_color = self.cget("background" if self.pulse_background else "foreground")
+				self._pulse_start = self._ramp_index = None
+				self.handle = CustomButton.scheduler.subscribe(self.pulse_animation, priority=-1)
 		else:
-			if self.after_id:
-				self.after_cancel(self.after_id)
-				self.after_id = None
+			if self.handle:
+				CustomButton.scheduler.unsubscribe(self.handle)
+				self.handle = None
 			self.update_color(self.initial_color)
 	
 	def update_color(self, color):
@@ -42,17 +57,22 @@ class CustomButton(tk.Button):
 		else:
 			self.config(fg=color)
 	
-	def pulse_animation(self):
-		if self._pulse:
-			# Update the progress
-			self._progress += self.pulse_speed
-			if self._progress >= 1:  # Reverse direction if it reaches 1
-				self._progress = 1
-				self.pulse_speed = -self.pulse_speed
-			elif self._progress <= 0:  # Reverse direction if it reaches 0
-				self._progress = 0
-				self.pulse_speed = -self.pulse_speed
-			new_color = Common.interpolate_color(self.winfo_rgb(self.color_start),
-			                                     self.winfo_rgb(self.color_end), self._progress)
-			self.update_color(new_color)
-			self.after_id = self.after(self.pulse_delay, self.pulse_animation)
+	def _ramp(self):
+		key = (self.color_start, self.color_end)
+		if key not in CustomButton._ramps:
+			CustomButton._ramps[key] = Common.color_ramp(self.winfo_rgb(self.color_start), self.winfo_rgb(self.color_end), CustomButton.RAMP_STEPS)
+		return CustomButton._ramps[key]
+	
+	def pulse_animation(self, now):
+		if not self._pulse:
+			self.handle = None
+			return False
+		if self._pulse_start is None:
+			self._pulse_start = now
+		# goes from the end colour down to the start colour and back up over a period
+		phase = (now - self._pulse_start) / self.pulse_period % 1
+		ramp = self._ramp()
+		index = round(abs(1 - 2 * phase) * (len(ramp) - 1))
+		if index != self._ramp_index:
+			self._ramp_index = index
+			self.update_color(ramp[index])
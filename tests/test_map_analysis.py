@@ -0,0 +1,58 @@
+import random
+import unittest
+from src.core.map_analysis import MapAnalysis
+
+def parse(text):
+	return [[1 if c == '#' else 0 for c in row] for row in text.split('/')]
+
+class MapAnalysisTest(unittest.TestCase):
+	def assertConsistent(self, analysis):
+		"""
+		Every live cell is either a node or on the corridor of exactly one edge, and edge_of matches the edges
+		"""
+		owners = {}
+		for eid, (u, v, cells, _) in analysis.edges.items():
+			self.assertIn(eid, analysis.node_edges[u])
+			self.assertIn(eid, analysis.node_edges[v])
+			for c in cells:
+				self.assertNotIn(c, owners, f"cell {c} is on edges {owners.get(c)} and {eid}")
+				owners[c] = eid
+		self.assertEqual(owners, analysis.edge_of)
+		for k in range(analysis.rows * analysis.cols):
+			if analysis.is_live(k):
+				self.assertNotEqual(k in analysis.node_edges, k in analysis.edge_of, f"cell {k}")
+			else:
+				self.assertNotIn(k, analysis.node_edges)
+				self.assertNotIn(k, analysis.edge_of)
+
+	def test_update_across_wrap_seam(self):
+		# on a 4 column map, moves that wrap around lead back to the cell itself or to the same neighbour twice
+		matrix = parse("...#/.#../#.../##../##../.#.#/..../.##./#.##/..##/..##/.###")
+		analysis = MapAnalysis(matrix, True, True)
+		self.assertConsistent(analysis)
+		analysis.update([(10, 0), (7, 3), (1, 0)], 1)
+		self.assertConsistent(analysis)
+		analysis.update([(3, 0), (7, 1), (5, 2)], 0)
+		self.assertConsistent(analysis)
+
+	def test_updates_match_fresh_analysis(self):
+		rng = random.Random(0)
+		for wraparound in (False, True):
+			for all_directional in (False, True):
+				for _ in range(50):
+					rows, cols = rng.randint(2, 12), rng.randint(2, 12)
+					matrix = [[int(rng.random() < 0.4) for _ in range(cols)] for _ in range(rows)]
+					analysis = MapAnalysis(matrix, wraparound, all_directional)
+					for _ in range(5):
+						cells = [(rng.randrange(rows), rng.randrange(cols)) for _ in range(rng.randint(1, 4))]
+						value = rng.randint(0, 1)
+						analysis.update(cells, value)
+						for x, y in cells:
+							matrix[x][y] = value
+						self.assertConsistent(analysis)
+						fresh = MapAnalysis(matrix, wraparound, all_directional)
+						self.assertEqual(bytes(analysis.dead), bytes(fresh.dead))
+						self.assertEqual(analysis.adj, fresh.adj)
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,43 @@
+import os
+import tempfile
+import unittest
+from src.core.maze_cache import MazeCache
+
+class MazeCacheTest(unittest.TestCase):
+	def setUp(self):
+		self.directory = tempfile.TemporaryDirectory()
+		self.cache = MazeCache(self.directory.name)
+		self.packed = bytes([0, 1] * 6)
+		self.cache.store(1, 3, 4, 7, self.packed)
+		with open(self.cache.path(1, 3, 4, 7), 'rb') as file:
+			self.data = file.read()
+
+	def tearDown(self):
+		self.directory.cleanup()
+
+	def corrupt(self, data):
+		with open(self.cache.path(1, 3, 4, 7), 'wb') as file:
+			file.write(data)
+
+	def test_round_trip(self):
+		self.assertEqual(self.cache.load(1, 3, 4, 7), self.packed)
+		self.assertIsNone(self.cache.load(1, 3, 4, 8))
+		self.assertIsNone(self.cache.load(1, 4, 3, 7))
+
+	def test_corrupt_files_are_misses(self):
+		header_len = self.data[8] | self.data[9] << 8
+		for name, data in (('truncated length', self.data[:9]),
+		                   ('truncated header', self.data[:10 + header_len // 2]),
+		                   ('garbled header', self.data[:10] + b'{(' + self.data[12:]),
+		                   ('undecodable header', self.data[:10] + b'\xff' * header_len + self.packed),
+		                   ('not a dict', self.data[:10] + repr((3, 4)).ljust(header_len).encode() + self.packed),
+		                   ('truncated map', self.data[:-1])):
+			with self.subTest(name):
+				self.corrupt(data)
+				self.assertIsNone(self.cache.load(1, 3, 4, 7))
+				# the next store overwrites the corrupt file
+				self.cache.store(1, 3, 4, 7, self.packed)
+				self.assertEqual(self.cache.load(1, 3, 4, 7), self.packed)
+
+if __name__ == '__main__':
+	unittest.main()
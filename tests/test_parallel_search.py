@@ -0,0 +1,83 @@
+import heapq
+import math
+import random
+import unittest
+from src.core.parallel_search import ParallelSearch
+from src.core.worker_pool import WorkerPool
+from src.util.common import Common
+from src.util.matrix_helpers import MatrixHelpers
+
+def step_cost(a, b, weighted):
+	return 1 if a[0] == b[0] or a[1] == b[1] else (math.sqrt(2) if weighted else 1)
+
+def shortest(start, target, matrix, wraparound, all_directional, weighted):
+	"""
+	Cost of the shortest path, by a plain Dijkstra search that stops when the target is settled
+	"""
+	rows, cols = len(matrix), len(matrix[0])
+	dist, pq = {start: 0}, [(0, start)]
+	while pq:
+		g, cell = heapq.heappop(pq)
+		if g > dist[cell]:
+			continue
+		if cell == target:
+			return g
+		for x, y in Common.valid_moves(cell[0], cell[1], rows, cols, wraparound, all_directional):
+			if (matrix[x][y] and (x, y) != target) or MatrixHelpers.check_diagonal_crossing(cell[0], cell[1], x, y, matrix):
+				continue
+			cost = g + step_cost(cell, (x, y), weighted)
+			if cost < dist.get((x, y), math.inf):
+				dist[(x, y)] = cost
+				heapq.heappush(pq, (cost, (x, y)))
+	return math.inf
+
+class ParallelSearchTest(unittest.TestCase):
+	@classmethod
+	def setUpClass(cls):
+		cls.pool = WorkerPool(2)
+		cls.search = ParallelSearch(cls.pool)
+
+	@classmethod
+	def tearDownClass(cls):
+		cls.search.close()
+		cls.pool.shutdown()
+
+	def path_cost(self, path, matrix, wraparound, all_directional, weighted):
+		rows, cols = len(matrix), len(matrix[0])
+		cells = path[::-1]
+		for a, b in zip(cells, cells[1:]):
+			self.assertIn(b, Common.valid_moves(a[0], a[1], rows, cols, wraparound, all_directional))
+			self.assertFalse(matrix[b[0]][b[1]] and b != cells[-1], f"path enters wall {b}")
+			self.assertFalse(MatrixHelpers.check_diagonal_crossing(a[0], a[1], b[0], b[1], matrix), f"path cuts a corner at {a}")
+		return sum(step_cost(a, b, weighted) for a, b in zip(cells, cells[1:]))
+
+	def test_paths_match_exact_dijkstra(self):
+		rng = random.Random(0)
+		for _ in range(150):
+			rows, cols = rng.randint(3, 25), rng.randint(3, 25)
+			density = rng.choice((0, 0.1, 0.25, 0.4))
+			matrix = [[1 if rng.random() < density else 0 for _ in range(cols)] for _ in range(rows)]
+			wraparound, all_directional = rng.choice((True, False)), rng.choice((True, False))
+			start, target = (rng.randrange(rows), rng.randrange(cols)), (rng.randrange(rows), rng.randrange(cols))
+			if start == target:
+				continue
+			# the start is the head of the snake, which is occupied
+			matrix[start[0]][start[1]], matrix[target[0]][target[1]] = 2, 0
+			alg = rng.choice(ParallelSearch.ALGORITHMS)
+			weighted = alg != 2
+			with self.subTest(alg=alg, rows=rows, cols=cols, wraparound=wraparound, all_directional=all_directional):
+				path, _ = self.search.find_path(alg, (start, target, matrix, wraparound, all_directional, True), 0)
+				expected = shortest(start, target, matrix, wraparound, all_directional, weighted)
+				if not path:
+					self.assertEqual(expected, math.inf)
+					continue
+				self.assertEqual((path[0], path[-1]), (target, start))
+				cost = self.path_cost(path, matrix, wraparound, all_directional, weighted)
+				# A* is only as optimal as its heuristic, but never beats the shortest path
+				if alg == 4:
+					self.assertGreaterEqual(cost + 1e-9, expected)
+				else:
+					self.assertAlmostEqual(cost, expected)
+
+if __name__ == '__main__':
+	unittest.main()